@@ -0,0 +1,326 @@
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# Colonne IFLO (intestazioni IT) che dipendono dai valori della tabella CTR_ASS
+FL_VALUE_COLUMNS: List[str] = ['Tipologia', 'Componente', 'Sezione', 'Tipo ogg.', 'Prof.cat.']
+
+# Colonne IFLO con pochi valori distinti ripetuti su tutte le righe (categorical in compact_FL_frame)
+COMPACT_COLUMNS: List[str] = ['L', 'L_1'] + FL_VALUE_COLUMNS
+
+
+def compact_FL_frame(df: pd.DataFrame, category_columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Rappresentazione compatta del df estratto: spazi di riempimento rimossi una sola volta da tutte
+    le colonne di testo e colonne a bassa cardinalità memorizzate come categorical
+
+    Args:
+        df: Df estratto da IFLO (colonne di testo)
+        category_columns: Colonne da convertire in categorical (default: COMPACT_COLUMNS presenti nel df)
+
+    Returns:
+        pd.DataFrame: Nuovo df con gli stessi valori senza spazi iniziali e finali
+    """
+    category_columns = COMPACT_COLUMNS if category_columns is None else category_columns
+    columns = {}
+    for col in df.columns:
+        values = text_values(df[col]) if df[col].dtype == object or isinstance(df[col].dtype, pd.CategoricalDtype) else df[col]
+        columns[col] = values.astype('category') if col in category_columns else values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def text_values(series: pd.Series) -> pd.Series:
+    """
+    Valori della colonna come testo senza spazi iniziali e finali (valori mancanti = '').
+    Per le colonne categorical la pulizia è applicata solo alle categorie.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = pd.Index(series.cat.categories.astype(str).str.strip().tolist() + [''])
+        # Il codice -1 (valore mancante) seleziona l'ultima categoria aggiunta ('')
+        return pd.Series(categories.take(series.cat.codes.to_numpy()), index=series.index, dtype=object)
+    return series.fillna('').astype(str).str.strip()
+
+
+def filter_language(df: pd.DataFrame, lang: str) -> pd.DataFrame:
+    """
+    Righe del df con lingua (colonna 'L_1') uguale a quella indicata
+
+    Args:
+        df: Df estratto da IFLO con le intestazioni IT
+        lang: Lingua della sessione SAP
+    """
+    values = df['L_1']
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        matching = [value for value in values.cat.categories if str(value).strip().upper() == lang.upper()]
+        return df[values.isin(matching)]
+    return df[values.str.upper() == lang.upper()]
+
+
+def describe_modifications(df: pd.DataFrame, column_mapping: Dict[str, str], mask: pd.Series) -> pd.Series:
+    """
+    Elenco delle colonne modificate per le righe indicate, confrontando coppie di colonne
+
+    Args:
+        df: Df con le colonne dei valori prima e dopo la modifica
+        column_mapping: Colonna con il nuovo valore -> colonna con il valore originale
+        mask: Righe da confrontare
+
+    Returns:
+        pd.Series: Per ogni riga "Colonna: 'vecchio' → 'nuovo'" separati da '; '
+            (stringa vuota se nessuna colonna è cambiata o la riga non è in mask)
+    """
+    modified = pd.Series('', index=df.index, dtype=object)
+    for new_col, old_col in column_mapping.items():
+        new_val = text_values(df[new_col])
+        old_val = text_values(df[old_col])
+        changed = mask & (new_val != old_val)
+        if not changed.any():
+            continue
+        text = old_col + ": '" + old_val[changed] + "' → '" + new_val[changed] + "'"
+        modified[changed] = (modified[changed] + '; ').where(modified[changed] != '', '') + text
+    return modified
+
+
+def load_reference_values(file_path: str) -> pd.DataFrame:
+    """
+    Legge da file (Excel o CSV) i valori attesi delle FL
+
+    Args:
+        file_path: Percorso del file; deve contenere la colonna 'Sede tecnica'
+                   e le colonne di FL_VALUE_COLUMNS
+
+    Returns:
+        pd.DataFrame: Valori attesi come stringhe, una riga per FL
+
+    Raises:
+        ValueError: Se il formato del file non è supportato o mancano colonne
+    """
+    path = Path(file_path)
+    if path.suffix.lower() in ('.xlsx', '.xls'):
+        df = pd.read_excel(path, dtype=str, keep_default_na=False)
+    elif path.suffix.lower() in ('.csv', '.txt'):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, sep=None, engine='python')
+    else:
+        raise ValueError(f"Formato file non supportato: {path.suffix}")
+
+    missing = [col for col in ['Sede tecnica'] + FL_VALUE_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Colonne mancanti nel file dei valori attesi: {missing}")
+
+    df = df[['Sede tecnica'] + FL_VALUE_COLUMNS].apply(lambda col: col.str.strip())
+    return df.drop_duplicates(subset='Sede tecnica', keep='last')
+
+
+def split_stale_FL(df: pd.DataFrame, df_expected: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Confronta i valori IFLO delle FL con quelli attesi e separa le FL da aggiornare
+
+    Le FL assenti tra i valori attesi sono considerate da aggiornare.
+
+    Args:
+        df: Df estratto da IFLO (colonne 'Sede tecnica' e FL_VALUE_COLUMNS)
+        df_expected: Valori attesi (colonne 'Sede tecnica' e FL_VALUE_COLUMNS)
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]:
+            - FL con almeno un valore diverso da quello atteso (da inviare a IL02)
+            - FL già coerenti
+    """
+    expected = df_expected.set_index(df_expected['Sede tecnica'].astype(str).str.strip())[FL_VALUE_COLUMNS]
+    expected = expected[~expected.index.duplicated(keep='last')]
+    fl_codes = df['Sede tecnica'].astype(str).str.strip()
+    # Allineo i valori attesi alle righe del df (NaN per le FL non presenti)
+    aligned = expected.reindex(fl_codes.values)
+    aligned.index = df.index
+
+    current = df[FL_VALUE_COLUMNS].apply(text_values)
+    expected_values = aligned.astype(str).apply(lambda col: col.str.strip())
+    mask_stale = (current != expected_values).any(axis=1) | aligned.isna().any(axis=1)
+    return df[mask_stale], df[~mask_stale]
+
+
+def compute_drift(df: pd.DataFrame, df_expected: pd.DataFrame,
+                  value_columns: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Confronta i valori letti delle FL con quelli attesi e riporta le differenze per colonna
+
+    Args:
+        df: Df delle FL con la colonna 'Sede tecnica' e i valori letti
+        df_expected: Valori attesi (colonne 'Sede tecnica' e FL_VALUE_COLUMNS)
+        value_columns: Colonna dei valori attesi -> colonna di df con il valore letto
+                       (default: stesse colonne, cioè i valori IFLO; per IL02 le colonne N_*)
+
+    Returns:
+        pd.DataFrame: Una riga per FL con 'Sede tecnica', per ogni colonna il valore letto e quello
+            atteso ('<colonna> atteso') e la colonna 'Drift' con l'elenco delle colonne diverse
+            ('Non presente nei valori attesi' se la FL non compare nel file di riferimento)
+    """
+    value_columns = value_columns or {col: col for col in FL_VALUE_COLUMNS}
+    expected = df_expected.set_index(df_expected['Sede tecnica'].astype(str).str.strip())[list(value_columns)]
+    expected = expected[~expected.index.duplicated(keep='last')]
+    fl_codes = df['Sede tecnica'].astype(str).str.strip()
+    aligned = expected.reindex(fl_codes.values)
+    aligned.index = df.index
+
+    result = pd.DataFrame({'Sede tecnica': fl_codes})
+    # Elenco delle colonne con valore diverso da quello atteso (stringa vuota = FL coerente)
+    drift = pd.Series("", index=df.index)
+    for expected_col, current_col in value_columns.items():
+        current = text_values(df[current_col])
+        result[expected_col] = current
+        result[f"{expected_col} atteso"] = aligned[expected_col]
+        different = current != aligned[expected_col].astype(str).str.strip()
+        drift = drift + different.map({True: f"{expected_col}, ", False: ""})
+    drift = drift.str.rstrip(", ")
+    missing = aligned.isna().all(axis=1)
+    result['Drift'] = drift.where(~missing, "Non presente nei valori attesi")
+    return result
+
+
+def pattern_to_regex(pattern: str) -> str:
+    """
+    Converte un pattern di selezione SAP (opzione CP) in espressione regolare
+
+    Args:
+        pattern: Pattern con '*' (qualsiasi sequenza) e '+' (un carattere qualsiasi)
+
+    Returns:
+        str: Espressione regolare equivalente, ancorata all'intero codice
+    """
+    parts = []
+    for char in pattern.strip():
+        if char == '*':
+            parts.append('.*')
+        elif char == '+':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return ''.join(parts) + r'\Z'
+
+
+def match_FL_pattern(fl_codes: pd.Series, pattern: str) -> pd.Series:
+    """
+    Restituisce la maschera delle FL che corrispondono a un pattern SAP o a un codice esatto
+
+    Args:
+        fl_codes: Codici FL
+        pattern: Pattern con '*' / '+' oppure codice FL esatto
+
+    Returns:
+        pd.Series: Maschera booleana allineata a fl_codes (confronto senza distinzione maiuscole/minuscole)
+    """
+    codes = fl_codes.astype(str).str.strip().str.upper()
+    pattern = pattern.strip().upper()
+    if '*' not in pattern and '+' not in pattern:
+        return codes == pattern
+    return codes.str.match(pattern_to_regex(pattern))
+
+
+def split_by_pattern(df: pd.DataFrame, selections: Dict[str, List[str]],
+                     fl_column: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Suddivide il risultato di una selezione combinata tra le chiavi che l'hanno richiesta
+
+    Args:
+        df: Lista delle FL estratte con una sola selezione per tutti i pattern
+        selections: Chiave -> pattern o codici FL esatti della chiave
+        fl_column: Colonna con il codice FL (default: prima colonna del df)
+
+    Returns:
+        Dict[str, pd.DataFrame]: Chiave -> righe del df che corrispondono ad almeno uno dei suoi valori.
+            Una FL che corrisponde a più chiavi compare in ognuna.
+    """
+    fl_codes = df[fl_column] if fl_column else df.iloc[:, 0]
+    codes_upper = fl_codes.astype(str).str.strip().str.upper()
+    result = {}
+    for key, values in selections.items():
+        exact = [value.strip().upper() for value in values if '*' not in value and '+' not in value]
+        mask = codes_upper.isin(exact)
+        for value in values:
+            if '*' in value or '+' in value:
+                mask |= match_FL_pattern(fl_codes, value)
+        result[key] = df[mask].reset_index(drop=True)
+    return result
+
+
+def _literal_prefix(pattern: str) -> str:
+    """
+    Parte iniziale del pattern che precede il primo carattere jolly ('*' o '+')
+    """
+    match = re.search(r'[*+]', pattern)
+    return pattern[:match.start()] if match else pattern
+
+
+def normalize_selection(patterns: List[str], fl_codes: List[str]) -> Tuple[List[str], List[str], Dict[str, str]]:
+    """
+    Elimina dalla selezione i pattern e le FL esatte già coperti da un altro pattern.
+
+    I pattern di solo prefisso ('ESS-ESND*') vengono inseriti in un trie di caratteri: un pattern o una FL
+    il cui prefisso letterale attraversa un nodo terminale del trie è coperto da quel pattern.
+    Le FL esatte vengono inoltre confrontate con i pattern non di prefisso ('ESS-*-01').
+
+    Args:
+        patterns: Pattern con carattere jolly (chiavi con * di fl_dictionary)
+        fl_codes: Codici FL esatti (Mask_gen)
+
+    Returns:
+        Tuple[List[str], List[str], Dict[str, str]]:
+            - pattern da mantenere (ordine originale)
+            - FL esatte da mantenere (ordine originale)
+            - valore eliminato -> pattern che lo copre
+    """
+    END = ''  # Chiave del nodo terminale (nessun carattere ha lunghezza zero)
+    trie: Dict[str, dict] = {}
+
+    def covering_prefix(text: str) -> Optional[str]:
+        node = trie
+        for char in text:
+            if END in node:
+                return node[END]
+            node = node.get(char)
+            if node is None:
+                return None
+        return node.get(END)
+
+    removed: Dict[str, str] = {}
+    # Pattern ripetuti (anche con maiuscole/minuscole diverse): si mantiene la prima occorrenza
+    unique: Dict[str, str] = {}
+    for pattern in patterns:
+        value = pattern.strip().upper()
+        if value in unique:
+            removed[pattern] = unique[value]
+        else:
+            unique[value] = pattern
+
+    # I pattern più generali (prefisso letterale più corto) vengono inseriti per primi
+    for value in sorted(unique, key=lambda v: (len(_literal_prefix(v)), len(v))):
+        prefix = _literal_prefix(value)
+        covering = covering_prefix(prefix)
+        if covering is not None:
+            removed[unique[value]] = covering
+        elif value == prefix + '*':
+            node = trie
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node[END] = unique[value]
+
+    kept_patterns = [pattern for pattern in unique.values() if pattern not in removed]
+    complex_patterns = [p for p in kept_patterns if p.strip().upper() != _literal_prefix(p.strip().upper()) + '*']
+
+    kept_fl = []
+    seen_fl = set()
+    for fl in fl_codes:
+        value = fl.strip().upper()
+        if value in seen_fl:
+            continue
+        seen_fl.add(value)
+        covering = covering_prefix(value)
+        if covering is None:
+            covering = next((p for p in complex_patterns if re.match(pattern_to_regex(p.upper()), value)), None)
+        if covering is not None:
+            removed[fl] = covering
+        else:
+            kept_fl.append(fl)
+    return kept_patterns, kept_fl, removed
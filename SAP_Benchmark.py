@@ -0,0 +1,333 @@
+import argparse
+import concurrent.futures
+import contextlib
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Iterable, Optional, Tuple
+
+import pandas as pd
+
+import FL_Data
+import SAP_Clipboard
+import SAP_Simulator
+import SAP_Transactions
+import SAP_Wait
+
+
+# ============================================================================
+#   Benchmark delle letture dei risultati SAP
+# ============================================================================
+# Le misure usano la sessione simulata di SAP_Simulator: i tempi riportati sono quelli
+# dell'elaborazione locale, le chiamate COM vengono contate e convertite in una stima
+# con la latenza indicata (una chiamata COM verso SAP GUI costa tipicamente 0,1-1 ms).
+
+# Intestazioni del layout CHECK_FL_L come visualizzate in SE16 (la lingua compare due volte)
+IFLO_LAYOUT_TITLES = ['Sede tecnica', 'Definizione della sede tecnica', 'L', 'L', 'Tipologia',
+                      'Componente', 'Sezione', 'Tipo ogg.', 'Prof.cat.']
+
+
+def iflo_result(n_rows: int) -> pd.DataFrame:
+    """
+    Risultato SE16 (IFLO) fittizio con le colonne del layout CHECK_FL_L
+
+    Args:
+        n_rows: Numero di righe
+    """
+    df = SAP_Simulator.fl_master_to_dataframe(SAP_Simulator.generate_fl_master(n_rows))
+    df.columns = IFLO_LAYOUT_TITLES
+    return df
+
+
+def benchmark_grid_reader(sizes: Iterable[int] = (1000, 10000, 100000), com_latency: float = 0.0005) -> pd.DataFrame:
+    """
+    Confronta la lettura diretta della griglia ALV (read_result_grid) con il percorso
+    esportazione in clipboard + clean_data
+
+    Args:
+        sizes: Numero di righe del risultato
+        com_latency: Durata stimata di una chiamata COM in secondi
+
+    Returns:
+        pd.DataFrame: Una riga per dimensione e percorso
+    """
+    rows = []
+    for n_rows in sizes:
+        df = iflo_result(n_rows)
+        session = SAP_Simulator.SimulatedSAPSession({})
+        extractor = SAP_Transactions.SAPDataExtractor(session)
+
+        # Percorso clipboard: testo esportato da SAP e analisi con clean_data
+        text = SAP_Simulator.grid_export_text(df)
+        start_time = time.perf_counter()
+        success, df_clipboard = extractor.parse_IFLO_export(text)
+        elapsed = time.perf_counter() - start_time
+        rows.append({"Righe": n_rows, "Percorso": "clipboard", "Tempo locale (s)": round(elapsed, 3),
+                     "Chiamate COM": None, "Stima con latenza COM (s)": round(elapsed, 3),
+                     "Testo (MB)": round(len(text) * 2 / 1e6, 1), "Esito": success})
+
+        # Percorso griglia: lettura a pagine con GetCellValue
+        grid = SAP_Simulator.SimulatedGrid(df)
+        session.elements[extractor.IFLO_GRID_ID] = grid
+        start_time = time.perf_counter()
+        df_grid = extractor.read_result_grid()
+        elapsed = time.perf_counter() - start_time
+        same = success and df_grid.equals(df_clipboard.apply(lambda col: col.str.strip()))
+        rows.append({"Righe": n_rows, "Percorso": "griglia", "Tempo locale (s)": round(elapsed, 3),
+                     "Chiamate COM": grid.com_calls,
+                     "Stima con latenza COM (s)": round(elapsed + grid.com_calls * com_latency, 1),
+                     "Testo (MB)": 0.0, "Esito": same})
+    return pd.DataFrame(rows)
+
+
+def measure(function: Callable, *args) -> Tuple[object, float, float]:
+    """
+    Esegue la funzione misurando durata (s) e picco di memoria Python allocata (MB)
+    """
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def benchmark_file_reader(sizes: Iterable[int] = (10000, 100000, 500000)) -> pd.DataFrame:
+    """
+    Confronta la lettura del testo esportato in clipboard (clipboard_data + clean_data) con la lettura
+    a blocchi del file esportato (clean_export_file). Il picco di memoria del percorso clipboard
+    comprende il testo letto dalla clipboard.
+
+    Args:
+        sizes: Numero di righe del risultato
+
+    Returns:
+        pd.DataFrame: Una riga per dimensione e percorso
+    """
+    rows = []
+    extractor = SAP_Transactions.SAPDataExtractor(SAP_Simulator.SimulatedSAPSession({}))
+    for n_rows in sizes:
+        text = SAP_Simulator.grid_export_text(iflo_result(n_rows))
+        path = os.path.join(tempfile.gettempdir(), f"FL_benchmark_{n_rows}.txt")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            file.write(text)
+        del text
+
+        def clipboard_path():
+            with open(path, "r", encoding="utf-8", newline="") as file:
+                data = file.read()  # equivalente della lettura dalla clipboard
+            return extractor.clean_data(data)
+
+        try:
+            (success, df_clipboard), elapsed, peak = measure(clipboard_path)
+            rows.append({"Righe": n_rows, "Percorso": "clipboard", "Tempo (s)": round(elapsed, 2),
+                         "Picco memoria (MB)": round(peak, 1), "Esito": success})
+            (success, df_file), elapsed, peak = measure(extractor.clean_export_file, path)
+            rows.append({"Righe": n_rows, "Percorso": "file", "Tempo (s)": round(elapsed, 2),
+                         "Picco memoria (MB)": round(peak, 1), "Esito": success and df_file.equals(df_clipboard)})
+        finally:
+            os.remove(path)
+    return pd.DataFrame(rows)
+
+
+def reference_clean_data(extractor: SAP_Transactions.SAPDataExtractor, data: str) -> pd.DataFrame:
+    """
+    Analisi riga per riga delle liste esportate (implementazione di clean_data prima della versione
+    con read_csv, senza messaggi), usata come riferimento per tempi e risultato
+    """
+    clean_lines = [line.strip() for line in data.strip().split('\n') if line.strip().startswith('|')]
+    data_rows = [line.split('|') for line in clean_lines]
+    headers = extractor.handle_duplicate_headers([header.strip() for header in data_rows[0]])
+    df = pd.DataFrame(data_rows[1:], columns=headers)
+    df = df[[col for col in df.columns if str(col).strip() != '' and not str(col).strip().startswith('_')]]
+    return df.reset_index(drop=True)
+
+
+def benchmark_parser(sizes: Iterable[int] = (10000, 100000, 1000000)) -> pd.DataFrame:
+    """
+    Confronta clean_data con l'analisi riga per riga precedente sul testo esportato da SE16
+
+    Args:
+        sizes: Numero di righe del risultato
+
+    Returns:
+        pd.DataFrame: Una riga per dimensione con i tempi dei due parser
+    """
+    rows = []
+    extractor = SAP_Transactions.SAPDataExtractor(SAP_Simulator.SimulatedSAPSession({}))
+    for n_rows in sizes:
+        text = SAP_Simulator.grid_export_text(iflo_result(n_rows))
+        start_time = time.perf_counter()
+        df_reference = reference_clean_data(extractor, text)
+        reference_elapsed = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        success, df = extractor.clean_data(text)
+        elapsed = time.perf_counter() - start_time
+        rows.append({"Righe": n_rows, "Riga per riga (s)": round(reference_elapsed, 2),
+                     "clean_data (s)": round(elapsed, 2), "Rapporto": round(reference_elapsed / elapsed, 1),
+                     "Stesso df": success and df.equals(df_reference)})
+    return pd.DataFrame(rows)
+
+
+def benchmark_memory(sizes: Iterable[int] = (100000, 1000000)) -> pd.DataFrame:
+    """
+    Memoria del df estratto (clean_data) nella forma originale e con compact_FL_frame, e costo
+    del filtro per lingua e del confronto delle colonne modificate sui due formati
+
+    Args:
+        sizes: Numero di righe del risultato
+
+    Returns:
+        pd.DataFrame: Una riga per dimensione e formato
+    """
+    rows = []
+    extractor = SAP_Transactions.SAPDataExtractor(SAP_Simulator.SimulatedSAPSession({}))
+    column_mapping = {f"N_{col}": col for col in FL_Data.FL_VALUE_COLUMNS}
+    for n_rows in sizes:
+        _, df_raw = extractor.clean_data(SAP_Simulator.grid_export_text(iflo_result(n_rows)))
+        # Intestazioni come dopo rename_columns_safely
+        df_raw.columns = ['Sede tecnica', 'Definizione della sede tecnica', 'L', 'L_1'] + FL_Data.FL_VALUE_COLUMNS
+        df_compact, compact_elapsed, _ = measure(FL_Data.compact_FL_frame, df_raw)
+        for label, df in (("originale", df_raw), ("compatto", df_compact)):
+            df_lang, lang_elapsed, lang_peak = measure(FL_Data.filter_language, df, "IT")
+            # Df dei risultati: colonne N_* lette da IL02 (testo senza spazi)
+            df_result = df_lang.assign(**{new: FL_Data.text_values(df_lang[old]) for new, old in column_mapping.items()})
+            mask = pd.Series(True, index=df_result.index)
+            _, check_elapsed, check_peak = measure(FL_Data.describe_modifications, df_result, column_mapping, mask)
+            rows.append({"Righe": n_rows, "Formato": label,
+                         "Memoria df (MB)": round(df.memory_usage(deep=True).sum() / 1e6, 1),
+                         "Conversione (s)": round(compact_elapsed, 2) if label == "compatto" else 0.0,
+                         "Filtro lingua (s)": round(lang_elapsed, 3), "Picco filtro (MB)": round(lang_peak, 1),
+                         "Confronto modifiche (s)": round(check_elapsed, 2), "Picco confronto (MB)": round(check_peak, 1)})
+    return pd.DataFrame(rows)
+
+
+def reference_wait_for_clipboard(clipboard: SAP_Clipboard.ClipboardTransport, waiter: SAP_Wait.SAPWaiter,
+                                 timeout: float) -> Optional[str]:
+    """
+    Attesa dei dati esportati prima della versione con numero di sequenza: la clipboard viene letta
+    a intervalli crescenti finché contiene del testo, qualunque sia la sua origine
+    """
+    if not waiter.wait_until(lambda: bool((clipboard.read() or "").strip()), "clipboard_dati", timeout=timeout):
+        return None
+    return clipboard.read()
+
+
+def benchmark_clipboard(sizes: Iterable[int] = (10000,), delays: Iterable[float] = (0.05, 0.3, 1.0),
+                        timeout: float = 5.0) -> pd.DataFrame:
+    """
+    Confronta l'attesa dei dati esportati basata sul numero di sequenza (wait_for_clipboard_data) con
+    la lettura periodica precedente, con la clipboard vuota e con il testo di un'esportazione precedente
+
+    Args:
+        sizes: Numero di righe del testo esportato
+        delays: Durata simulata dell'esportazione SAP in secondi
+        timeout: Tempo massimo di attesa in secondi
+
+    Returns:
+        pd.DataFrame: Una riga per dimensione, scenario, durata dell'esportazione e percorso
+    """
+    rows = []
+    clipboard = SAP_Clipboard.MemoryClipboard()
+    extractor = SAP_Transactions.SAPDataExtractor(SAP_Simulator.SimulatedSAPSession({}))
+    extractor.clipboard_broker = SAP_Clipboard.ClipboardBroker(clipboard)
+    for n_rows in sizes:
+        text = SAP_Simulator.grid_export_text(iflo_result(n_rows))
+        for scenario, previous in (("clipboard vuota", ""), ("testo precedente", text.replace("ESS", "OLD"))):
+            for delay in delays:
+                for label in ("lettura periodica", "numero di sequenza"):
+                    clipboard.write(previous)
+                    clipboard.reads = 0
+                    sequence = clipboard.sequence_number()
+                    start_time = time.perf_counter()
+                    export = SAP_Simulator.export_to_clipboard(clipboard, text, delay)
+                    if label == "lettura periodica":
+                        data = reference_wait_for_clipboard(clipboard, extractor.waiter, timeout)
+                    else:
+                        data = extractor.wait_for_clipboard_data(sequence, timeout)
+                    elapsed = time.perf_counter() - start_time
+                    export.join()
+                    rows.append({"Righe": n_rows, "Scenario": scenario, "Esportazione (s)": delay,
+                                 "Percorso": label, "Ritardo lettura (ms)": round((elapsed - delay) * 1000, 1),
+                                 "Letture clipboard": clipboard.reads, "Dati corretti": data == text})
+    return pd.DataFrame(rows)
+
+
+def benchmark_broker(sizes: Iterable[int] = (1, 2, 4), n_queries: int = 8, work: float = 0.4,
+                     clipboard_time: float = 0.05) -> pd.DataFrame:
+    """
+    Estrazioni in parallelo con la clipboard condivisa: ogni estrazione prepara la selezione, la importa
+    in SAP, esegue la lista ed esporta il risultato. Con una sola concessione per tutta l'estrazione le
+    sessioni lavorano una alla volta; con ClipboardBroker sono serializzate solo importazione ed esportazione.
+
+    Args:
+        sizes: Numero di sessioni parallele
+        n_queries: Numero di estrazioni
+        work: Durata simulata di navigazione ed esecuzione della lista in secondi
+        clipboard_time: Durata simulata di importazione ed esportazione SAP in secondi
+
+    Returns:
+        pd.DataFrame: Una riga per numero di sessioni e modalità
+    """
+    rows = []
+    for n_sessions in sizes:
+        for mode in ("estrazione intera", "solo clipboard"):
+            broker = SAP_Clipboard.ClipboardBroker(SAP_Clipboard.MemoryClipboard())
+            extractor = SAP_Transactions.SAPDataExtractor(SAP_Simulator.SimulatedSAPSession({}))
+            extractor.clipboard_broker = broker
+            # Riserva dell'intera estrazione (una sessione alla volta)
+            session_broker = SAP_Clipboard.ClipboardBroker(broker.clipboard)
+
+            def extract(query: int) -> bool:
+                with session_broker.lease("estrazione") if mode == "estrazione intera" else contextlib.nullcontext():
+                    selection = f"FL-{query:04d}"
+                    with broker.lease("importazione") as lease:
+                        lease.clipboard.write(selection)
+                        time.sleep(clipboard_time)  # importazione della selezione in SAP
+                        imported = lease.clipboard.read()
+                    time.sleep(work)  # esecuzione della lista
+                    with broker.lease("esportazione") as lease:
+                        SAP_Simulator.export_to_clipboard(lease.clipboard, f"|{imported}|", clipboard_time)
+                        data = extractor.wait_for_clipboard_data(lease.sequence, 5)
+                    return imported == selection and data == f"|{selection}|"
+
+            start_time = time.perf_counter()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=n_sessions) as executor:
+                results = list(executor.map(extract, range(n_queries)))
+            elapsed = time.perf_counter() - start_time
+            # Attese per l'uso della clipboard (o dell'intera estrazione)
+            summary = {**broker.get_summary(), **session_broker.get_summary()}
+            wait_total = sum(stats["wait_total"] for stats in summary.values())
+            rows.append({"Sessioni": n_sessions, "Concessione": mode, "Tempo (s)": round(elapsed, 2),
+                         "Attesa totale (s)": round(wait_total, 2),
+                         "Attesa max (ms)": round(max(stats["wait_max"] for stats in summary.values()) * 1000, 1),
+                         "Dati corretti": all(results)})
+    return pd.DataFrame(rows)
+
+
+BENCHMARKS = {
+    "grid": benchmark_grid_reader,
+    "file": benchmark_file_reader,
+    "parser": benchmark_parser,
+    "memory": benchmark_memory,
+    "clipboard": benchmark_clipboard,
+    "broker": benchmark_broker,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark delle letture dei risultati SAP (sessione simulata)")
+    parser.add_argument("benchmark", choices=list(BENCHMARKS), nargs="*", default=list(BENCHMARKS))
+    parser.add_argument("--sizes", type=int, nargs="+", help="Numero di righe (default del benchmark)")
+    args = parser.parse_args()
+    pd.set_option("display.width", 200)
+    for name in args.benchmark:
+        kwargs = {"sizes": args.sizes} if args.sizes else {}
+        print(f"\n=== Benchmark {name} ===")
+        print(BENCHMARKS[name](**kwargs).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+
+class ExtractionCache:
+    """
+    Cache su disco dei risultati delle estrazioni IH06 e IFLO.
+
+    Ogni risultato è salvato in un file pickle il cui nome deriva da tipo di estrazione,
+    da un hash di (sistema, mandante, lingua) e da un hash della selezione. Un risultato
+    è valido finché la sua età non supera il TTL.
+    """
+
+    def __init__(self, directory: str, ttl: float, context: Tuple[str, str, str]):
+        """
+        Args:
+            directory: Cartella dei file di cache
+            ttl: Durata di validità dei risultati in secondi
+            context: Sistema, mandante e lingua della sessione SAP
+        """
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.context = tuple(str(value) for value in context)
+        # Prefisso comune ai file del sistema/mandante/lingua (invalidate elimina solo questi)
+        self.context_digest = hashlib.sha1(json.dumps(self.context, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def selection_values(selection: Union[str, Iterable[str]]) -> List[str]:
+        """
+        Valori distinti e ordinati della selezione (l'ordine di inserimento non cambia il risultato)
+
+        Args:
+            selection: Pattern, lista di FL separate da '\\r\\n' oppure elenco di valori
+        """
+        if isinstance(selection, str):
+            selection = selection.split('\r\n')
+        return sorted({str(value).strip().upper() for value in selection if str(value).strip()})
+
+    def path(self, kind: str, selection: Union[str, Iterable[str]]) -> Path:
+        """
+        Percorso del file di cache per il tipo di estrazione e la selezione indicati
+        """
+        key = json.dumps([kind, *self.context, self.selection_values(selection)], ensure_ascii=False)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.directory / f"{kind}_{self.context_digest}_{digest}.pkl"
+
+    def get(self, kind: str, selection: Union[str, Iterable[str]]) -> Optional[pd.DataFrame]:
+        """
+        Restituisce il risultato memorizzato se ancora valido
+
+        Args:
+            kind: Tipo di estrazione ('IH06' oppure 'IFLO')
+            selection: Selezione dell'estrazione
+
+        Returns:
+            pd.DataFrame: Risultato memorizzato oppure None (assente, scaduto o non leggibile)
+        """
+        path = self.path(kind, selection)
+        df = None
+        try:
+            age = time.time() - path.stat().st_mtime
+        except OSError:
+            age = None
+        if age is not None and age <= self.ttl:
+            try:
+                df = pd.read_pickle(path)
+            except Exception as e:
+                # File troncato o danneggiato (pickle.UnpicklingError, EOFError, ...): il risultato
+                # viene eliminato ed estratto di nuovo da SAP
+                print(f"Cache {kind}: file non leggibile eliminato ({type(e).__name__}: {e})")
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+        with self.lock:
+            if df is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if df is not None:
+            print(f"💾 Cache {kind}: risultato riutilizzato ({len(df)} righe, età {age / 60:.0f} min)")
+        return df
+
+    def put(self, kind: str, selection: Union[str, Iterable[str]], df: pd.DataFrame) -> None:
+        """
+        Memorizza il risultato di un'estrazione
+
+        Args:
+            kind: Tipo di estrazione ('IH06' oppure 'IFLO')
+            selection: Selezione dell'estrazione
+            df: Risultato da memorizzare
+        """
+        path = self.path(kind, selection)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Scrittura su file temporaneo e sostituzione: un lettore non vede mai un file incompleto
+            temp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+            df.to_pickle(temp_path)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Errore durante il salvataggio nella cache: {e}")
+
+    def invalidate(self, kind: Optional[str] = None, all_contexts: bool = False) -> int:
+        """
+        Elimina i risultati memorizzati del sistema, mandante e lingua della cache
+
+        Args:
+            kind: Tipo di estrazione da eliminare (default: tutti)
+            all_contexts: Se True vengono eliminati i risultati di tutti i sistemi e mandanti
+
+        Returns:
+            int: Numero di risultati eliminati
+        """
+        removed = 0
+        if not self.directory.exists():
+            return removed
+        pattern = f"{kind or '*'}_*.pkl" if all_contexts else f"{kind or '*'}_{self.context_digest}_*.pkl"
+        for path in self.directory.glob(pattern):
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+class LayoutCache:
+    """
+    Riga dei layout ALV nella finestra di scelta del layout, per sistema, mandante e utente.
+
+    Le righe vengono salvate in un file JSON (se indicato) e riutilizzate nelle esecuzioni
+    successive; una riga memorizzata va sempre verificata leggendo la cella prima dell'uso.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: File JSON delle righe memorizzate (None = solo in memoria)
+        """
+        self.path = Path(path) if path else None
+        self.lock = threading.Lock()
+        self.rows = {}
+        if self.path is not None:
+            try:
+                self.rows = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.rows = {}
+
+    @staticmethod
+    def key(context: Iterable[str], layout: str) -> str:
+        return "|".join([*(str(value) for value in context), layout])
+
+    def get(self, context: Iterable[str], layout: str) -> Optional[int]:
+        """
+        Riga memorizzata del layout (None se non nota)
+
+        Args:
+            context: Sistema, mandante e utente della sessione SAP
+            layout: Nome del layout
+        """
+        with self.lock:
+            return self.rows.get(self.key(context, layout))
+
+    def put(self, context: Iterable[str], layout: str, row: int) -> None:
+        """
+        Memorizza la riga del layout e aggiorna il file
+        """
+        with self.lock:
+            self.rows[self.key(context, layout)] = row
+            if self.path is None:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = self.path.with_name(f"{self.path.name}.tmp")
+                temp_path.write_text(json.dumps(self.rows, indent=1), encoding="utf-8")
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                print(f"Errore durante il salvataggio delle righe dei layout: {e}")
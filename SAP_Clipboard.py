@@ -0,0 +1,302 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import win32clipboard
+except ImportError:
+    win32clipboard = None  # Fuori da Windows si può usare solo la clipboard in memoria
+
+
+class ClipboardTransport(ABC):
+    """
+    Accesso alla clipboard basato sul numero di sequenza.
+
+    Ogni scrittura nella clipboard incrementa il numero di sequenza: chi attende i dati esportati
+    da SAP legge il numero prima dell'esportazione e considera validi solo i dati scritti dopo,
+    così il testo rimasto da un'operazione precedente non viene mai letto come nuovo risultato.
+    Le implementazioni devono definire tutti i metodi astratti (verificato alla creazione).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Letture del contenuto (apertura della clipboard) e attese di nuovi dati
+        self.reads = 0
+        self.waits = 0
+
+    @abstractmethod
+    def sequence_number(self) -> int:
+        """
+        Numero di sequenza corrente della clipboard
+        """
+
+    @abstractmethod
+    def read(self) -> Optional[str]:
+        """
+        Testo presente nella clipboard (None se la clipboard non contiene testo)
+        """
+
+    @abstractmethod
+    def write(self, text: str) -> int:
+        """
+        Sostituisce il contenuto della clipboard con il testo indicato
+
+        Returns:
+            int: Numero di sequenza dopo la scrittura
+        """
+
+    @abstractmethod
+    def wait_for_change(self, since: int, timeout: float) -> bool:
+        """
+        Attende una scrittura nella clipboard successiva al numero di sequenza indicato
+
+        Args:
+            since: Numero di sequenza letto prima dell'operazione che scrive nella clipboard
+            timeout: Tempo massimo di attesa in secondi
+
+        Returns:
+            bool: True se la clipboard è stata modificata, False se è scaduto il timeout
+        """
+
+    def read_new_text(self, since: int, timeout: float) -> Optional[str]:
+        """
+        Attende una nuova scrittura e ne restituisce il testo
+
+        Args:
+            since: Numero di sequenza letto prima dell'operazione che scrive nella clipboard
+            timeout: Tempo massimo di attesa in secondi
+
+        Returns:
+            str: Testo scritto dopo `since`; None se la clipboard non è cambiata o non contiene testo
+        """
+        with self.lock:
+            self.waits += 1
+        if not self.wait_for_change(since, timeout):
+            return None
+        text = self.read()
+        return text if text and text.strip() else None
+
+
+class WindowsClipboard(ClipboardTransport):
+    """
+    Clipboard di Windows (win32clipboard).
+
+    L'attesa controlla solo GetClipboardSequenceNumber, che non apre la clipboard: il contenuto
+    viene letto una sola volta, quando SAP ha scritto i nuovi dati.
+    """
+
+    def __init__(self, poll_interval: float = 0.01, open_timeout: float = 2.0):
+        """
+        Args:
+            poll_interval: Intervallo tra due controlli del numero di sequenza in secondi
+            open_timeout: Tempo massimo di attesa se la clipboard è aperta da un altro processo
+        """
+        if win32clipboard is None:
+            raise RuntimeError("win32clipboard non disponibile: usare MemoryClipboard")
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.open_timeout = open_timeout
+
+    def sequence_number(self) -> int:
+        return win32clipboard.GetClipboardSequenceNumber()
+
+    def open(self) -> None:
+        """
+        Apre la clipboard, riprovando finché è occupata da un altro processo (es. SAP che sta scrivendo)
+        """
+        deadline = time.perf_counter() + self.open_timeout
+        while True:
+            try:
+                win32clipboard.OpenClipboard()
+                return
+            except win32clipboard.error:
+                if time.perf_counter() >= deadline:
+                    raise
+                time.sleep(self.poll_interval)
+
+    def read(self) -> Optional[str]:
+        with self.lock:
+            self.reads += 1
+        self.open()
+        try:
+            if not win32clipboard.IsClipboardFormatAvailable(win32clipboard.CF_UNICODETEXT):
+                return None
+            return win32clipboard.GetClipboardData(win32clipboard.CF_UNICODETEXT)
+        finally:
+            win32clipboard.CloseClipboard()
+
+    def write(self, text: str) -> int:
+        self.open()
+        try:
+            win32clipboard.EmptyClipboard()
+            win32clipboard.SetClipboardText(text, win32clipboard.CF_UNICODETEXT)
+        finally:
+            win32clipboard.CloseClipboard()
+        return self.sequence_number()
+
+    def wait_for_change(self, since: int, timeout: float) -> bool:
+        deadline = time.perf_counter() + timeout
+        while self.sequence_number() == since:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+        return True
+
+
+class MemoryClipboard(ClipboardTransport):
+    """
+    Clipboard in memoria con la stessa interfaccia di WindowsClipboard.
+
+    Permette di eseguire e misurare il codice di estrazione senza Windows (sessioni simulate,
+    benchmark): le attese si risvegliano alla scrittura, senza controlli periodici.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.changed = threading.Condition()
+        self.text: Optional[str] = None
+        self.sequence = 0
+
+    def sequence_number(self) -> int:
+        with self.changed:
+            return self.sequence
+
+    def read(self) -> Optional[str]:
+        with self.lock:
+            self.reads += 1
+        with self.changed:
+            return self.text
+
+    def write(self, text: str) -> int:
+        with self.changed:
+            self.text = text
+            self.sequence += 1
+            self.changed.notify_all()
+            return self.sequence
+
+    def wait_for_change(self, since: int, timeout: float) -> bool:
+        with self.changed:
+            return self.changed.wait_for(lambda: self.sequence != since, timeout)
+
+
+class ClipboardLease:
+    """
+    Uso esclusivo della clipboard concesso da ClipboardBroker
+    """
+
+    def __init__(self, clipboard: ClipboardTransport, label: str, wait: float):
+        self.clipboard = clipboard
+        self.label = label
+        # Attesa prima della concessione in secondi
+        self.wait = wait
+        # Numero di sequenza alla concessione: i dati scritti da SAP durante la concessione sono successivi
+        self.sequence = clipboard.sequence_number()
+
+
+class ClipboardBroker:
+    """
+    Serializza l'uso della clipboard tra le sessioni SAP elaborate in parallelo.
+
+    La clipboard di sistema è unica: ogni coppia "copia della selezione -> importazione in SAP" e
+    "esportazione SAP -> lettura" viene eseguita con una concessione esclusiva (lease), mentre il resto
+    dell'estrazione (navigazione, esecuzione della selezione, analisi dei dati) prosegue in parallelo
+    sulle altre sessioni. Per ogni etichetta vengono registrate l'attesa e la durata delle concessioni.
+    """
+
+    def __init__(self, clipboard: ClipboardTransport, lease_timeout: float = 600.0):
+        """
+        Args:
+            clipboard: Clipboard condivisa
+            lease_timeout: Tempo massimo di attesa di una concessione in secondi
+        """
+        self.clipboard = clipboard
+        self.lease_timeout = lease_timeout
+        self.lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.waits: Dict[str, List[float]] = defaultdict(list)
+        self.holds: Dict[str, List[float]] = defaultdict(list)
+
+    @contextmanager
+    def lease(self, label: str) -> Iterator[ClipboardLease]:
+        """
+        Concessione esclusiva della clipboard per la durata del blocco with
+
+        Args:
+            label: Etichetta con cui registrare attesa e durata (es. 'IH06_esportazione')
+
+        Raises:
+            TimeoutError: Se la clipboard resta occupata oltre lease_timeout
+        """
+        start_time = time.perf_counter()
+        if not self.lock.acquire(timeout=self.lease_timeout):
+            raise TimeoutError(f"Clipboard occupata da oltre {self.lease_timeout:.0f} s ({label})")
+        granted = time.perf_counter()
+        try:
+            yield ClipboardLease(self.clipboard, label, granted - start_time)
+        finally:
+            released = time.perf_counter()
+            self.lock.release()
+            with self.stats_lock:
+                self.waits[label].append(granted - start_time)
+                self.holds[label].append(released - granted)
+
+    def get_summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Restituisce le statistiche delle concessioni
+
+        Returns:
+            Dict[str, Dict[str, float]]: Per etichetta numero di concessioni, attesa totale, media e
+                massima, durata totale delle concessioni (tempi in secondi)
+        """
+        with self.stats_lock:
+            return {
+                label: {
+                    "count": len(waits),
+                    "wait_total": sum(waits),
+                    "wait_mean": sum(waits) / len(waits),
+                    "wait_max": max(waits),
+                    "hold_total": sum(self.holds[label]),
+                }
+                for label, waits in self.waits.items() if waits
+            }
+
+    def reset(self) -> None:
+        """
+        Azzera le statistiche delle concessioni
+        """
+        with self.stats_lock:
+            self.waits.clear()
+            self.holds.clear()
+
+
+_system_clipboard: Optional[ClipboardTransport] = None
+_system_broker: Optional[ClipboardBroker] = None
+_system_clipboard_lock = threading.Lock()
+
+
+def system_clipboard() -> ClipboardTransport:
+    """
+    Clipboard del processo, condivisa da tutti gli extractor: WindowsClipboard se win32clipboard
+    è disponibile, altrimenti MemoryClipboard
+    """
+    global _system_clipboard
+    with _system_clipboard_lock:
+        if _system_clipboard is None:
+            _system_clipboard = WindowsClipboard() if win32clipboard is not None else MemoryClipboard()
+        return _system_clipboard
+
+
+def system_broker() -> ClipboardBroker:
+    """
+    Broker della clipboard del processo, condiviso da tutti gli extractor e da tutte le sessioni
+    """
+    global _system_broker
+    clipboard = system_clipboard()
+    with _system_clipboard_lock:
+        if _system_broker is None:
+            _system_broker = ClipboardBroker(clipboard)
+        return _system_broker
@@ -0,0 +1,45 @@
+from typing import List, Optional, Tuple
+
+
+def grid_columns(grid) -> List[str]:
+    """
+    Identificativi delle colonne di una GuiGridView nell'ordine di visualizzazione (layout)
+
+    Args:
+        grid: GuiGridView (ALV)
+    """
+    return [grid.ColumnOrder(i) for i in range(grid.ColumnCount)]
+
+
+def read_grid(grid, columns: Optional[List[str]] = None,
+              page_size: Optional[int] = None) -> Tuple[List[str], List[List[str]]]:
+    """
+    Legge il contenuto di una GuiGridView (ALV) senza passare dall'esportazione in clipboard.
+
+    La griglia carica dal server solo le righe visualizzate: le righe vengono lette a pagine,
+    impostando FirstVisibleRow per forzarne il caricamento, e per ogni pagina i valori vengono
+    letti colonna per colonna con GetCellValue.
+
+    Args:
+        grid: GuiGridView (ALV)
+        columns: Identificativi delle colonne da leggere (default: tutte, nell'ordine del layout)
+        page_size: Righe lette per ogni scorrimento (default: righe visibili della griglia)
+
+    Returns:
+        Tuple[List[str], List[List[str]]]:
+            - Intestazioni delle colonne (titoli visualizzati)
+            - Valori di ogni colonna (una lista per colonna, nell'ordine delle righe)
+    """
+    columns = list(columns) if columns is not None else grid_columns(grid)
+    titles = [grid.GetDisplayedColumnTitle(column) for column in columns]
+    row_count = grid.RowCount
+    page_size = page_size or max(1, grid.VisibleRowCount)
+    values: List[List[str]] = [[] for _ in columns]
+    get_cell_value = grid.GetCellValue
+    for start in range(0, row_count, page_size):
+        # Lo scorrimento carica le righe della pagina dal server
+        grid.FirstVisibleRow = start
+        rows = range(start, min(start + page_size, row_count))
+        for column, column_values in zip(columns, values):
+            column_values.extend(get_cell_value(row, column) for row in rows)
+    return titles, values
@@ -0,0 +1,157 @@
+import threading
+from typing import Any, Dict
+
+
+# Metodi dei GuiComponent che provocano un round trip verso il server e possono cambiare videata
+SCREEN_ACTIONS = {
+    "sendvkey", "press", "select", "click", "doubleclick", "clickcurrentcell",
+    "doubleclickcurrentcell", "pressbutton", "presstoolbarbutton", "pressenter",
+    "selectcontextmenuitem", "selectnode", "doubleclicknode", "close",
+}
+
+# Elementi della finestra principale che restano validi al cambio di videata
+PERSISTENT_IDS = {"wnd[0]", "wnd[0]/tbar[0]/okcd", "wnd[0]/sbar"}
+
+
+class HandleStats:
+    """
+    Contatori (condivisibili tra più sessioni) delle ricerche findById
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lookups = 0        # Chiamate a findById ricevute dal wrapper
+        self.hits = 0           # Chiamate servite dalla cache senza chiamata COM
+        self.com_lookups = 0    # findById eseguite realmente su SAP GUI
+        self.screen_checks = 0  # Letture di transazione e numero videata (2 chiamate COM ciascuna)
+        self.invalidations = 0  # Svuotamenti della cache per cambio videata
+        self.stale_retries = 0  # Handle non più validi risolti di nuovo
+
+    def add(self, counter: str, value: int = 1) -> None:
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + value)
+
+    @property
+    def com_calls_saved(self) -> int:
+        """
+        Chiamate COM risparmiate al netto delle verifiche di videata
+        """
+        return self.hits - 2 * self.screen_checks - self.stale_retries
+
+    def summary(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "com_lookups": self.com_lookups,
+                "screen_checks": self.screen_checks,
+                "invalidations": self.invalidations,
+                "stale_retries": self.stale_retries,
+                "com_calls_saved": self.com_calls_saved,
+            }
+
+
+class CachedSession:
+    """
+    Wrapper della sessione SAP che memorizza i GuiComponent restituiti da findById.
+
+    La cache è associata alla videata corrente (transazione + numero videata). Dopo ogni azione
+    che può cambiare videata (sendVKey, press, select, ...) la videata viene riletta alla prima
+    findById successiva e, se è cambiata, la cache viene svuotata.
+    Gli elementi di PERSISTENT_IDS (finestra, campo comandi, status bar) non dipendono dalla
+    videata e vengono restituiti senza rileggerla.
+    Tutti gli altri attributi (info, Busy, createSession, ...) sono quelli della sessione originale.
+    """
+
+    def __init__(self, session, stats: HandleStats = None):
+        """
+        Args:
+            session: Sessione SAP GUI (o simulata)
+            stats: Contatori da aggiornare (default: contatori propri)
+        """
+        self._session = session
+        self.stats = stats if stats is not None else HandleStats()
+        self._handles: Dict[str, "CachedComponent"] = {}
+        self._persistent: Dict[str, "CachedComponent"] = {}
+        self._screen_key = None
+        self._screen_dirty = True
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._session, name)
+
+    def findById(self, element_id: str, *args) -> "CachedComponent":
+        self.stats.add("lookups")
+        if element_id in PERSISTENT_IDS:
+            handles = self._persistent
+        else:
+            if self._screen_dirty:
+                self._check_screen()
+            handles = self._handles
+        handle = handles.get(element_id)
+        if handle is not None:
+            self.stats.add("hits")
+            return handle
+        handle = CachedComponent(self, element_id, self._resolve(element_id, *args))
+        handles[element_id] = handle
+        return handle
+
+    def invalidate(self) -> None:
+        """
+        Segnala che la videata potrebbe essere cambiata
+        """
+        self._screen_dirty = True
+
+    def _resolve(self, element_id: str, *args) -> Any:
+        self.stats.add("com_lookups")
+        return self._session.findById(element_id, *args)
+
+    def _check_screen(self) -> None:
+        info = self._session.info
+        screen_key = (info.transaction, info.screenNumber)
+        self.stats.add("screen_checks")
+        if screen_key != self._screen_key:
+            if self._handles:
+                self.stats.add("invalidations")
+            self._handles.clear()
+            self._screen_key = screen_key
+        self._screen_dirty = False
+
+
+class CachedComponent:
+    """
+    GuiComponent memorizzato nella cache di CachedSession.
+
+    Se l'handle non è più valido (il controllo è stato ricreato da SAP GUI) l'elemento viene
+    risolto di nuovo con findById e l'operazione ripetuta una volta.
+    """
+
+    def __init__(self, owner: CachedSession, element_id: str, component: Any):
+        object.__setattr__(self, "_owner", owner)
+        object.__setattr__(self, "_element_id", element_id)
+        object.__setattr__(self, "_component", component)
+
+    def _refresh(self) -> None:
+        self._owner.stats.add("stale_retries")
+        object.__setattr__(self, "_component", self._owner._resolve(self._element_id))
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            attr = getattr(self._component, name)
+        except Exception:
+            self._refresh()
+            attr = getattr(self._component, name)
+        if callable(attr) and name.lower() in SCREEN_ACTIONS:
+            def action(*args, **kwargs):
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    self._owner.invalidate()
+            return action
+        return attr
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        try:
+            setattr(self._component, name, value)
+        except Exception:
+            self._refresh()
+            setattr(self._component, name, value)
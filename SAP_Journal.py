@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# Età oltre la quale un giornale non viene più ripreso (i valori in SAP potrebbero essere cambiati)
+RESUME_MAX_AGE = timedelta(hours=24)
+
+
+def selection_digest(keys: Iterable[str]) -> str:
+    """
+    Impronta delle chiavi di selezione delle FL (l'ordine non conta), per riconoscere un giornale
+    creato con una selezione diversa
+    """
+    text = json.dumps(sorted(str(key).strip() for key in keys), ensure_ascii=False)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+class UpdateJournal:
+    """
+    Giornale append-only (JSONL) degli esiti di update_FL.
+
+    Dopo il salvataggio di ogni FL viene scritta una riga con Result, Result_txt e valori N_*,
+    forzando la scrittura su disco. Se l'elaborazione si interrompe (crash di SAP GUI,
+    timeout della sessione) il giornale permette di riprendere saltando le FL già salvate.
+    La prima riga ("Giornale") registra data di creazione e parametri dell'esecuzione.
+    Il file viene letto una sola volta: gli esiti successivi aggiornano anche la copia in memoria.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Percorso del file di giornale
+        """
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self._file = None
+        # Ultimo esito di ogni FL e intestazione, letti dal file al primo utilizzo
+        self._records: Optional[Dict[str, Dict[str, str]]] = None
+        self._info: Optional[Dict[str, str]] = None
+
+    def _read(self) -> None:
+        """
+        Legge il file una sola volta (da chiamare con il lock acquisito)
+        """
+        if self._records is not None:
+            return
+        records = {}
+        info = None
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Riga troncata da un'interruzione durante la scrittura
+                        continue
+                    if "Giornale" in record:
+                        info = record["Giornale"]
+                        continue
+                    fl = record.pop("Sede tecnica", None)
+                    timestamp = record.pop("Timestamp", None)
+                    if info is None and timestamp:
+                        # Giornale senza intestazione: creazione = primo esito registrato
+                        info = {"Creato": timestamp}
+                    if fl:
+                        records[fl] = record
+        self._records = records
+        self._info = info
+
+    def load(self) -> Dict[str, Dict[str, str]]:
+        """
+        Restituisce l'ultimo esito registrato per ogni FL
+
+        Returns:
+            Dict[str, Dict[str, str]]: Codice FL -> valori delle colonne di esito
+        """
+        with self.lock:
+            self._read()
+            return dict(self._records)
+
+    def completed(self) -> Dict[str, Dict[str, str]]:
+        """
+        Restituisce le FL già salvate con successo (Result = 'S')
+
+        Returns:
+            Dict[str, Dict[str, str]]: Codice FL -> valori delle colonne di esito
+        """
+        with self.lock:
+            self._read()
+            return {fl: values for fl, values in self._records.items() if values.get("Result") == "S"}
+
+    def info(self) -> Optional[Dict[str, str]]:
+        """
+        Data di creazione ('Creato') e parametri dell'esecuzione che ha creato il giornale
+
+        Returns:
+            Dict[str, str]: Intestazione del giornale oppure None se il giornale è vuoto
+        """
+        with self.lock:
+            self._read()
+            return dict(self._info) if self._info is not None else None
+
+    def age(self) -> Optional[timedelta]:
+        """
+        Tempo trascorso dalla creazione del giornale (None se il giornale è vuoto)
+        """
+        info = self.info()
+        if info is None:
+            return None
+        try:
+            return datetime.now() - datetime.fromisoformat(info["Creato"])
+        except (KeyError, ValueError):
+            return None
+
+    def start(self, parameters: Dict[str, str]) -> None:
+        """
+        Registra data di creazione e parametri dell'esecuzione; un giornale già iniziato non viene modificato
+
+        Args:
+            parameters: Parametri dell'esecuzione (sistema, mandante, utente, selezione...)
+        """
+        with self.lock:
+            self._read()
+            if self._info is not None:
+                return
+            self._info = {"Creato": datetime.now().isoformat(timespec="seconds")}
+            self._info.update(parameters)
+            self._write(json.dumps({"Giornale": self._info}, ensure_ascii=False) + "\n")
+
+    def append(self, fl: str, values: Dict[str, str]) -> None:
+        """
+        Registra l'esito di una FL e lo rende persistente su disco
+
+        Args:
+            fl: Codice Functional Location
+            values: Valori delle colonne Result, Result_txt e N_*
+        """
+        record = {"Sede tecnica": fl, "Timestamp": datetime.now().isoformat(timespec="seconds")}
+        record.update(values)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self._read()
+            self._write(line)
+            self._records[fl] = dict(values)
+
+    def _write(self, line: str) -> None:
+        """
+        Accoda una riga e la rende persistente su disco (da chiamare con il lock acquisito)
+        """
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """
+        Chiude il file di giornale
+        """
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def archive(self) -> Optional[Path]:
+        """
+        Chiude il giornale e lo rinomina con un timestamp, così la prossima esecuzione riparte da zero
+
+        Returns:
+            Path: Percorso del giornale archiviato o None se il giornale non esiste
+        """
+        self.close()
+        with self.lock:
+            self._records = {}
+            self._info = None
+        if not self.path.exists():
+            return None
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        archived = self.path.with_name(f"{self.path.stem}_{timestamp}{self.path.suffix}")
+        self.path.rename(archived)
+        return archived
@@ -0,0 +1,303 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+import SAP_Journal
+import SAP_Retry
+import SAP_Transactions
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None  # Senza openpyxl i blocchi estratti non possono essere scritti in Excel
+
+# Colonne necessarie per aggiornare (e rielaborare) una FL in IL02
+KEY_COLUMNS = ["Sede tecnica", "Definizione della sede tecnica"]
+
+
+class ExcelChunkWriter:
+    """
+    Scrittura di un file Excel a blocchi (openpyxl in modalità write-only).
+
+    Le righe di ogni blocco vengono scritte su disco appena ricevute: la memoria occupata
+    non dipende dal numero di righe del file.
+    """
+
+    def __init__(self, path: str, sheet_name: str = "Sheet1"):
+        """
+        Args:
+            path: Percorso del file .xlsx da creare
+            sheet_name: Nome del foglio
+        """
+        if Workbook is None:
+            raise RuntimeError("openpyxl non disponibile: impossibile scrivere il file Excel")
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(sheet_name)
+        self.columns: Optional[List[str]] = None
+        self.rows = 0
+
+    def append(self, df: pd.DataFrame) -> None:
+        """
+        Accoda le righe del df (l'intestazione viene scritta con il primo blocco)
+        """
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self.sheet.append(self.columns)
+        values = df[self.columns].astype(object)
+        for row in values.where(values.notna(), "").itertuples(index=False):
+            self.sheet.append(list(row))
+        self.rows += len(df)
+
+    def close(self) -> int:
+        """
+        Salva il file e restituisce il numero di righe scritte
+        """
+        self.workbook.save(self.path)
+        return self.rows
+
+
+class StreamingUpdate:
+    """
+    Pipeline IFLO -> filtro -> IL02 con code limitate.
+
+    Le liste di FL vengono lette da IFLO a blocchi sulla sessione principale; ogni blocco,
+    filtrato da `transform`, viene suddiviso in lotti che le sessioni IL02 aggiornano mentre
+    prosegue l'estrazione dei blocchi successivi. La coda dei lotti ha dimensione limitata:
+    se IL02 è più lento di IFLO l'estrazione si ferma finché i lotti non vengono consumati,
+    così il numero di FL in attesa di aggiornamento non supera queue_size * batch_size.
+    Per il df finale ogni lotto elaborato conserva solo gli esiti e le colonne result_columns:
+    questa parte cresce con il numero di FL aggiornate (una riga per FL del report).
+    Con una sola sessione l'estrazione e l'aggiornamento di ogni blocco si alternano.
+    """
+
+    def __init__(self, extractor: SAP_Transactions.SAPDataExtractor,
+                 transform: Callable[[pd.DataFrame], Optional[pd.DataFrame]],
+                 n_sessions: int = 1, session_manager=None,
+                 journal: Optional[SAP_Journal.UpdateJournal] = None, resume: bool = True,
+                 batch_size: int = 50, queue_size: int = 4,
+                 result_columns: Optional[List[str]] = None):
+        """
+        Args:
+            extractor: Extractor della sessione principale (estrazione IFLO)
+            transform: Funzione df IFLO -> df da aggiornare (rinomina colonne, filtro lingua, pre-check);
+                       None o df vuoto se il blocco non contiene FL da aggiornare
+            n_sessions: Numero di sessioni SAP (la prima estrae, le altre aggiornano)
+            session_manager: Manager delle sessioni, necessario se n_sessions > 1
+            journal: Giornale in cui registrare l'esito di ogni FL (opzionale)
+            resume: Se True le FL già salvate nel giornale non vengono rielaborate
+            batch_size: Numero di FL per lotto IL02
+            queue_size: Numero massimo di lotti in attesa di aggiornamento
+            result_columns: Colonne di ogni lotto conservate per il df finale oltre a KEY_COLUMNS
+                (None = tutte le colonne restituite da transform)
+        """
+        self.extractor = extractor
+        self.transform = transform
+        self.n_sessions = n_sessions
+        self.session_manager = session_manager
+        self.journal = journal
+        self.resume = resume
+        self.batch_size = max(1, batch_size)
+        self.queue_size = max(1, queue_size)
+        self.result_columns = None if result_columns is None else list(dict.fromkeys(KEY_COLUMNS + list(result_columns)))
+        self.lock = threading.Lock()
+        # Lotti elaborati: numero progressivo -> (FL del lotto, esiti)
+        self.results: Dict[int, Tuple[pd.DataFrame, List[SAP_Transactions.FLUpdateRecord]]] = {}
+        self.next_batch = 0
+        # Blocchi IFLO non estratti e relative FL (riportate nel df finale con esito di errore)
+        self.failed_chunks = 0
+        self.failed_FL: List[str] = []
+        self.start_time = 0.0
+        self.time_to_first_update: Optional[float] = None
+        # Tempo di aggiornamento IL02: somma degli intervalli con almeno un lotto in elaborazione,
+        # senza i tempi in cui si attende solo l'estrazione IFLO (confrontabile con update_FL)
+        self.active_batches = 0
+        self.busy_since = 0.0
+        self.update_time = 0.0
+
+    def run(self, fl_lists: Iterable[pd.DataFrame], sticky: bool = True,
+            retry_policy: Optional[SAP_Retry.RetryPolicy] = None) -> Tuple[bool, Optional[pd.DataFrame]]:
+        """
+        Estrae da IFLO e aggiorna in IL02 le FL delle liste indicate
+
+        Args:
+            fl_lists: Liste di FL (colonna 'Sede tecnica'), ad esempio i df di fl_dictionary
+            sticky: Se True si resta in IL02 tra una FL e la successiva
+            retry_policy: Tentativi per le FL con errori transitori (elaborati a fine pipeline)
+
+        Returns:
+            Tuple[bool, pd.DataFrame]: Esito e df delle FL aggiornate con le colonne di update_FL;
+                le FL dei blocchi IFLO non estratti (failed_FL) sono in fondo con Result 'X'
+        """
+        extractor = self.extractor
+        extractor.sticky_IL02 = sticky
+        extractor.read_only = False
+        extractor.step_timings = []
+        self.start_time = time.perf_counter()
+        completed = self.journal.completed() if self.journal is not None and self.resume else {}
+
+        n_available = 1
+        if self.n_sessions > 1 and self.session_manager is not None:
+            n_available = self.session_manager.initialize_sessions(self.n_sessions)
+        batches: "queue.Queue[Optional[Tuple[int, pd.DataFrame]]]" = queue.Queue(maxsize=self.queue_size)
+        consumers = [threading.Thread(target=self.consume, args=(batches, worker_index),
+                                      name=f"SAP_Worker_{worker_index}", daemon=True)
+                     for worker_index in range(1, n_available)]
+        for consumer in consumers:
+            consumer.start()
+        if consumers:
+            extractor.log_message(f"Pipeline IFLO -> IL02: 1 sessione di estrazione, {len(consumers)} sessioni di aggiornamento", "info")
+
+        try:
+            for df_chunk in self.produce(fl_lists):
+                # Le FL già salvate in un'esecuzione interrotta riprendono l'esito dal giornale
+                fl_codes = df_chunk["Sede tecnica"].astype(str).str.strip()
+                resumed = fl_codes.isin(completed.keys())
+                if resumed.any():
+                    self.store(self.new_batch(), df_chunk[resumed],
+                               [SAP_Transactions.FLUpdateRecord.from_dict(completed[fl]) for fl in fl_codes[resumed]],
+                               resumed=True)
+                    df_chunk = df_chunk[~resumed]
+                for start in range(0, len(df_chunk), self.batch_size):
+                    batch = (self.new_batch(), df_chunk.iloc[start:start + self.batch_size])
+                    if not consumers:
+                        self.update_batch(extractor, *batch)
+                    elif not self.put(batches, batch, consumers):
+                        # Nessuna sessione IL02 attiva: aggiorno il lotto sulla sessione principale
+                        self.update_batch(extractor, *batch)
+        finally:
+            for _ in consumers:
+                self.put(batches, None, consumers)
+            for consumer in consumers:
+                consumer.join()
+        # Lotti rimasti in coda perché i worker IL02 si sono interrotti
+        while not batches.empty():
+            item = batches.get_nowait()
+            if item is not None:
+                self.update_batch(extractor, *item)
+
+        if self.failed_chunks:
+            extractor.log_message(f"Pipeline: {self.failed_chunks} blocchi IFLO non estratti, "
+                                  f"{len(self.failed_FL)} FL non aggiornate", "error")
+        if not self.results and not self.failed_FL:
+            extractor.log_message("Pipeline: nessuna FL da aggiornare", "warning")
+            return False, None
+        ordered = [self.results[seq] for seq in sorted(self.results)]
+        df = pd.concat([df_batch for df_batch, _ in ordered], ignore_index=True) if ordered else pd.DataFrame(columns=["Sede tecnica"])
+        records = [record for _, batch_records in ordered for record in batch_records]
+
+        if retry_policy is not None:
+            retry_start = time.perf_counter()
+            extractor.retry_FL(df, records, retry_policy, n_available, self.session_manager, self.journal)
+            self.update_time += time.perf_counter() - retry_start
+        extractor.update_elapsed = self.update_time
+        if self.time_to_first_update is not None:
+            extractor.log_message(f"Pipeline: prima FL aggiornata dopo {self.time_to_first_update:.1f} s", "info")
+        df_result = extractor.records_to_dataframe(df, records)
+        if self.failed_FL:
+            # Le FL dei blocchi non estratti restano nel report (dopo la rielaborazione, che richiede i dati IFLO);
+            # quelle già salvate in un'esecuzione interrotta riprendono l'esito dal giornale
+            df_failed = pd.DataFrame({"Sede tecnica": self.failed_FL})
+            failed_records = [SAP_Transactions.FLUpdateRecord.from_dict(completed[fl]) if fl in completed
+                              else SAP_Transactions.FLUpdateRecord("X", "Errore estrazione IFLO: FL non aggiornata", attempt=0)
+                              for fl in self.failed_FL]
+            df_result = pd.concat([df_result, extractor.records_to_dataframe(df_failed, failed_records)], ignore_index=True)
+        return True, df_result
+
+    def produce(self, fl_lists: Iterable[pd.DataFrame]) -> Iterable[pd.DataFrame]:
+        """
+        Estrae da IFLO le FL a blocchi e restituisce i blocchi filtrati da transform.
+        Le FL già estratte da una lista precedente non vengono lette di nuovo.
+        """
+        extractor = self.extractor
+        chunk_size = max(1, extractor.selection_chunk_size)
+        seen = set()
+        for df_list in fl_lists:
+            fl_codes = df_list["Sede tecnica"].astype(str).str.strip()
+            new_codes = fl_codes[~fl_codes.isin(seen) & ~fl_codes.duplicated()]
+            seen.update(new_codes)
+            for start in range(0, len(new_codes), chunk_size):
+                chunk = pd.DataFrame({"Sede tecnica": new_codes.iloc[start:start + chunk_size].values})
+                success, df = extractor.extract_FL_IFLO(chunk)
+                if not success:
+                    self.failed_chunks += 1
+                    self.failed_FL.extend(chunk["Sede tecnica"])
+                    extractor.log_message(f"Pipeline: errore nell'estrazione IFLO di un blocco di {len(chunk)} FL", "error")
+                    continue
+                df = self.transform(df)
+                if df is not None and not df.empty:
+                    yield df
+
+    def consume(self, batches: queue.Queue, worker_index: int) -> None:
+        """
+        Worker IL02: aggiorna i lotti prelevati dalla coda sulla sessione riservata al worker
+        """
+        with self.session_manager.get_session(worker_index) as session:
+            if session is None:
+                print(f"[Worker {worker_index}] Sessione non disponibile")
+                return
+            worker = self.extractor.spawn(session)
+            while True:
+                item = batches.get()
+                if item is None:
+                    return
+                self.update_batch(worker, *item)
+
+    def put(self, batches: queue.Queue, batch: Optional[Tuple[int, pd.DataFrame]], consumers: List[threading.Thread]) -> bool:
+        """
+        Inserisce un lotto nella coda attendendo finché c'è posto e almeno un worker è attivo
+
+        Returns:
+            bool: False se nessun worker IL02 è più attivo
+        """
+        while any(consumer.is_alive() for consumer in consumers):
+            try:
+                batches.put(batch, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def new_batch(self) -> int:
+        """
+        Numero progressivo del lotto (ordine delle righe nel df finale)
+        """
+        with self.lock:
+            self.next_batch += 1
+            return self.next_batch
+
+    def update_batch(self, worker: SAP_Transactions.SAPDataExtractor, seq: int, df_batch: pd.DataFrame) -> None:
+        """
+        Aggiorna un lotto di FL; un errore della sessione viene registrato sulle FL del lotto
+        """
+        with self.lock:
+            if self.active_batches == 0:
+                self.busy_since = time.perf_counter()
+            self.active_batches += 1
+        try:
+            records = worker.update_FL_rows(df_batch, self.journal)
+        except Exception as e:
+            worker.log_message(f"Errore durante l'aggiornamento del lotto {seq}: {str(e)}", "error")
+            records = [SAP_Transactions.FLUpdateRecord("X", f"Errore sessione: {str(e)}") for _ in range(len(df_batch))]
+        finally:
+            with self.lock:
+                self.active_batches -= 1
+                if self.active_batches == 0:
+                    self.update_time += time.perf_counter() - self.busy_since
+        self.store(seq, df_batch, records)
+
+    def store(self, seq: int, df_batch: pd.DataFrame, records: List[SAP_Transactions.FLUpdateRecord],
+              resumed: bool = False) -> None:
+        """
+        Registra l'esito di un lotto; i lotti ripresi dal giornale (resumed) non sono stati inviati a IL02
+        e non contano per il tempo della prima FL aggiornata
+        """
+        if self.result_columns is not None:
+            df_batch = df_batch[[col for col in self.result_columns if col in df_batch.columns]]
+        with self.lock:
+            self.results[seq] = (df_batch, records)
+            if not resumed and self.time_to_first_update is None and any(record.result for record in records):
+                self.time_to_first_update = time.perf_counter() - self.start_time
@@ -0,0 +1,55 @@
+import re
+from dataclasses import dataclass
+
+# Esito della classificazione di un messaggio della status bar
+RESULT_OK = "ok"
+RESULT_RETRY = "retry"
+RESULT_PERMANENT = "permanent"
+
+# Messaggi transitori (multilingua): FL bloccata da un altro utente o dal sistema, risorse occupate
+RETRYABLE_MESSAGES = {
+    'IT': [r"bloccat", r"in elaborazione da", r"già in elaborazione", r"occupat"],
+    'EN': [r"locked", r"being processed by", r"currently being processed", r"busy"],
+    'PT': [r"bloquead", r"sendo processad", r"ocupad"],
+    'ES': [r"bloquead", r"siendo procesad", r"tratando", r"ocupad"],
+}
+RETRYABLE_PATTERN = re.compile("|".join(p for patterns in RETRYABLE_MESSAGES.values() for p in patterns), re.IGNORECASE)
+
+
+def classify_status(message_type: str, text: str) -> str:
+    """
+    Classifica l'esito di una FL a partire dall'icona e dal testo della status bar
+
+    Args:
+        message_type: Tipo di messaggio ('S', 'W', 'E', 'A', 'I', '' oppure 'X' per errore di scripting)
+        text: Testo del messaggio
+
+    Returns:
+        str: RESULT_OK, RESULT_RETRY (errore transitorio, la FL può essere rielaborata)
+             oppure RESULT_PERMANENT
+    """
+    if message_type == "S":
+        return RESULT_OK
+    if message_type == "X":
+        # Errore della GUI durante la lettura o la navigazione: di solito transitorio
+        return RESULT_RETRY
+    if message_type in ("E", "W", "A") and RETRYABLE_PATTERN.search(text or ""):
+        return RESULT_RETRY
+    return RESULT_PERMANENT
+
+
+@dataclass(slots=True)
+class RetryPolicy:
+    """
+    Numero massimo di tentativi per FL e attesa esponenziale tra i giri di rielaborazione
+    """
+    max_attempts: int = 3
+    base_delay: float = 2.0     # Attesa prima del secondo tentativo (secondi)
+    backoff: float = 2.0        # Fattore di crescita dell'attesa
+    max_delay: float = 60.0     # Attesa massima tra due tentativi (secondi)
+
+    def delay(self, attempt: int) -> float:
+        """
+        Attesa prima del tentativo indicato (attempt >= 2)
+        """
+        return min(self.base_delay * self.backoff ** (attempt - 2), self.max_delay)
@@ -0,0 +1,256 @@
+import threading
+import time
+import concurrent.futures
+import queue
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional, Tuple
+
+try:
+    import pythoncom  # FONDAMENTALE per COM threading
+    import win32com.client
+except ImportError:
+    pythoncom = None  # Se non disponibile si possono usare solo sessioni simulate
+    win32com = None
+
+
+class SAPSessionManager:
+    """
+    Gestisce un gruppo di sessioni SAP GUI da assegnare in modo esclusivo ai worker paralleli.
+
+    Ogni worker riceve un indice univoco e lavora sempre sulla sessione con lo stesso indice,
+    in questo modo due thread non pilotano mai contemporaneamente la stessa sessione.
+    """
+
+    def __init__(self, max_sessions: int = 6, connection_index: int = 0,
+                 session_factory: Optional[Callable[[int], Any]] = None):
+        """
+        Inizializza il manager delle sessioni
+
+        Args:
+            max_sessions: Numero massimo di sessioni (SAP ne consente al massimo 6 per connessione)
+            connection_index: Indice della connessione SAP da utilizzare (default 0)
+            session_factory: Funzione opzionale indice -> sessione, utilizzata al posto di SAP GUI
+                             (ad esempio con le sessioni simulate di SAP_Simulator)
+        """
+        self.max_sessions = max_sessions
+        self.connection_index = connection_index
+        self.session_factory = session_factory
+        self.lock = threading.Lock()
+        self.available_sessions = 0
+
+    def _get_connection(self):
+        """
+        Restituisce l'oggetto connessione SAP GUI per il thread corrente
+        """
+        SapGuiAuto = win32com.client.GetObject('SAPGUI')
+        application = SapGuiAuto.GetScriptingEngine
+        return application.Children(self.connection_index)
+
+    def get_session_count(self) -> int:
+        """
+        Restituisce il numero di sessioni aperte sulla connessione
+
+        Returns:
+            int: Numero di sessioni attive (0 in caso di errore)
+        """
+        if self.session_factory is not None:
+            return self.max_sessions
+        try:
+            return self._get_connection().Children.Count
+        except Exception as e:
+            print(f"ERRORE nel conteggio delle sessioni: {str(e)}")
+            return 0
+
+    def create_new_session(self, timeout: int = 10) -> bool:
+        """
+        Apre una nuova sessione SAP partendo dalla prima sessione della connessione
+
+        Args:
+            timeout: Tempo massimo di attesa in secondi per l'apertura della sessione
+
+        Returns:
+            bool: True se la sessione è stata creata entro il timeout
+        """
+        try:
+            connection = self._get_connection()
+            current_count = connection.Children.Count
+            connection.Children(0).createSession()
+
+            start_time = time.time()
+            while time.time() - start_time < timeout:
+                time.sleep(0.25)
+                if connection.Children.Count > current_count:
+                    print(f"Nuova sessione creata. Sessioni totali: {connection.Children.Count}")
+                    return True
+
+            print(f"ERRORE: Timeout ({timeout}s) nell'apertura della nuova sessione")
+            return False
+
+        except Exception as e:
+            print(f"ERRORE durante la creazione della sessione: {str(e)}")
+            return False
+
+    def initialize_sessions(self, n_sessions: int) -> int:
+        """
+        Apre le sessioni mancanti fino a raggiungere il numero richiesto.
+        Deve essere chiamato dal thread principale prima di avviare i worker.
+
+        Args:
+            n_sessions: Numero di sessioni desiderate
+
+        Returns:
+            int: Numero di sessioni effettivamente utilizzabili (0 in caso di errore)
+        """
+        n_sessions = max(1, min(n_sessions, self.max_sessions))
+        with self.lock:
+            current_count = self.get_session_count()
+            while current_count < n_sessions:
+                if not self.create_new_session():
+                    print(f"Impossibile creare la sessione {current_count + 1}")
+                    break
+                current_count = self.get_session_count()
+
+            self.available_sessions = min(current_count, n_sessions)
+            print(f"Sessioni disponibili per l'elaborazione parallela: {self.available_sessions}")
+            return self.available_sessions
+
+    @contextmanager
+    def get_session(self, worker_index: int):
+        """
+        Context manager che fornisce al thread corrente la sessione riservata al worker
+
+        Args:
+            worker_index: Indice del worker (coincide con l'indice della sessione)
+
+        Yields:
+            object: Sessione SAP o None se non disponibile
+        """
+        if self.session_factory is not None:
+            yield self.session_factory(worker_index)
+            return
+
+        # Ogni thread che usa oggetti COM deve inizializzare COM
+        pythoncom.CoInitialize()
+        try:
+            session = None
+            try:
+                session = self._get_connection().Children(worker_index)
+                _ = session.Info.SystemName  # Test di validità
+            except Exception as e:
+                print(f"[Worker {worker_index}] Sessione non disponibile: {str(e)}")
+                session = None
+            yield session
+        finally:
+            pythoncom.CoUninitialize()
+
+
+def split_in_shards(items: List[Any], n_shards: int) -> List[List[Any]]:
+    """
+    Suddivide una lista in blocchi contigui di dimensione bilanciata
+
+    Args:
+        items: Elementi da suddividere
+        n_shards: Numero di blocchi desiderati
+
+    Returns:
+        List[List[Any]]: Lista dei blocchi non vuoti
+    """
+    n_shards = max(1, min(n_shards, len(items)))
+    size, extra = divmod(len(items), n_shards)
+    shards = []
+    start = 0
+    for i in range(n_shards):
+        end = start + size + (1 if i < extra else 0)
+        shards.append(items[start:end])
+        start = end
+    return [shard for shard in shards if shard]
+
+
+def execute_parallel(manager: SAPSessionManager,
+                     operation: Callable[[Any, Any, int], Any],
+                     shards: List[Any]) -> List[Tuple[bool, Any]]:
+    """
+    Esegue un'operazione SAP su più blocchi di dati in parallelo, una sessione per blocco
+
+    Args:
+        manager: Manager delle sessioni già inizializzato
+        operation: Funzione (session, shard, worker_index) -> risultato
+        shards: Blocchi di dati, uno per worker
+
+    Returns:
+        List[Tuple[bool, Any]]: Per ogni blocco (nello stesso ordine) la coppia
+            (True, risultato) oppure (False, messaggio di errore)
+    """
+    if len(shards) > max(manager.available_sessions, 1):
+        raise ValueError(f"Blocchi ({len(shards)}) superiori alle sessioni disponibili ({manager.available_sessions})")
+
+    def run_worker(worker_index: int, shard: Any) -> Tuple[bool, Any]:
+        with manager.get_session(worker_index) as session:
+            if session is None:
+                return False, "Sessione non disponibile"
+            try:
+                return True, operation(session, shard, worker_index)
+            except Exception as e:
+                print(f"[Worker {worker_index}] ERRORE operazione: {str(e)}")
+                return False, str(e)
+
+    print(f"🚀 Avvio {len(shards)} worker paralleli")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="SAP_Worker") as executor:
+        futures = [executor.submit(run_worker, i, shard) for i, shard in enumerate(shards)]
+        results = [future.result() for future in futures]
+
+    n_ok = sum(1 for ok, _ in results if ok)
+    print(f"📊 Worker completati: {n_ok}/{len(shards)}")
+    return results
+
+
+def execute_queue(manager: SAPSessionManager,
+                  operation: Callable[[Any, Any, int], Any],
+                  items: List[Any], n_workers: int) -> List[Tuple[bool, Any]]:
+    """
+    Esegue un'operazione SAP su ogni elemento distribuendo gli elementi ai worker tramite una coda:
+    ogni worker preleva l'elemento successivo appena termina il precedente, così le operazioni
+    di durata molto diversa (es. espansioni IH06) non sbilanciano il carico tra le sessioni
+
+    Args:
+        manager: Manager delle sessioni già inizializzato
+        operation: Funzione (session, item, worker_index) -> risultato
+        items: Elementi da elaborare
+        n_workers: Numero di worker (al massimo le sessioni disponibili)
+
+    Returns:
+        List[Tuple[bool, Any]]: Per ogni elemento (nello stesso ordine) la coppia
+            (True, risultato) oppure (False, messaggio di errore)
+    """
+    n_workers = max(1, min(n_workers, manager.available_sessions, len(items)))
+    pending = queue.Queue()
+    for position, item in enumerate(items):
+        pending.put((position, item))
+    results: List[Optional[Tuple[bool, Any]]] = [None] * len(items)
+
+    def run_worker(worker_index: int) -> None:
+        with manager.get_session(worker_index) as session:
+            if session is None:
+                print(f"[Worker {worker_index}] Sessione non disponibile")
+                return
+            while True:
+                try:
+                    position, item = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    results[position] = (True, operation(session, item, worker_index))
+                except Exception as e:
+                    print(f"[Worker {worker_index}] ERRORE operazione: {str(e)}")
+                    results[position] = (False, str(e))
+
+    print(f"🚀 Avvio {n_workers} worker paralleli per {len(items)} elementi")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="SAP_Worker") as executor:
+        for future in [executor.submit(run_worker, i) for i in range(n_workers)]:
+            future.result()
+
+    # Elementi rimasti in coda se nessuna sessione era utilizzabile
+    results = [result if result is not None else (False, "Sessione non disponibile") for result in results]
+    n_ok = sum(1 for ok, _ in results if ok)
+    print(f"📊 Elementi completati: {n_ok}/{len(items)}")
+    return results
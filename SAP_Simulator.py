@@ -0,0 +1,418 @@
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+# ============================================================================
+#   Sessione SAP GUI simulata
+# ============================================================================
+# Riproduce il sottoinsieme dello scripting SAP GUI utilizzato da SAP_Transactions
+# (findById, text, sendVKey, press, select, status bar) per poter verificare e misurare
+# le elaborazioni senza un sistema SAP. Ogni round trip verso il server attende `latency` secondi.
+
+IL02_FIELDS = {
+    "EQART": r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102A:SAPLITO0:1020/subSUB_1020A:SAPLITO0:1025/ctxtITOB-EQART",
+    "CODE_SIST": r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102D:SAPLITO0:1080/subXUSR1080:SAPLXTOB:1001/txtIFLOT-CODE_SIST",
+    "CODE_PARTE": r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102D:SAPLITO0:1080/subXUSR1080:SAPLXTOB:1001/txtIFLOT-CODE_PARTE",
+    "CODE_SEZ_PM": r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102D:SAPLITO0:1080/subXUSR1080:SAPLXTOB:1001/txtIFLOT-CODE_SEZ_PM",
+}
+IL02_TAB_T03 = r"wnd[0]/usr/tabsTABSTRIP/tabpT\03"
+IL02_FIELD_RBNR = r"wnd[0]/usr/tabsTABSTRIP/tabpT\03/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102B:SAPLITO0:1062/ctxtITOB-RBNR"
+
+
+class SimulatedInfo:
+    """
+    Equivalente di GuiSessionInfo
+    """
+    def __init__(self, system_name: str = "SIM", client: str = "100",
+                 language: str = "IT", user: str = "SIMUSER"):
+        self.systemName = system_name
+        self.client = client
+        self.language = language
+        self.user = user
+        self.transaction = "SESSION_MANAGER"
+        self.program = "SAPLSMTR_NAVIGATION"
+        self.screenNumber = 100
+
+
+class SimulatedElement:
+    """
+    Base degli elementi di una videata: come in SAP GUI, dopo il cambio di videata
+    il riferimento a un elemento non più presente non è più utilizzabile
+    """
+    alive = True
+
+    def __getattribute__(self, name: str):
+        if name != "alive" and not object.__getattribute__(self, "alive"):
+            raise Exception("The control is no longer available")
+        return object.__getattribute__(self, name)
+
+    def __setattr__(self, name: str, value):
+        if name != "alive" and not self.alive:
+            raise Exception("The control is no longer available")
+        object.__setattr__(self, name, value)
+
+
+class SimulatedField(SimulatedElement):
+    """
+    Campo di input o di output di una videata
+    """
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.caretPosition = 0
+
+    def setFocus(self):
+        pass
+
+
+class SimulatedStatusBar(SimulatedElement):
+    """
+    Status bar della finestra principale (wnd[0]/sbar)
+    """
+    def __init__(self):
+        self.text = ""
+        self.MessageType = ""
+
+    def set(self, message_type: str = "", text: str = ""):
+        self.MessageType = message_type
+        self.text = text
+
+
+class SimulatedAction(SimulatedElement):
+    """
+    Elemento che provoca un round trip: finestra (sendVKey), pulsante (press) o scheda (select)
+    """
+    def __init__(self, callback: Callable[..., None], text: str = ""):
+        self._callback = callback
+        self.text = text
+
+    def press(self):
+        self._callback()
+
+    def select(self):
+        self._callback()
+
+    def sendVKey(self, key: int):
+        self._callback(key)
+
+    def setFocus(self):
+        pass
+
+
+class SimulatedGrid(SimulatedElement):
+    """
+    GuiGridView (ALV) con il contenuto di un df: come in SAP GUI sono disponibili solo
+    le righe caricate scorrendo la griglia (FirstVisibleRow). Ogni chiamata viene contata
+    come chiamata COM; ogni scorrimento attende `latency` secondi.
+    """
+    def __init__(self, df: pd.DataFrame, visible_rows: int = 30, latency: float = 0.0):
+        self._df = df
+        self._values = [df.iloc[:, i].astype(str).tolist() for i in range(len(df.columns))]
+        self._column_ids = [f"COL{i:02d}" for i in range(len(df.columns))]
+        self._loaded = set()
+        self._first_visible_row = 0
+        self.latency = latency
+        self.com_calls = 0
+        self.RowCount = len(df)
+        self.ColumnCount = len(df.columns)
+        self.VisibleRowCount = visible_rows
+        self.FirstVisibleRow = 0
+
+    def __setattr__(self, name: str, value):
+        super().__setattr__(name, value)
+        if name == "FirstVisibleRow":
+            object.__setattr__(self, "com_calls", self.com_calls + 1)
+            page = value // self.VisibleRowCount
+            for loaded_page in (page, (value + self.VisibleRowCount - 1) // self.VisibleRowCount):
+                self._loaded.add(loaded_page)
+            if self.latency:
+                time.sleep(self.latency)
+
+    def ColumnOrder(self, index: int) -> str:
+        self.com_calls += 1
+        return self._column_ids[index]
+
+    def GetDisplayedColumnTitle(self, column: str) -> str:
+        self.com_calls += 1
+        return str(self._df.columns[self._column_ids.index(column)])
+
+    def GetCellValue(self, row: int, column: str) -> str:
+        self.com_calls += 1
+        if row // self.VisibleRowCount not in self._loaded:
+            raise Exception(f"Row {row} not loaded")
+        return self._values[self._column_ids.index(column)][row]
+
+
+def grid_export_text(df: pd.DataFrame) -> str:
+    """
+    Testo prodotto da "Lista > Esporta > File locale > Non convertito" per il contenuto del df
+    (righe di intestazione e separatori come nell'esportazione SE16)
+
+    Args:
+        df: Contenuto della lista
+
+    Returns:
+        str: Testo esportato
+    """
+    widths = [max(len(str(col)), int(df.iloc[:, i].astype(str).str.len().max() or 0)) for i, col in enumerate(df.columns)]
+    separator = "-" * (sum(widths) + len(widths) + 1)
+    def line(values):
+        return "|" + "|".join(str(value).ljust(width) for value, width in zip(values, widths)) + "|"
+    lines = [time.strftime("%d.%m.%Y") + "          Visualizzazione dinamica lista          1", "", separator,
+             line(df.columns), separator]
+    lines.extend(line(row) for row in df.itertuples(index=False))
+    lines.append(separator)
+    return "\r\n".join(lines)
+
+
+def export_to_clipboard(clipboard, text: str, delay: float = 0.0) -> threading.Thread:
+    """
+    Esportazione SAP in clipboard: il testo viene scritto dopo `delay` secondi da un thread separato
+
+    Args:
+        clipboard: Clipboard di destinazione (SAP_Clipboard.MemoryClipboard)
+        text: Testo esportato (es. grid_export_text)
+        delay: Durata simulata dell'esportazione in secondi
+
+    Returns:
+        threading.Thread: Thread dell'esportazione (già avviato)
+    """
+    def export():
+        time.sleep(delay)
+        clipboard.write(text)
+
+    thread = threading.Thread(target=export, name="SAP_Export", daemon=True)
+    thread.start()
+    return thread
+
+
+class SimulatedSAPSession:
+    """
+    Sessione SAP GUI simulata che implementa la transazione IL02
+    """
+
+    def __init__(self, fl_master: Dict[str, Dict[str, str]], latency: float = 0.0,
+                 info: Optional[SimulatedInfo] = None):
+        """
+        Args:
+            fl_master: Anagrafica delle FL: codice FL -> valori dei campi
+                       (PLTXT, EQART, CODE_SIST, CODE_PARTE, CODE_SEZ_PM, RBNR).
+                       LOCKED indica per quanti tentativi di apertura la FL risulta bloccata
+            latency: Durata simulata di ogni round trip verso il server in secondi
+            info: Informazioni di sessione (sistema, mandante, lingua, utente)
+        """
+        self.fl_master = fl_master
+        self.latency = latency
+        self.info = info or SimulatedInfo()
+        self.Busy = False
+        self.saved_fl: List[str] = []
+        self.roundtrips = 0
+        self.sbar = SimulatedStatusBar()
+        self.okcd = SimulatedField()
+        self.main_window = SimulatedAction(self._on_enter)
+        self.elements: Dict[str, object] = {}
+        self._set_screen("SESSION_MANAGER", "SAPLSMTR_NAVIGATION", 100, {})
+
+    # ------------------------------------------------------------------
+    # API dello scripting SAP GUI
+    # ------------------------------------------------------------------
+    def findById(self, element_id: str):
+        try:
+            return self.elements[element_id]
+        except KeyError:
+            raise Exception(f"The control could not be found by id: {element_id}")
+
+    # ------------------------------------------------------------------
+    # Gestione videate
+    # ------------------------------------------------------------------
+    def _roundtrip(self):
+        self.roundtrips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _set_screen(self, transaction: str, program: str, screen_number: int,
+                    elements: Dict[str, object]):
+        self.info.transaction = transaction
+        self.info.program = program
+        self.info.screenNumber = screen_number
+        for element in self.elements.values():
+            if element not in (self.main_window, self.okcd, self.sbar):
+                element.alive = False
+        self.elements = {
+            "wnd[0]": self.main_window,
+            "wnd[0]/tbar[0]/okcd": self.okcd,
+            "wnd[0]/sbar": self.sbar,
+        }
+        self.elements.update(elements)
+        self._enter_handler = None
+        self._back_handler = None
+
+    def _on_enter(self, key: int = 0):
+        self._roundtrip()
+        command = self.okcd.text.strip()
+        self.okcd.text = ""
+        if command.lower().startswith("/n"):
+            self.sbar.set()
+            self._start_transaction(command[2:].upper())
+        elif key == 3:
+            # F3 (Indietro)
+            self.sbar.set()
+            if self._back_handler is not None:
+                self._back_handler()
+        elif self._enter_handler is not None:
+            self._enter_handler()
+
+    def _start_transaction(self, transaction: str):
+        if transaction == "IL02":
+            self._show_il02_initial()
+        else:
+            self._set_screen(transaction, "", 1000, {})
+
+    # ------------------------------------------------------------------
+    # IL02 - Modifica sede tecnica
+    # ------------------------------------------------------------------
+    def _show_il02_initial(self):
+        self._set_screen("IL02", "SAPMILO0", 1110, {"wnd[0]/usr/ctxtIFLO-TPLNR": SimulatedField()})
+        self._enter_handler = self._il02_open
+
+    def _il02_open(self):
+        fl = self.elements["wnd[0]/usr/ctxtIFLO-TPLNR"].text.strip()
+        if fl not in self.fl_master:
+            self.sbar.set("E", f"La sede tecnica {fl} non esiste")
+            return
+        if self.fl_master[fl].get("LOCKED", 0) > 0:
+            self.fl_master[fl]["LOCKED"] -= 1
+            self.sbar.set("E", f"La sede tecnica {fl} è bloccata dall'utente ALTROUTENTE")
+            return
+        self.sbar.set()
+        self._show_il02_detail(fl)
+
+    def _show_il02_detail(self, fl: str):
+        data = self.fl_master[fl]
+        elements = {
+            "wnd[0]/usr/txtIFLO-PLTXT": SimulatedField(data.get("PLTXT", "")),
+            IL02_TAB_T03: SimulatedAction(lambda: self._il02_select_tab(fl)),
+            "wnd[0]/tbar[0]/btn[11]": SimulatedAction(lambda: self._il02_save(fl)),
+        }
+        for key, element_id in IL02_FIELDS.items():
+            elements[element_id] = SimulatedField(data.get(key, ""))
+        self._set_screen("IL02", "SAPMILO0", 2100, elements)
+        self._enter_handler = lambda: self.sbar.set()
+        self._back_handler = self._show_il02_initial
+
+    def _il02_select_tab(self, fl: str):
+        self._roundtrip()
+        # Le schede non selezionate non sono più raggiungibili con findById
+        for element_id in IL02_FIELDS.values():
+            element = self.elements.pop(element_id, None)
+            if element is not None:
+                element.alive = False
+        self.elements[IL02_FIELD_RBNR] = SimulatedField(self.fl_master[fl].get("RBNR", ""))
+
+    def _il02_save(self, fl: str):
+        self._roundtrip()
+        self.fl_master[fl]["PLTXT"] = self.elements["wnd[0]/usr/txtIFLO-PLTXT"].text
+        self.saved_fl.append(fl)
+        # Dopo il salvataggio IL02 torna alla videata iniziale
+        self._show_il02_initial()
+        self.sbar.set("S", f"Sede tecnica {fl} salvata")
+
+
+class SimulatedSessionFactory:
+    """
+    Crea (una volta per indice) le sessioni simulate richieste da SAPSessionManager
+    """
+
+    def __init__(self, fl_master: Dict[str, Dict[str, str]], latency: float = 0.0):
+        self.fl_master = fl_master
+        self.latency = latency
+        self.sessions: Dict[int, SimulatedSAPSession] = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, index: int) -> SimulatedSAPSession:
+        with self.lock:
+            if index not in self.sessions:
+                self.sessions[index] = SimulatedSAPSession(self.fl_master, self.latency)
+            return self.sessions[index]
+
+
+def generate_fl_master(n_fl: int, parent: str = "ESS-ESND") -> Dict[str, Dict[str, str]]:
+    """
+    Genera un'anagrafica di FL fittizie
+
+    Args:
+        n_fl: Numero di FL da generare
+        parent: Prefisso comune delle FL
+
+    Returns:
+        Dict[str, Dict[str, str]]: Codice FL -> valori dei campi
+    """
+    master = {}
+    for i in range(n_fl):
+        fl = f"{parent}-{i // 100:02d}-{i % 100:03d}"
+        master[fl] = {
+            "PLTXT": f"Sede tecnica {i}",
+            "EQART": f"EQ{i % 7}",
+            "CODE_SIST": f"S{i % 5}",
+            "CODE_PARTE": f"P{i % 3}",
+            "CODE_SEZ_PM": f"Z{i % 4}",
+            "RBNR": f"CAT{i % 6}",
+        }
+    return master
+
+
+def fl_master_to_dataframe(fl_master: Dict[str, Dict[str, str]], language: str = "IT") -> pd.DataFrame:
+    """
+    Costruisce il df con le colonne prodotte da extract_FL_IFLO (già rinominate in IT)
+
+    Args:
+        fl_master: Anagrafica delle FL
+        language: Lingua da inserire nelle colonne L e L_1
+
+    Returns:
+        pd.DataFrame: Df pronto per update_FL
+    """
+    rows = [{
+        "Sede tecnica": fl,
+        "Definizione della sede tecnica": data["PLTXT"],
+        "L": language,
+        "L_1": language,
+        "Tipologia": data["CODE_SIST"],
+        "Componente": data["CODE_PARTE"],
+        "Sezione": data["CODE_SEZ_PM"],
+        "Tipo ogg.": data["EQART"],
+        "Prof.cat.": data["RBNR"],
+    } for fl, data in fl_master.items()]
+    return pd.DataFrame(rows)
+
+
+def main():
+    """
+    Confronta i tempi di update_FL su 1 e più sessioni simulate
+    """
+    import SAP_Retry
+    import SAP_Sessions
+    import SAP_Transactions
+
+    fl_master = generate_fl_master(200)
+    df = fl_master_to_dataframe(fl_master)
+    for n_sessions, sticky in ((1, False), (1, True), (2, True), (4, True)):
+        # Alcune FL risultano bloccate da un altro utente per uno o due tentativi
+        for i, fl in enumerate(list(fl_master)[::40]):
+            fl_master[fl]["LOCKED"] = 1 + i % 2
+        factory = SimulatedSessionFactory(fl_master, latency=0.002)
+        manager = SAP_Sessions.SAPSessionManager(max_sessions=n_sessions, session_factory=factory)
+        extractor = SAP_Transactions.SAPDataExtractor(factory(0))
+        start_time = time.perf_counter()
+        success, df_result = extractor.update_FL(df, n_sessions=n_sessions, session_manager=manager, sticky=sticky,
+                                               retry_policy=SAP_Retry.RetryPolicy(base_delay=0.05))
+        elapsed = time.perf_counter() - start_time
+        n_ok = int((df_result["Result"] == "S").sum()) if success else 0
+        attempts = df_result["Tentativo"].value_counts().sort_index().to_dict() if success else {}
+        print(f"{n_sessions} sessione/i, sticky={sticky}: {elapsed:.2f} s - {n_ok}/{len(df)} FL salvate, tentativi: {attempts}")
+        extractor.log_step_summary()
+        extractor.log_handle_summary()
+
+if __name__ == "__main__":
+    main()
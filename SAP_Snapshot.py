@@ -0,0 +1,167 @@
+import json
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import pandas as pd
+
+# Posizione della lingua (SPRAS, colonna 'L_1' dopo la rinomina) nel risultato IFLO con il layout CHECK_FL_L:
+# IFLO restituisce una riga per FL e lingua, la chiave di ogni riga è FL + lingua
+LANGUAGE_COLUMN = 3
+# Valori per ogni clausola IN (limite dei parametri SQLite)
+QUERY_CHUNK_SIZE = 500
+# AEDAT è la data del server SAP, che può essere diversa da quella della postazione (fuso orario,
+# estrazione a cavallo della mezzanotte): la data di verifica registrata è anticipata di questo margine
+SERVER_DATE_MARGIN = timedelta(days=1)
+
+
+def checked_on() -> date:
+    """
+    Data di verifica da registrare per le FL estratte ora: data della postazione meno SERVER_DATE_MARGIN,
+    così le modifiche fatte sul server in date non ancora raggiunte dalla postazione vengono rilette
+    """
+    return date.today() - SERVER_DATE_MARGIN
+
+
+def row_keys(df: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+    """
+    FL (prima colonna) e lingua (LANGUAGE_COLUMN) di ogni riga del risultato IFLO
+    """
+    fl_codes = df.iloc[:, 0].astype(str).str.strip()
+    if df.shape[1] > LANGUAGE_COLUMN:
+        languages = df.iloc[:, LANGUAGE_COLUMN].astype(str).str.strip()
+    else:
+        languages = pd.Series("", index=df.index)
+    return fl_codes, languages
+
+
+class SnapshotStore:
+    """
+    Archivio locale (SQLite) dell'ultimo risultato IFLO di ogni FL, per sistema e mandante.
+
+    Per ogni sistema/mandante vengono memorizzate le colonne del risultato; ogni FL e lingua è una riga
+    con i valori in JSON e la data in cui la FL è stata verificata l'ultima volta in SE16. Le estrazioni
+    successive possono chiedere a SE16 solo le FL modificate da quella data e unirle all'archivio
+    con merge_snapshot.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: File del database SQLite
+        """
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self.connect()) as connection, connection:
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(snapshot_rows)")]
+            if columns and "lang" not in columns:
+                # Archivio creato con una riga per FL: le lingue non sono distinguibili, viene ricostruito
+                connection.execute("DROP TABLE snapshot_rows")
+                connection.execute("DROP TABLE IF EXISTS snapshot_meta")
+            connection.execute("CREATE TABLE IF NOT EXISTS snapshot_meta ("
+                               "system TEXT, client TEXT, columns TEXT, "
+                               "PRIMARY KEY (system, client))")
+            connection.execute("CREATE TABLE IF NOT EXISTS snapshot_rows ("
+                               "system TEXT, client TEXT, fl TEXT, lang TEXT, taken_on TEXT, data TEXT, "
+                               "PRIMARY KEY (system, client, fl, lang))")
+
+    def connect(self) -> sqlite3.Connection:
+        # Una connessione per operazione: l'archivio può essere usato da thread diversi
+        return sqlite3.connect(self.path)
+
+    def load(self, system: str, client: str,
+             fl_codes: Optional[Iterable[str]] = None) -> Tuple[Optional[pd.DataFrame], Optional[date]]:
+        """
+        Restituisce le righe memorizzate delle FL e la data di verifica meno recente tra quelle restituite
+
+        Args:
+            system: Sistema SAP
+            client: Mandante
+            fl_codes: FL richieste (default: tutte)
+
+        Returns:
+            Tuple[pd.DataFrame, date]: Righe memorizzate (colonne dell'ultima estrazione) e data
+                (None se non ci sono righe), (None, None) se per il sistema/mandante non esiste un archivio
+        """
+        with self.lock, closing(self.connect()) as connection:
+            meta = connection.execute("SELECT columns FROM snapshot_meta WHERE system = ? AND client = ?",
+                                      (system, client)).fetchone()
+            if meta is None:
+                return None, None
+            query = "SELECT fl, taken_on, data FROM snapshot_rows WHERE system = ? AND client = ?"
+            if fl_codes is None:
+                rows = connection.execute(query, (system, client)).fetchall()
+            else:
+                wanted = list(dict.fromkeys(str(fl).strip() for fl in fl_codes))
+                rows = []
+                for start in range(0, len(wanted), QUERY_CHUNK_SIZE):
+                    chunk = wanted[start:start + QUERY_CHUNK_SIZE]
+                    rows.extend(connection.execute(f"{query} AND fl IN ({', '.join('?' * len(chunk))})",
+                                                   (system, client, *chunk)).fetchall())
+        columns = json.loads(meta[0])
+        df = pd.DataFrame([json.loads(data) for _, _, data in rows], columns=columns)
+        taken_on = min((row[1] for row in rows), default=None)
+        return df, date.fromisoformat(taken_on) if taken_on else None
+
+    def save(self, system: str, client: str, df: pd.DataFrame, taken_on: date, replace: bool = False) -> None:
+        """
+        Inserisce o aggiorna le righe del df (chiave: FL e lingua) con la data dell'estrazione
+
+        Args:
+            system: Sistema SAP
+            client: Mandante
+            df: Risultato IFLO (stesse colonne dell'archivio)
+            taken_on: Data di inizio dell'estrazione
+            replace: Se True le FL memorizzate in precedenza vengono eliminate (es. colonne cambiate)
+        """
+        fl_codes, languages = row_keys(df)
+        values = df.astype(str).values.tolist()
+        rows = [(system, client, fl, lang, taken_on.isoformat(), json.dumps(row, ensure_ascii=False))
+                for fl, lang, row in zip(fl_codes, languages, values)]
+        with self.lock, closing(self.connect()) as connection, connection:
+            if replace:
+                connection.execute("DELETE FROM snapshot_rows WHERE system = ? AND client = ?", (system, client))
+            connection.executemany("INSERT OR REPLACE INTO snapshot_rows (system, client, fl, lang, taken_on, data) "
+                                   "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            connection.execute("INSERT OR REPLACE INTO snapshot_meta (system, client, columns) VALUES (?, ?, ?)",
+                               (system, client, json.dumps(list(df.columns), ensure_ascii=False)))
+
+    def touch(self, system: str, client: str, fl_codes: Iterable[str], taken_on: date) -> None:
+        """
+        Aggiorna la data di verifica delle FL non modificate in SAP (tutte le lingue)
+
+        Args:
+            system: Sistema SAP
+            client: Mandante
+            fl_codes: FL verificate
+            taken_on: Data di inizio dell'estrazione
+        """
+        rows = [(taken_on.isoformat(), system, client, str(fl).strip()) for fl in fl_codes]
+        with self.lock, closing(self.connect()) as connection, connection:
+            connection.executemany("UPDATE snapshot_rows SET taken_on = ? WHERE system = ? AND client = ? AND fl = ?", rows)
+
+
+def merge_snapshot(df_snapshot: pd.DataFrame, df_delta: Optional[pd.DataFrame], fl_codes: Iterable[str]) -> pd.DataFrame:
+    """
+    Unisce all'archivio le righe modificate e restituisce le righe (una per lingua) delle FL richieste
+
+    Args:
+        df_snapshot: Righe memorizzate
+        df_delta: Righe estratte in SE16 (modificate o non presenti nell'archivio); prevalgono sull'archivio.
+            None se non ci sono righe modificate
+        fl_codes: FL richieste, nell'ordine del risultato
+
+    Returns:
+        pd.DataFrame: Le righe di ogni FL richiesta presente nell'archivio o nel delta, nell'ordine delle FL
+    """
+    df = pd.concat([df_snapshot, df_delta], ignore_index=True) if df_delta is not None else df_snapshot.reset_index(drop=True)
+    fl_key, lang_key = row_keys(df)
+    df = df[~pd.DataFrame({"fl": fl_key, "lang": lang_key}).duplicated(keep="last")]
+    codes = pd.Index([str(fl).strip() for fl in fl_codes]).drop_duplicates()
+    position = fl_key[df.index].map(pd.Series(range(len(codes)), index=codes))
+    df = df[position.notna()]
+    return df.iloc[position[df.index].argsort(kind="stable")].reset_index(drop=True)
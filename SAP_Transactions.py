@@ -1,12 +1,108 @@
+import csv
+import io
+import os
+import tempfile
 import time
+import uuid
+import concurrent.futures
+import threading
+import numpy as np
 import pandas as pd
-import pyperclip
-import win32clipboard
 import re
 
 from typing import List, Dict, Optional
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Optional, Tuple, Union
 from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+
+import FL_Data
+import SAP_Cache
+import SAP_Clipboard
+import SAP_Grid
+import SAP_Handles
+import SAP_Journal
+import SAP_Retry
+import SAP_Sessions
+import SAP_Snapshot
+import SAP_Wait
+
+
+@dataclass(slots=True)
+class FLUpdateRecord:
+    """
+    Esito dell'aggiornamento di una FL: una riga delle colonne Result, Result_txt e N_* di update_FL
+    """
+    result: str = ""
+    result_txt: str = ""
+    n_tipologia: str = ""
+    n_componente: str = ""
+    n_sezione: str = ""
+    n_tipo_ogg: str = ""
+    n_prof_cat: str = ""
+    attempt: int = 1
+
+    def to_dict(self) -> Dict[str, str]:
+        """
+        Restituisce i valori con il nome delle colonne del df
+        """
+        return {col: getattr(self, attr) for col, attr in UPDATE_COLUMNS.items()}
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, str]) -> "FLUpdateRecord":
+        """
+        Crea il record dai valori indicizzati con il nome delle colonne del df
+        """
+        return cls(**{attr: values[col] for col, attr in UPDATE_COLUMNS.items() if col in values})
+
+
+# Colonne aggiunte da update_FL (nell'ordine di output) e attributo corrispondente di FLUpdateRecord.
+# Il tentativo è in una colonna separata: Result resta il codice della status bar usato dai controlli su 'S'
+UPDATE_COLUMNS = {
+    "Result": "result",             # Esito della modifica ricavato dalla icona della status bar
+    "Result_txt": "result_txt",     # Messaggio della status bar
+    "N_Tipologia": "n_tipologia",   # Colonne per verificare se i dati vengono aggiornati
+    "N_Componente": "n_componente",
+    "N_Sezione": "n_sezione",
+    "N_Tipo ogg.": "n_tipo_ogg",
+    "N_Prof.cat.": "n_prof_cat",
+    "Tentativo": "attempt",         # Numero del tentativo che ha prodotto l'esito
+}
+
+
+# Testo tra l'ultimo '|' di una riga dati e il primo '|' della riga successiva (spazi, a capo e righe
+# senza '|') e testo dopo l'ultima riga dati (usati da split_export_cells)
+EXPORT_LINE_BREAK = re.compile(r"[ \t\r]*\n(?:[^\n]*\n)*[ \t]*")
+EXPORT_TRAILER = re.compile(r"[ \t\r]*(?:\n[^|]*)?")
+
+
+@dataclass(slots=True)
+class FLStepTiming:
+    """
+    Durata in secondi dei passi IL02 di una FL (None = passo non eseguito)
+    """
+    fl: str
+    navigation: str = ""
+    t_nav: Optional[float] = None     # Apertura della videata iniziale di IL02
+    t_enter: Optional[float] = None   # Inserimento FL e apertura dei dati anagrafici
+    t_desc: Optional[float] = None    # Reinserimento della descrizione e verifica status bar
+    t_read: Optional[float] = None    # Lettura campi ITOB/IFLOT della scheda T\01
+    t_tab: Optional[float] = None     # Cambio scheda T\03 e lettura Prof.cat.
+    t_save: Optional[float] = None    # Salvataggio (btn[11]) e lettura esito
+    t_total: Optional[float] = None
+    attempt: int = 1                  # Tentativo (le rielaborazioni sono riepilogate a parte)
+
+
+# Passi misurati da FLStepTiming e relativa descrizione nel riepilogo
+STEP_COLUMNS = {
+    "t_nav": "Navigazione IL02",
+    "t_enter": "Apertura FL",
+    "t_desc": "Descrizione",
+    "t_read": "Lettura campi",
+    "t_tab": "Scheda T03",
+    "t_save": "Salvataggio",
+    "t_total": "Totale FL",
+}
 
 
 class SAPDataUpLoader:
@@ -47,9 +143,62 @@ class SAPDataExtractor:
     Classe per eseguire estrazioni dati da SAP utilizzando una sessione esistente
     """
 
-    def __init__(self, session, main_window=None):
+    # Tempo massimo di attesa per l'esecuzione di liste ed esportazioni (secondi)
+    LIST_TIMEOUT = 120
+    # Numero massimo di valori inseriti in una selezione multipla IH06/SE16
+    SELECTION_CHUNK_SIZE = 5000
+    # Modalità di lettura delle liste IH06/SE16: esportazione in clipboard, esportazione in un file locale
+    # oppure lettura diretta della griglia ALV (solo SE16 IFLO; IH06 usa la clipboard)
+    READER_CLIPBOARD = "clipboard"
+    READER_FILE = "file"
+    READER_GRID = "grid"
+    # Campo "Modificato il" della videata di selezione SE16 IFLO e formato data dell'utente SAP.
+    # La posizione del campo (I1, I2, ...) dipende dai campi di selezione attivi: viene cercato per nome
+    IFLO_CHANGED_ON_FIELD = "AEDAT"
+    SAP_DATE_FORMAT = "%d.%m.%Y"
+    # Limite superiore delle selezioni per data (dalla data indicata in poi)
+    SAP_DATE_MAX = "31.12.9999"
+    # Righe elaborate per blocco nella lettura dei file esportati
+    EXPORT_CHUNK_ROWS = 20000
+    # Opzioni della finestra di esportazione (formato non convertito / clipboard)
+    EXPORT_OPTION_FILE = "wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[0,0]"
+    EXPORT_OPTION_CLIPBOARD = "wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[4,0]"
+    # Griglia ALV con il risultato di SE16
+    IFLO_GRID_ID = "wnd[0]/usr/cntlGRID1/shellcont/shell"
+
+    def __init__(self, session, main_window=None, waiter: Optional[SAP_Wait.SAPWaiter] = None,
+                 handle_stats: Optional[SAP_Handles.HandleStats] = None):
+        # Gli handle restituiti da findById vengono riutilizzati finché non cambia la videata
+        if not isinstance(session, SAP_Handles.CachedSession):
+            session = SAP_Handles.CachedSession(session, handle_stats)
         self.session = session
+        self.handle_stats = session.stats
         self.main_window = main_window
+        # Valori per selezione multipla: le liste più lunghe vengono suddivise in blocchi
+        self.selection_chunk_size = self.SELECTION_CHUNK_SIZE
+        # Cache su disco dei risultati IH06/IFLO (None = disattivata)
+        self.cache: Optional[SAP_Cache.ExtractionCache] = None
+        # Archivio locale dei risultati IFLO per l'estrazione incrementale (None = estrazione completa)
+        self.snapshot_store: Optional[SAP_Snapshot.SnapshotStore] = None
+        # Riga dei layout ALV nella finestra di scelta (evita la ricerca riga per riga)
+        self.layout_cache = SAP_Cache.LayoutCache()
+        # Lettura delle liste IH06/SE16 (READER_CLIPBOARD, READER_FILE o READER_GRID)
+        self.list_reader = self.READER_CLIPBOARD
+        # Cartella dei file esportati con READER_FILE (eliminati dopo la lettura)
+        self.export_dir = tempfile.gettempdir()
+        # Clipboard del processo (Windows oppure in memoria per le sessioni simulate), condivisa tra le
+        # sessioni parallele con concessioni esclusive per importazione ed esportazione
+        self.clipboard_broker = SAP_Clipboard.system_broker()
+        # Attese adattive della sessione (condivise tra i worker paralleli per le statistiche)
+        self.waiter = waiter if waiter is not None else SAP_Wait.SAPWaiter()
+        # Modalità sticky: tra una FL e la successiva si resta in IL02 senza /nIL02
+        self.sticky_IL02 = True
+        self.IL02_initial_screen = None
+        # Modalità verifica: le FL vengono solo lette in IL02, senza modificare la descrizione e senza salvare
+        self.read_only = False
+        # Durata dei passi IL02 di ogni FL e durata complessiva dell'ultimo update_FL
+        self.step_timings: List[FLStepTiming] = []
+        self.update_elapsed = 0.0
         # Configurazione messaggi multilingua
         self.SAP_MESSAGES = {
             'B_IH06_no_data_result': {
@@ -91,9 +240,41 @@ class SAPDataExtractor:
                 'EN': "CRTE",
                 'PT': "CRI.",
                 'ES': "CREA"
+            },
+            # Descrizioni del campo AEDAT nella videata di selezione SE16
+            'P_IFLO_Changed_On': {
+                'IT': ("Modificato il", "Data modifica"),
+                'EN': ("Changed On",),
+                'PT': ("Modificado em",),
+                'ES': ("Modificado el", "Fecha modificación")
             }
         }         
 
+    def spawn(self, session) -> "SAPDataExtractor":
+        """
+        Extractor per una sessione parallela con le impostazioni scelte dall'utente per questo extractor
+        (lettura delle liste, cache, clipboard, modalità IL02); attese, statistiche degli handle e tempi
+        dei passi IL02 sono condivisi
+
+        Args:
+            session: Sessione SAP del worker
+
+        Returns:
+            SAPDataExtractor: Extractor del worker
+        """
+        worker = SAPDataExtractor(session, self.main_window, self.waiter, self.handle_stats)
+        worker.selection_chunk_size = self.selection_chunk_size
+        worker.list_reader = self.list_reader
+        worker.export_dir = self.export_dir
+        worker.layout_cache = self.layout_cache
+        worker.cache = self.cache
+        worker.snapshot_store = self.snapshot_store
+        worker.clipboard_broker = self.clipboard_broker
+        worker.sticky_IL02 = self.sticky_IL02
+        worker.read_only = self.read_only
+        worker.step_timings = self.step_timings
+        return worker
+
     def check_sap_bar(self, message_bar: str, use_regex: bool = False) -> bool:
         """
         Verifica la presenza di un messaggio SAP nella lingua specificata
@@ -195,23 +376,141 @@ class SAPDataExtractor:
 
     def log_message(self, message, icon_type='info'):
         """Wrapper per il log_message della main window"""
-        if self.main_window:
+        # I widget Qt possono essere aggiornati solo dal thread principale,
+        # i worker delle sessioni parallele scrivono sulla console
+        if self.main_window and threading.current_thread() is threading.main_thread():
             self.main_window.log_message(message, icon_type)
         else:
             print(message)  # Fallback su print
 
-    def extract_FL_list(self, fl: str) -> Tuple[bool, Optional[pd.DataFrame]]:
+    def log_wait_summary(self) -> None:
+        """
+        Riporta la durata reale delle attese della sessione registrate dal waiter
+        """
+        summary = self.waiter.get_summary()
+        if not summary:
+            return
+        print(f"\n⏱️ Attese sessione SAP:")
+        print("-" * 70)
+        for label, stats in summary.items():
+            print(f"{label:<28} n={stats['count']:>5}  media={stats['mean'] * 1000:>7.1f} ms  "
+                  f"max={stats['max'] * 1000:>7.1f} ms  timeout={stats['timeouts']}")
+        total = sum(stats['total'] for stats in summary.values())
+        self.log_message(f"Tempo totale di attesa della sessione: {total:.1f} s", "info")
+
+    def log_clipboard_summary(self) -> None:
+        """
+        Riporta l'attesa delle sessioni per l'uso esclusivo della clipboard
+        """
+        summary = self.clipboard_broker.get_summary()
+        if not summary:
+            return
+        print(f"\n📋 Concessioni clipboard:")
+        print("-" * 70)
+        for label, stats in summary.items():
+            print(f"{label:<20} n={stats['count']:>5}  attesa media={stats['wait_mean'] * 1000:>7.1f} ms  "
+                  f"max={stats['wait_max'] * 1000:>7.1f} ms  occupata={stats['hold_total']:.1f} s")
+        wait_total = sum(stats['wait_total'] for stats in summary.values())
+        self.log_message(f"Attesa totale della clipboard: {wait_total:.1f} s", "info")
+
+    def log_handle_summary(self) -> None:
+        """
+        Riporta le ricerche findById servite dalla cache degli handle e le chiamate COM risparmiate
+        """
+        summary = self.handle_stats.summary()
+        if not summary["lookups"]:
+            return
+        print(f"\n🔎 Cache handle findById:")
+        print("-" * 60)
+        for counter, value in summary.items():
+            print(f"{counter:<20} {value:>8}")
+        hit_rate = summary["hits"] / summary["lookups"] * 100
+        self.log_message(f"findById dalla cache: {summary['hits']}/{summary['lookups']} ({hit_rate:.0f}%), "
+                         f"chiamate COM risparmiate: {summary['com_calls_saved']}", "info")
+
+    def get_step_timings(self) -> pd.DataFrame:
+        """
+        Restituisce la tabella dei tempi dei passi IL02 (una riga per FL, tempi in ms)
+
+        Returns:
+            pd.DataFrame: Colonne 'Sede tecnica', 'Navigazione', 'Tentativo' e una colonna per passo
+        """
+        df = pd.DataFrame(
+            [[timing.fl, timing.navigation, timing.attempt] + [getattr(timing, step) for step in STEP_COLUMNS]
+             for timing in self.step_timings],
+            columns=["Sede tecnica", "Navigazione", "Tentativo"] + list(STEP_COLUMNS.values()),
+        )
+        df[list(STEP_COLUMNS.values())] = df[list(STEP_COLUMNS.values())].astype(float) * 1000
+        return df
+
+    def summarize_step_timings(self, retries: bool = False) -> pd.DataFrame:
+        """
+        Riepilogo dei tempi per passo: p50, p95 e massimo in ms
+
+        Args:
+            retries: Se False riepiloga il primo tentativo di ogni FL, se True le rielaborazioni
+
+        Returns:
+            pd.DataFrame: Una riga per passo con le colonne n, p50_ms, p95_ms, max_ms
+        """
+        df = self.get_step_timings()
+        df = df[(df["Tentativo"] > 1) == retries][list(STEP_COLUMNS.values())]
+        summary = pd.DataFrame({
+            "n": df.count(),
+            "p50_ms": df.quantile(0.50),
+            "p95_ms": df.quantile(0.95),
+            "max_ms": df.max(),
+        })
+        summary.index.name = "Passo"
+        return summary.round(1)
+
+    def log_step_summary(self) -> None:
+        """
+        Riporta il riepilogo dei tempi dei passi IL02, il confronto tra le modalità
+        di navigazione e il numero di FL elaborate al minuto
+        """
+        if not self.step_timings:
+            return
+        print(f"\n⏱️ Tempi dei passi IL02 (ms):")
+        print("-" * 60)
+        print(self.summarize_step_timings().to_string())
+
+        df = self.get_step_timings()
+        first = df[df["Tentativo"] == 1]
+        for navigation, durations in first.groupby("Navigazione")["Totale FL"]:
+            print(f"{navigation:<10} n={len(durations):>5}  media={durations.mean():>8.1f} ms")
+            self.log_message(f"IL02 {navigation}: {len(durations)} FL, media {durations.mean():.0f} ms per FL", "info")
+
+        retried = df[df["Tentativo"] > 1]
+        if not retried.empty:
+            print(f"\n⏱️ Rielaborazioni (ms):")
+            print("-" * 60)
+            print(self.summarize_step_timings(retries=True).to_string())
+            self.log_message(f"Rielaborazioni: {len(retried)} tentativi su {retried['Sede tecnica'].nunique()} FL, "
+                             f"media {retried['Totale FL'].mean():.0f} ms per tentativo", "info")
+
+        if self.update_elapsed > 0:
+            # Ogni FL viene contata una sola volta, anche se rielaborata
+            fl_per_minute = df["Sede tecnica"].nunique() / self.update_elapsed * 60
+            self.log_message(f"FL elaborate al minuto: {fl_per_minute:.1f}", "info")
+
+    def extract_FL_list(self, fl: Union[str, List[str]]) -> Tuple[bool, Optional[pd.DataFrame]]:
         """
         Estrae la lista delle FL 
         
         Args:
-            fl (str): Codice Functional Location
+            fl (str | List[str]): Codice Functional Location (anche con *), lista di FL separate da
+                '\r\n' oppure lista di pattern e FL esatte da inserire in una sola selezione multipla
             
         Returns:
             Tuple[bool, Optional[Dict[str, Optional[str]]]]: 
                 - bool: True se estrazione riuscita, False altrimenti
                 - df: dataframe contenente le informazioni estratte
         """
+        if self.cache is not None:
+            df_cached = self.cache.get("IH06", fl)
+            if df_cached is not None:
+                return True, df_cached
         try:
             # Utilizza transazione IH06
             self.session.findById("wnd[0]/tbar[0]/okcd").text = "/nIH06"
@@ -219,29 +518,37 @@ class SAPDataExtractor:
             # Verifico se la stringa contiene il carattere '*'.
             # - Se lo contiene allora inserisco il valore nel campo delle FL con '*'
             # - Se non lo contiene allora inserisco la stringa nella clipboard per caricare tutti i valori nel campo FL
-            if '*' in fl:
+            # Una lista di valori viene sempre caricata nella selezione multipla (i valori con * diventano pattern)
+            if isinstance(fl, list):
+                fl = '\r\n'.join(fl)
+                multiple = True
+            else:
+                multiple = '*' not in fl
+            if not multiple:
                 self.session.findById("wnd[0]/usr/ctxtSTRNO-LOW").text = fl
             else:
-                if self.copia_in_clipboard(fl):
-                    print("IH06 - Lista Fl copiata nella clipbard con successo.")
-                else:
-                    raise ValueError("Errore durante la copia della lista FL nella clipboard")
-                self.session.findById("wnd[0]/usr/btn%_STRNO_%_APP_%-VALU_PUSH").press()
-                self.session.findById("wnd[1]/tbar[0]/btn[24]").press()
+                # La clipboard è condivisa tra le sessioni parallele: resta riservata fino all'importazione in SAP
+                with self.clipboard_broker.lease("IH06_importazione"):
+                    if self.copia_in_clipboard(fl):
+                        print("IH06 - Lista Fl copiata nella clipbard con successo.")
+                    else:
+                        raise ValueError("Errore durante la copia della lista FL nella clipboard")
+                    self.session.findById("wnd[0]/usr/btn%_STRNO_%_APP_%-VALU_PUSH").press()
+                    self.session.findById("wnd[1]/tbar[0]/btn[24]").press()
                 self.session.findById("wnd[1]/tbar[0]/btn[8]").press()
-                time.sleep(0.25)
+                self.waiter.wait_idle(self.session, "IH06_selezione_multipla", "wnd[0]/usr/ctxtVARIANT")
             self.session.findById("wnd[0]/usr/ctxtVARIANT").text = "CHECK_FL_S"
             # Imposto filtro per escludere le FL con stato diverso da "Creato"
             # Inserisci filtro escludi
             self.session.findById("wnd[0]/usr/ctxtSTAE1-LOW").setFocus()
             self.session.findById("wnd[0]/usr/ctxtSTAE1-LOW").caretPosition = 0
             self.session.findById("wnd[0]").sendVKey(2)
-            time.sleep(0.25)
+            self.waiter.wait_idle(self.session, "IH06_opzioni_selezione", "wnd[1]/usr/cntlOPTION_CONTAINER/shellcont/shell")
             # Selezione opzioni
             self.session.findById("wnd[1]/usr/cntlOPTION_CONTAINER/shellcont/shell").currentCellRow = 5
             self.session.findById("wnd[1]/usr/cntlOPTION_CONTAINER/shellcont/shell").selectedRows = "5"
             self.session.findById("wnd[1]/usr/cntlOPTION_CONTAINER/shellcont/shell").doubleClickCurrentCell()
-            time.sleep(0.25)
+            self.waiter.wait_idle(self.session, "IH06_filtro_stato", "wnd[0]/usr/ctxtSTAE1-LOW")
             # Inserisci stato in base alla lingua
             param_value = self.SAP_PARAMETERS['P_IH06_Status_Created'].get(
                 self.session.info.language, 
@@ -253,7 +560,7 @@ class SAPDataExtractor:
 
             self.session.findById("wnd[0]/tbar[1]/btn[8]").press()
             # attendo il caricamento dei dati
-            time.sleep(0.5)
+            self.waiter.wait_idle(self.session, "IH06_esecuzione", "wnd[0]/sbar", timeout=self.LIST_TIMEOUT)
             ## Verifico se sono stati trovati dati
             # Nessun dato travato
             if self.check_sap_bar('B_IH06_no_data_result'):
@@ -267,40 +574,131 @@ class SAPDataExtractor:
                 # Leggo il valore della definizione sede tecnica e lo inserisco nel df
                 # definizione = self.session.findById("wnd[0]/usr/txtIFLO-PLTXT").text
                 # df_fl["Definizione della sede tecnica"] = definizione
-                return True, df_fl
+                return True, self.store_in_cache("IH06", fl, df_fl)
             # ---------------------------------------------------------
             # Più di un valore trovato
             elif self.check_sap_window('W_IH06_multiple_data_result'):
                 num_elementi = self.session.findById("wnd[0]/usr/cntlGRID1/shellcont/shell").RowCount
-                self.log_message(f"Numero di elementi per la FL {fl if '*' in fl else 'lista'} = {num_elementi}", "info")
-                self.session.findById("wnd[0]/mbar/menu[0]/menu[10]/menu[2]").select()
-                time.sleep(0.5)  
-                self.session.findById("wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[4,0]").select()
-                self.session.findById("wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[4,0]").setFocus()
-                self.session.findById("wnd[1]/tbar[0]/btn[0]").press()
-                # Attendi che SAP sia pronto
-                time.sleep(0.5)
-                # Attendi che la clipboard sia riempita
-                if not self.wait_for_clipboard_data(30):
-                    # Gestisci il caso in cui non sono stati trovati dati
-                    print("Nessun dato trovato nella clipboard")
-                    # Eventuali azioni di fallback
-                # Leggo il contenuto della clipboard
-                fl_data = self.clipboard_data()
+                self.log_message(f"Numero di elementi per la FL {fl if not multiple else 'lista'} = {num_elementi}", "info")
+                if self.list_reader == self.READER_FILE:
+                    df_fl = self.export_list_to_file("wnd[0]/mbar/menu[0]/menu[10]/menu[2]", "IH06")
+                    return True, self.store_in_cache("IH06", fl, df_fl)
+                # La clipboard resta riservata dall'esportazione fino alla lettura dei dati
+                with self.clipboard_broker.lease("IH06_esportazione") as lease:
+                    self.session.findById("wnd[0]/mbar/menu[0]/menu[10]/menu[2]").select()
+                    self.waiter.wait_idle(self.session, "IH06_menu_esporta", "wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[4,0]")
+                    self.session.findById("wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[4,0]").select()
+                    self.session.findById("wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[4,0]").setFocus()
+                    self.session.findById("wnd[1]/tbar[0]/btn[0]").press()
+                    # Attendi che SAP sia pronto
+                    self.waiter.wait_idle(self.session, "IH06_esportazione", timeout=self.LIST_TIMEOUT)
+                    # Leggo i dati esportati: il testo già presente nella clipboard non viene accettato
+                    fl_data = self.wait_for_clipboard_data(lease.sequence, 30)
                 if fl_data is None:
                     raise ValueError(f"Nessun dato presente nella clipboard")
                 result, df_fl = self.clean_data(fl_data) # elimino le prime due righe durante la pulizia dei dati
                 if not result:
                     raise ValueError(f"Errore durante la pulizia dei dati della FL {fl}")
                 else:
-                    return True, df_fl
+                    return True, self.store_in_cache("IH06", fl, df_fl)
         except Exception as e:
             self.log_message(f"Errore durante l'estrazione delle informazioni da FL {fl}: \n{str(e)}")
             return False, None
 
+    def extract_FL_lists(self, queries: List[Union[str, List[str]]], n_sessions: int = 1,
+                         session_manager=None) -> List[Tuple[bool, Optional[pd.DataFrame]]]:
+        """
+        Esegue extract_FL_list per più selezioni (FL con * o liste di FL), distribuendole
+        tra più sessioni SAP. Un errore su una selezione non interrompe le altre.
+
+        Args:
+            queries (List[str | List[str]]): Selezioni da espandere con IH06 (argomento di extract_FL_list)
+            n_sessions (int): Numero di sessioni SAP da utilizzare in parallelo (default 1)
+            session_manager (SAPSessionManager): Manager delle sessioni, necessario se n_sessions > 1
+
+        Returns:
+            List[Tuple[bool, Optional[pd.DataFrame]]]: Esito di extract_FL_list per ogni selezione,
+                nello stesso ordine di queries
+        """
+        n_available = 1
+        if n_sessions > 1 and session_manager is not None and len(queries) > 1:
+            n_available = session_manager.initialize_sessions(min(n_sessions, len(queries)))
+        if n_available <= 1:
+            return [self.extract_FL_list(query) for query in queries]
+
+        self.log_message(f"Espansione IH06 di {len(queries)} selezioni su {n_available} sessioni parallele", "info")
+        # Un extractor per worker, creato alla prima selezione elaborata dal worker
+        workers: Dict[int, SAPDataExtractor] = {}
+
+        def expand_query(session, query, worker_index):
+            if worker_index not in workers:
+                workers[worker_index] = self.spawn(session)
+            return workers[worker_index].extract_FL_list(query)
+
+        results = []
+        for query, (success, result) in zip(queries, SAP_Sessions.execute_queue(session_manager, expand_query, queries, n_available)):
+            if success:
+                results.append(result)
+            else:
+                self.log_message(f"Errore sessione durante l'espansione di {query}: {result}", "error")
+                results.append((False, None))
+        self.log_clipboard_summary()
+        return results
+
+    def extract_FL_selection(self, selections: Dict[str, List[str]], n_sessions: int = 1,
+                             session_manager=None) -> Dict[str, Tuple[bool, Optional[pd.DataFrame]]]:
+        """
+        Espande più chiavi con una sola selezione multipla IH06 (una per sessione se n_sessions > 1,
+        suddivisa in blocchi di selection_chunk_size valori) e ripartisce localmente le FL estratte tra le chiavi
+
+        Args:
+            selections (Dict[str, List[str]]): Chiave -> pattern con * o FL esatte della chiave
+            n_sessions (int): Numero di sessioni SAP da utilizzare in parallelo (default 1)
+            session_manager (SAPSessionManager): Manager delle sessioni, necessario se n_sessions > 1
+
+        Returns:
+            Dict[str, Tuple[bool, Optional[pd.DataFrame]]]: Per ogni chiave (nello stesso ordine) l'esito
+                e le FL estratte; una chiave senza FL estratte è considerata non riuscita
+        """
+        keys = list(selections)
+        n_groups = n_sessions if session_manager is not None else 1
+        groups = SAP_Sessions.split_in_shards(keys, n_groups)
+        # Valori distinti di ogni gruppo di chiavi, nell'ordine di inserimento, suddivisi in blocchi di selection_chunk_size
+        chunk_size = max(1, self.selection_chunk_size)
+        queries, query_group = [], []
+        for group_index, group in enumerate(groups):
+            values = list(dict.fromkeys(value for key in group for value in selections[key]))
+            for start in range(0, len(values), chunk_size):
+                queries.append(values[start:start + chunk_size])
+                query_group.append(group_index)
+        self.log_message(f"Selezione IH06 combinata: {len(keys)} chiavi in {len(queries)} esecuzioni", "info")
+
+        # Liste estratte per gruppo (i blocchi senza risultato non interrompono gli altri)
+        group_frames: Dict[int, List[pd.DataFrame]] = {i: [] for i in range(len(groups))}
+        for group_index, (success, df) in zip(query_group, self.extract_FL_lists(queries, n_sessions, session_manager)):
+            if success:
+                group_frames[group_index].append(df)
+
+        results = {}
+        for group_index, group in enumerate(groups):
+            frames = group_frames[group_index]
+            if not frames:
+                results.update({key: (False, None) for key in group})
+                continue
+            # La prima colonna (codice FL) ha lo stesso nome in tutti i blocchi
+            fl_column = frames[0].columns[0]
+            df = pd.concat([frame.rename(columns={frame.columns[0]: fl_column}) for frame in frames], ignore_index=True)
+            for key, df_key in FL_Data.split_by_pattern(df, {key: selections[key] for key in group}, fl_column).items():
+                results[key] = (True, df_key) if not df_key.empty else (False, None)
+        return {key: results[key] for key in keys}
+
     def extract_FL_IFLO(self, d_fl: pd.DataFrame) -> Tuple[bool, Optional[pd.DataFrame]]:
         """
         Estrae la lista delle FL 
+
+        Le FL vengono inviate a SE16 in blocchi di selection_chunk_size valori. Con più blocchi
+        l'elaborazione è in pipeline: mentre SAP esegue il blocco k, in background vengono preparati
+        i valori del blocco k+1 e analizzati i dati esportati del blocco k-1.
         
         Args:
             d_fl: dataframe contenente le FL da estrarre
@@ -308,12 +706,202 @@ class SAPDataExtractor:
         Returns:
             Tuple[bool, pd.DataFrame]: 
                 - bool: True se estrazione riuscita, False altrimenti
-                - df: dataframe contenente le informazioni estratte
+                - df: dataframe contenente le informazioni estratte (blocchi concatenati nell'ordine)
         """
-           # copio i dati contenuti nel df nella clipboard
-        if not self.copy_values_for_sap_selection(d_fl[["Sede tecnica"]]):
+        selection = d_fl["Sede tecnica"].astype(str)
+        if self.cache is not None:
+            df_cached = self.cache.get("IFLO", selection)
+            if df_cached is not None:
+                return True, df_cached
+        if self.snapshot_store is not None:
+            success, df_fl = self.extract_FL_IFLO_incremental(d_fl)
+        else:
+            success, df_fl = self.read_IFLO(d_fl)
+        return (True, self.store_in_cache("IFLO", selection, df_fl)) if success else (False, None)
+
+    def extract_FL_IFLO_incremental(self, d_fl: pd.DataFrame) -> Tuple[bool, Optional[pd.DataFrame]]:
+        """
+        Estrazione incrementale con l'archivio snapshot_store del sistema/mandante della sessione.
+
+        Le FL già presenti nell'archivio vengono richieste a SE16 solo se modificate (AEDAT) dalla
+        data dell'ultima verifica; le FL non presenti vengono estratte per intero. Le righe estratte
+        aggiornano l'archivio e il risultato viene ricostruito dall'archivio.
+
+        Args:
+            d_fl: dataframe contenente le FL da estrarre
+
+        Returns:
+            Tuple[bool, pd.DataFrame]: Esito e df con le stesse colonne dell'estrazione completa
+        """
+        info = self.session.info
+        system, client = info.systemName, info.client
+        codes = d_fl["Sede tecnica"].astype(str).str.strip()
+        # Data di verifica con margine rispetto alla data del server (AEDAT)
+        checked_on = SAP_Snapshot.checked_on()
+        df_snapshot, taken_on = self.snapshot_store.load(system, client, codes)
+        if df_snapshot is None or df_snapshot.empty:
+            self.log_message("Archivio IFLO senza le FL richieste: estrazione completa", "info")
+            success, df_fl = self.read_IFLO(d_fl)
+            if success:
+                self.snapshot_store.save(system, client, df_fl, checked_on, replace=df_snapshot is None)
+            return success, df_fl
+
+        known = codes.isin(df_snapshot.iloc[:, 0].astype(str).str.strip())
+        frames = []
+        success, df_changed = self.read_IFLO(d_fl[known.values], changed_since=taken_on)
+        if not success:
             return False, None
-           # Se la copia dei dati è andata a buon fine, procedo con l'estrazione
+        frames.append(df_changed)
+        if not known.all():
+            success, df_new = self.read_IFLO(d_fl[~known.values])
+            if not success:
+                return False, None
+            frames.append(df_new)
+        frames = [df for df in frames if not df.empty]
+        df_delta = pd.concat(frames, ignore_index=True) if frames else None
+
+        if df_delta is not None and list(df_delta.columns) != list(df_snapshot.columns):
+            # Layout o lingua cambiati: l'archivio non è più confrontabile
+            self.log_message("Colonne IFLO diverse dall'archivio: estrazione completa", "warning")
+            success, df_fl = self.read_IFLO(d_fl)
+            if success:
+                self.snapshot_store.save(system, client, df_fl, checked_on, replace=True)
+            return success, df_fl
+
+        n_changed = df_changed.iloc[:, 0].astype(str).str.strip().nunique() if not df_changed.empty else 0
+        self.log_message(f"Estrazione incrementale: {n_changed} FL modificate dal {taken_on:%d.%m.%Y}, "
+                         f"{int((~known).sum())} non in archivio, {int(known.sum()) - n_changed} dall'archivio", "info")
+        self.snapshot_store.touch(system, client, codes[known.values], checked_on)
+        if df_delta is not None:
+            self.snapshot_store.save(system, client, df_delta, checked_on)
+        return True, SAP_Snapshot.merge_snapshot(df_snapshot, df_delta, codes)
+
+    def find_selection_field(self, field_name: str, labels: Tuple[str, ...] = ()) -> Optional[str]:
+        """
+        Cerca un campo nella videata di selezione SE16 in base all'etichetta (nome tecnico o descrizione)
+
+        Args:
+            field_name: Nome tecnico del campo (es. 'AEDAT')
+            labels: Descrizioni del campo nella lingua della sessione
+
+        Returns:
+            str: Prefisso del campo (es. 'I7') oppure None se il campo non è presente
+        """
+        wanted = {field_name.upper()} | {label.upper() for label in labels}
+        children = self.session.findById("wnd[0]/usr").Children
+        for i in range(children.Count):
+            child = children(i)
+            match = re.fullmatch(r"%_(I\d+)_%_APP_%-TEXT", str(child.Name))
+            if match is None:
+                continue
+            if {str(child.Text).strip().upper(), str(child.Tooltip).strip().upper()} & wanted:
+                return match.group(1)
+        return None
+
+    def read_IFLO(self, d_fl: pd.DataFrame, changed_since: Optional[date] = None) -> Tuple[bool, Optional[pd.DataFrame]]:
+        """
+        Estrae con SE16 i dati IFLO delle FL (a blocchi di selection_chunk_size, in pipeline)
+
+        Args:
+            d_fl: dataframe contenente le FL da estrarre
+            changed_since: Se indicata vengono estratte solo le FL modificate da questa data;
+                il df può essere vuoto
+
+        Returns:
+            Tuple[bool, pd.DataFrame]: Esito e df delle FL (blocchi concatenati nell'ordine)
+        """
+        if d_fl.empty:
+            return True, pd.DataFrame()
+        chunk_size = max(1, self.selection_chunk_size)
+        chunks = [d_fl.iloc[start:start + chunk_size][["Sede tecnica"]] for start in range(0, len(d_fl), chunk_size)]
+        if len(chunks) <= 1:
+            text = self.format_selection_values(d_fl[["Sede tecnica"]])
+            if text is None:
+                return False, None
+            success, fl_data = self.export_IFLO_selection(text, changed_since)
+            if not success:
+                return False, None
+            success, df_fl = self.parse_IFLO_export(fl_data)
+            return (True, df_fl if df_fl is not None else pd.DataFrame()) if success else (False, None)
+
+        self.log_message(f"Estrazione IFLO di {len(d_fl)} FL in {len(chunks)} blocchi da {chunk_size}", "info")
+        parsed = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="IFLO_Pipeline") as executor:
+            next_text = executor.submit(self.format_selection_values, chunks[0])
+            for k in range(len(chunks)):
+                text = next_text.result()
+                if k + 1 < len(chunks):
+                    next_text = executor.submit(self.format_selection_values, chunks[k + 1])
+                if text is None:
+                    return False, None
+                success, fl_data = self.export_IFLO_selection(text, changed_since)
+                if not success:
+                    self.log_message(f"Errore nel blocco {k + 1}/{len(chunks)} dell'estrazione IFLO", "error")
+                    return False, None
+                parsed.append(executor.submit(self.parse_IFLO_export, fl_data))
+            results = [future.result() for future in parsed]
+
+        if not all(success for success, _ in results):
+            return False, None
+        frames = [df for _, df in results if df is not None]
+        return True, pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def store_in_cache(self, kind: str, selection, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Memorizza il risultato di un'estrazione nella cache (se attiva) e lo restituisce
+
+        Args:
+            kind (str): Tipo di estrazione ('IH06' oppure 'IFLO')
+            selection: Selezione dell'estrazione
+            df (pd.DataFrame): Risultato dell'estrazione
+
+        Returns:
+            pd.DataFrame: Lo stesso df ricevuto
+        """
+        if self.cache is not None:
+            self.cache.put(kind, selection, df)
+        return df
+
+    def log_cache_summary(self) -> None:
+        """
+        Riporta le estrazioni servite dalla cache e quelle eseguite in SAP
+        """
+        if self.cache is None or not (self.cache.hits or self.cache.misses):
+            return
+        self.log_message(f"Cache estrazioni: {self.cache.hits} risultati riutilizzati, {self.cache.misses} estrazioni da SAP", "info")
+
+    def parse_IFLO_export(self, fl_data: Union[str, pd.DataFrame]) -> Tuple[bool, Optional[pd.DataFrame]]:
+        """
+        Converte in df il testo esportato da SE16 (IFLO)
+
+        Args:
+            fl_data: Testo esportato nella clipboard oppure df già letto dalla griglia ALV
+                (None se la selezione non ha trovato FL modificate)
+
+        Returns:
+            Tuple[bool, pd.DataFrame]: Esito e df delle FL
+        """
+        if fl_data is None or isinstance(fl_data, pd.DataFrame):
+            return True, fl_data
+        result, df_fl = self.clean_data(fl_data)
+        if not result:
+            self.log_message("Errore durante la pulizia dei dati estratti da IFLO", "error")
+            return False, None
+        return True, df_fl
+
+    def export_IFLO_selection(self, text: str, changed_since: Optional[date] = None) -> Tuple[bool, Union[str, pd.DataFrame, None]]:
+        """
+        Esegue SE16 sulla tabella IFLO per le FL indicate ed esporta il risultato con il layout CHECK_FL_L
+
+        Args:
+            text: Codici FL separati da '\r\n' da inserire nella selezione multipla
+            changed_since: Se indicata vengono selezionate solo le FL modificate da questa data
+                (nessuna FL modificata: esito True e risultato None)
+
+        Returns:
+            Tuple[bool, str | pd.DataFrame]: Esito e testo esportato
+                (con list_reader = READER_GRID o READER_FILE il df già letto)
+        """
         try:
             # Avvio transazione SE16
             self.session.findById("wnd[0]/tbar[0]/okcd").text = "/nse16"
@@ -322,18 +910,23 @@ class SAPDataExtractor:
             self.session.findById("wnd[0]/usr/ctxtDATABROWSE-TABLENAME").text = "IFLO"
             self.session.findById("wnd[0]").sendVKey(0)
             # Attendo il caricamento della tabella
-            time.sleep(0.5)
+            self.waiter.wait_idle(self.session, "SE16_tabella", "wnd[0]/usr/btn%_I1_%_APP_%-VALU_PUSH")
             # verifico il titolo della finestra
             if not self.check_sap_window('W_IFLO_selection_view'):
                 self.log_message("Errore: la tabella IFLO non è stata trovata", "error")
                 raise ValueError("Tabella IFLO non trovata")
-            # Apro finestra per inserimento valori FL
-            self.session.findById("wnd[0]/usr/btn%_I1_%_APP_%-VALU_PUSH").press()
-            # Copio valori da Clipboard
-            self.session.findById("wnd[1]/tbar[0]/btn[24]").press()
+            # La clipboard è condivisa tra le sessioni parallele: resta riservata fino all'importazione in SAP
+            with self.clipboard_broker.lease("SE16_importazione"):
+                # copio i valori delle FL nella clipboard
+                if not self.put_selection_in_clipboard(text):
+                    raise ValueError("Errore durante la copia della lista FL nella clipboard")
+                # Apro finestra per inserimento valori FL
+                self.session.findById("wnd[0]/usr/btn%_I1_%_APP_%-VALU_PUSH").press()
+                # Copio valori da Clipboard
+                self.session.findById("wnd[1]/tbar[0]/btn[24]").press()
             self.session.findById("wnd[1]/tbar[0]/btn[8]").press()
             # attendo il caricamento dei dati
-            time.sleep(0.25)
+            self.waiter.wait_idle(self.session, "SE16_selezione_multipla", "wnd[0]/usr/ctxtI1-LOW")
             # Verifico che i dati siano stati copiati (almeno un valore nella finestra di testo)
             if self.session.findById("wnd[0]/usr/ctxtI1-LOW").text == "":
                 self.log_message("Nessun valore inserito per la FL", "error")
@@ -342,10 +935,23 @@ class SAPDataExtractor:
             self.session.findById("wnd[0]/usr/txtI4-LOW").text = "X"
             # Modifico n. massimo risultati
             self.session.findById("wnd[0]/usr/txtMAX_SEL").text = "9999999"
+            # Estrazione incrementale: solo le FL modificate dalla data indicata in poi
+            # (un valore LOW senza HIGH selezionerebbe solo le FL modificate in quel giorno)
+            if changed_since is not None:
+                field = self.find_selection_field(self.IFLO_CHANGED_ON_FIELD,
+                                                  self.SAP_PARAMETERS['P_IFLO_Changed_On'].get(self.session.info.language, ()))
+                if field is None:
+                    raise ValueError(f"Campo {self.IFLO_CHANGED_ON_FIELD} non trovato nella selezione SE16 IFLO")
+                self.session.findById(f"wnd[0]/usr/ctxt{field}-LOW").text = changed_since.strftime(self.SAP_DATE_FORMAT)
+                self.session.findById(f"wnd[0]/usr/ctxt{field}-HIGH").text = self.SAP_DATE_MAX
             # Avvio la transazione
             self.session.findById("wnd[0]/tbar[1]/btn[8]").press()
             # Attendo il caricamento dei dati
-            time.sleep(0.5)
+            self.waiter.wait_idle(self.session, "SE16_esecuzione", "wnd[0]/sbar", timeout=self.LIST_TIMEOUT)
+            # Se non ci sono FL modificate SE16 resta sulla videata di selezione
+            if changed_since is not None and self.check_sap_window('W_IFLO_selection_view'):
+                print(f"SE16 IFLO: nessuna FL modificata dal {changed_since:%d.%m.%Y}")
+                return True, None
             # Verifico che siano stati trovati dati leggendo il nome della finestra
             if self.check_sap_window('W_IFLO_data_result', True):
                 # Se non trova il pattern, allora verifico se è presente un icona di errore nella status bar
@@ -361,28 +967,9 @@ class SAPDataExtractor:
             ### La finestra aperta è corretta 
             # Apro il menu per la selezione del template
             self.session.findById("wnd[0]/tbar[1]/btn[33]").press()
-            ### Ricerco il template nell'elenco
-            # Riferimento alla griglia
-            grid = self.session.findById("wnd[1]/usr/ssubD0500_SUBSCREEN:SAPLSLVC_DIALOG:0501/cntlG51_CONTAINER/shellcont/shell")
-            # Parametri di ricerca
+            ### Seleziono il layout (riga memorizzata oppure ricerca nell'elenco)
             target_value = "CHECK_FL_L"
-            row_count = grid.RowCount
-            layout_ok = False
-            # Ricerca del valore nella prima colonna
-            for i in range(row_count):
-                try:
-                    cell_value = grid.getCellValue(i, grid.ColumnOrder(0))
-                    if cell_value == target_value:
-                        print(f"Valore trovato alla riga: {i}")
-                        grid.currentCellRow = i
-                        grid.selectedRows = str(i)
-                        grid.clickCurrentCell()
-                        layout_ok = True
-                        break
-                    
-                except Exception as e:
-                    print(f"Errore nella selezione del layout {i}: {e}")
-                    continue
+            layout_ok = self.select_layout(target_value)
             if not layout_ok:
                 # Se il layout non è stato trovato, gestisco l'errore
                 self.log_message(f"Layout '{target_value}' non trovato nella griglia", "error")
@@ -407,136 +994,521 @@ class SAPDataExtractor:
                     self.log_message(f"Errore durante la lettura del tipo di icona nella status bar: {str(e)}", "error")
                     return False, None
             
-            ### Se la selezione del layout è andata a buon fine, copio i dati nella clipboard
-            self.session.findById("wnd[0]/mbar/menu[0]/menu[10]/menu[3]/menu[2]").select()
-            self.session.findById("wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[4,0]").select()
-            self.session.findById("wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[4,0]").setFocus()
-            self.session.findById("wnd[1]/tbar[0]/btn[0]").press()            
-            # attendo il caricamento dei dati
-            time.sleep(0.5)
-            # Leggo il contenuto della clipboard
-            fl_data = self.clipboard_data()
+            ### Se la selezione del layout è andata a buon fine, leggo i dati dalla griglia oppure li copio nella clipboard
+            if self.list_reader == self.READER_GRID:
+                return True, self.read_result_grid()
+            if self.list_reader == self.READER_FILE:
+                return True, self.export_list_to_file("wnd[0]/mbar/menu[0]/menu[10]/menu[3]/menu[2]", "SE16")
+            # La clipboard resta riservata dall'esportazione fino alla lettura dei dati
+            with self.clipboard_broker.lease("SE16_esportazione") as lease:
+                self.session.findById("wnd[0]/mbar/menu[0]/menu[10]/menu[3]/menu[2]").select()
+                self.waiter.wait_idle(self.session, "SE16_menu_esporta", "wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[4,0]")
+                self.session.findById("wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[4,0]").select()
+                self.session.findById("wnd[1]/usr/subSUBSCREEN_STEPLOOP:SAPLSPO5:0150/sub:SAPLSPO5:0150/radSPOPLI-SELFLAG[4,0]").setFocus()
+                self.session.findById("wnd[1]/tbar[0]/btn[0]").press()            
+                # attendo il caricamento dei dati
+                self.waiter.wait_idle(self.session, "SE16_esportazione", timeout=self.LIST_TIMEOUT)
+                # Leggo i dati esportati: il testo già presente nella clipboard non viene accettato
+                fl_data = self.wait_for_clipboard_data(lease.sequence, 30)
             if fl_data is None:
                 raise ValueError(f"Nessun dato presente nella clipboard")
-            result, df_fl = self.clean_data(fl_data)
-            if not result:
-                raise ValueError(f"Errore durante la pulizia dei dati della FL {fl}")
-            else:
-                return True, df_fl
+            return True, fl_data
         
         except Exception as e:
             self.log_message(f"Errore durante l'estrazione delle informazioni da FL:\n{str(e)}")
             return False, None
 
-    def update_FL(self, df_input: pd.DataFrame) -> Tuple[bool, Optional[pd.DataFrame]]:
+    def select_layout(self, target_value: str) -> bool:
+        """
+        Seleziona un layout nella finestra di scelta del layout ALV.
+
+        La riga del layout viene memorizzata in layout_cache per sistema, mandante e utente: alla
+        selezione successiva basta leggere una cella per verificarla. Se la riga non è nota o non
+        contiene più il layout (layout aggiunti o eliminati) l'elenco viene scorso riga per riga.
+
+        Args:
+            target_value: Nome del layout
+
+        Returns:
+            bool: True se il layout è stato selezionato
+        """
+        # Riferimento alla griglia
+        grid = self.session.findById("wnd[1]/usr/ssubD0500_SUBSCREEN:SAPLSLVC_DIALOG:0501/cntlG51_CONTAINER/shellcont/shell")
+        info = self.session.info
+        context = (info.systemName, info.client, info.user)
+        column = grid.ColumnOrder(0)
+        row_count = grid.RowCount
+
+        def select_row(i: int) -> None:
+            grid.currentCellRow = i
+            grid.selectedRows = str(i)
+            grid.clickCurrentCell()
+
+        cached_row = self.layout_cache.get(context, target_value)
+        if cached_row is not None and cached_row < row_count:
+            try:
+                if grid.getCellValue(cached_row, column) == target_value:
+                    select_row(cached_row)
+                    return True
+            except Exception as e:
+                print(f"Errore nella verifica della riga memorizzata del layout: {e}")
+            print(f"Layout {target_value}: riga memorizzata {cached_row} non valida, ricerca nell'elenco")
+
+        # Ricerca del valore nella prima colonna
+        for i in range(row_count):
+            try:
+                cell_value = grid.getCellValue(i, column)
+                if cell_value == target_value:
+                    print(f"Valore trovato alla riga: {i}")
+                    select_row(i)
+                    self.layout_cache.put(context, target_value, i)
+                    return True
+
+            except Exception as e:
+                print(f"Errore nella selezione del layout {i}: {e}")
+                continue
+        return False
+
+    def read_result_grid(self) -> pd.DataFrame:
+        """
+        Legge il risultato di SE16 direttamente dalla griglia ALV (stesse colonne di clean_data)
+
+        Returns:
+            pd.DataFrame: Df delle FL con le intestazioni del layout
+
+        Raises:
+            ValueError: Se la griglia non contiene dati
+        """
+        grid = self.session.findById(self.IFLO_GRID_ID)
+        headers, values = SAP_Grid.read_grid(grid)
+        # Come in clean_data: intestazioni duplicate con postfisso, escluse quelle vuote o che iniziano con _
+        headers = self.handle_duplicate_headers([header.strip() for header in headers])
+        df = pd.DataFrame({header: column for header, column in zip(headers, values)
+                           if header and not header.startswith('_')})
+        if df.empty:
+            raise ValueError("Nessun dato presente nella griglia")
+        print(f"✅ Griglia letta: {len(df)} righe, {len(df.columns)} colonne")
+        return df
+
+    def update_FL(self, df_input: pd.DataFrame, n_sessions: int = 1,
+                  session_manager=None, journal: Optional[SAP_Journal.UpdateJournal] = None,
+                  resume: bool = True, sticky: bool = True,
+                  retry_policy: Optional[SAP_Retry.RetryPolicy] = None,
+                  read_only: bool = False) -> Tuple[bool, Optional[pd.DataFrame]]:
         """
         Modifica le informazioni della Functional Location
         Args:
             df (dataframe): Dataframe contenente le FL da aggiornare
+            n_sessions (int): Numero di sessioni SAP da utilizzare in parallelo (default 1)
+            session_manager (SAPSessionManager): Manager delle sessioni, necessario se n_sessions > 1
+            journal (UpdateJournal): Giornale in cui registrare l'esito di ogni FL (opzionale)
+            resume (bool): Se True le FL già salvate nel giornale (Result = 'S') non vengono rielaborate
+            sticky (bool): Se True si resta in IL02 tra una FL e la successiva invece di usare /nIL02
+            retry_policy (RetryPolicy): Tentativi e attese per rielaborare a fine giro le FL con errori
+                transitori (FL bloccate, errori della GUI). Se None ogni FL viene elaborata una sola volta
+            read_only (bool): Se True le FL vengono solo lette (colonne N_*) senza modificare la descrizione
+                e senza salvare; Result vale 'V'
             
         Returns: 
                 - bool: True se estrazione riuscita, False altrimenti
         """
+        self.sticky_IL02 = sticky
+        self.read_only = read_only
+        self.step_timings = []
+        start_time = time.perf_counter()
         try:
             
-            # ✅ Crea una copia esplicita per evitare il warning
-            df = df_input.copy()
-
-            # Creo nuove colonne per memorizzare i nuovi dati
-            df["Result"] = "" # Creo la colonna per contenere l'esito della modifica ricavato dalla icona della status bar
-            df["Result_txt"] = "" # Creo la colonna per contenereil msg della status bar         
-            # Colonne per verificare se i dati vengono aggiornati
-            df["N_Tipologia"] = ""
-            df["N_Componente"] = ""
-            df["N_Sezione"] = ""
-            df["N_Tipo ogg."] = ""
-            df["N_Prof.cat."] = ""
-
-            count_ok = 0
-            for index, row in df.iterrows():
-                # Considero la Fl per ogni riga
-                fl = df.at[index, "Sede tecnica"].strip()
-                descrizione = df.at[index, "Definizione della sede tecnica"].strip()
-                
-                ### Modifico i dati per aggiornare i valori di ogni singola FL
-                self.session.findById("wnd[0]/tbar[0]/okcd").text = "/nIL02"
-                self.session.findById("wnd[0]").sendVKey(0)
-                time.sleep(0.25)
-                # Inserisco la FL da modificare
-                self.session.findById("wnd[0]/usr/ctxtIFLO-TPLNR").text = fl
-                # Avvio transazione
-                self.session.findById("wnd[0]").sendVKey(0)
-                time.sleep(0.25)               
-                # inserisco descrizione
-                self.session.findById("wnd[0]/usr/txtIFLO-PLTXT").text = descrizione
-                self.session.findById("wnd[0]").sendVKey(0)
-                time.sleep(0.25)
-                # Verifico che non venga generato un errore leggendo l'icona
-                try:
-                    iconType = self.session.findById("wnd[0]/sbar").MessageType
-                    if iconType != "":
-                        self.log_message(f"Errore nella modifica FL {fl}", "error")
-                        df.loc[index, "Result"] = iconType
-                        df.loc[index, "Result_txt"] = self.session.findById("wnd[0]/sbar").text        
-                        # Esamino la fl successiva            
-                        continue        
-                except Exception as e:
-                    # Se si verifica un errore nella lettura della icona allora inserisco il caratere X e testo "Errore nella lettura dell'icona"
-                    # Inserisco l'esito dell'aggiornamento
-                    df.loc[index, "Result"] = "X"
-                    df.loc[index, "Result_txt"] = "Errore durante modifica"
-                    self.log_message(f"Errore durante la lettura status bar: {str(e)}", "error")               
-                
-                # Leggo i valori dei campi 
-                try:
-                    # Inseirsco i valori letti dopo l'aggiornamento
-                    df.loc[index, "N_Tipo ogg."] = self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102A:SAPLITO0:1020/subSUB_1020A:SAPLITO0:1025/ctxtITOB-EQART").text
-                    df.loc[index, "N_Tipologia"] = self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102D:SAPLITO0:1080/subXUSR1080:SAPLXTOB:1001/txtIFLOT-CODE_SIST").text                    
-                    df.loc[index, "N_Componente"] = self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102D:SAPLITO0:1080/subXUSR1080:SAPLXTOB:1001/txtIFLOT-CODE_PARTE").text
-                    df.loc[index, "N_Sezione"] = self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102D:SAPLITO0:1080/subXUSR1080:SAPLXTOB:1001/txtIFLOT-CODE_SEZ_PM").text                 
-                    # Cambio scheda per leggere il valore del "Prof.catalogo"
-                    self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\03").select()
-                    time.sleep(0.25)
-                    df.loc[index, "N_Prof.cat."] = self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\03/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102B:SAPLITO0:1062/ctxtITOB-RBNR").text
-                except Exception as e:
-                    # Se si verifica un errore nella lettura della icona allora inserisco il caratere X e testo "Errore nella lettura dell'icona"
-                    # Inserisco l'esito dell'aggiornamento
-                    df.loc[index, "Result"] = "X"
-                    df.loc[index, "Result_txt"] = "Errore nella lettura dei valori"
-                    self.log_message(f"Errore lettura dei valori per la FL: {fl}", "error")
-                    # Esamino la fl successiva
-                    continue                             
-                # Salvo i dati
-                self.session.findById("wnd[0]/tbar[0]/btn[11]").press()
-
-                # Verifico icona della status bar
-                    # verifico l'icona che compare nella status bar
-                    # Il valore restituito dovrebbe indicare il tipo di icona mostrata:
-                    #     - 'S' o 'SUCCESS' per il simbolo di successo (✓)
-                    #     - 'W' o 'WARNING' per l'icona di avviso (⚠)
-                    #     - 'E' o 'ERROR' per l'icona di errore (❌)
-                    #     - 'I' o 'INFO' per l'icona informativa (ℹ)
-                try:
-                    iconType = self.session.findById("wnd[0]/sbar").MessageType
-                    # Inserisco l'esito dell'aggiornamento
-                    df.loc[index, "Result"] = iconType
-                    df.loc[index, "Result_txt"] = self.session.findById("wnd[0]/sbar").text                    
-                    if iconType != 'S':
-                        self.log_message(f"Errore salvataggio dati FL: {fl}", "error")                   
-                except Exception as e:
-                    # Se si verifica un errore nella lettura della icona allora inserisco il caratere X e testo "Errore nella lettura dell'icona"
-                    # Inserisco l'esito dell'aggiornamento
-                    df.loc[index, "Result"] = "X"
-                    df.loc[index, "Result_txt"] = "Errore nella lettura dell'icona"
-                    self.log_message(f"Errore durante la lettura status bar: {str(e)}", "error")
-            
+            # ✅ Crea una copia esplicita per evitare il warning (eventuali colonne di esito precedenti vengono sostituite)
+            df = df_input.drop(columns=list(UPDATE_COLUMNS), errors="ignore")
+
+            # Esito di ogni FL per posizione di riga: le colonne Result, Result_txt e N_* vengono create una sola volta alla fine
+            records: List[Optional[FLUpdateRecord]] = [None] * len(df)
+            todo = list(range(len(df)))
+
+            # Riprendo dal giornale l'esito delle FL già salvate in un'esecuzione interrotta
+            if journal is not None and resume:
+                completed = journal.completed()
+                todo = []
+                for position, fl in enumerate(df["Sede tecnica"].str.strip()):
+                    if fl in completed:
+                        records[position] = FLUpdateRecord.from_dict(completed[fl])
+                    else:
+                        todo.append(position)
+                if len(todo) < len(df):
+                    self.log_message(f"Ripresa da giornale: {len(df) - len(todo)} FL già aggiornate, {len(todo)} da elaborare", "info")
+
+            self.update_FL_positions(df, todo, records, n_sessions, session_manager, journal)
+
+            # Le FL con errori transitori vengono rielaborate a fine giro
+            if retry_policy is not None:
+                self.retry_FL(df, records, retry_policy, n_sessions, session_manager, journal)
+
+            self.update_elapsed = time.perf_counter() - start_time
             # Se sono state aggiornate tutte le righe restituisco True e il df
-            return True, df
+            return True, self.records_to_dataframe(df, records)
         
         except Exception as e:  
-            self.log_message(f"Errore durante la modifica della FL {fl}: \n{str(e)}")
+            self.log_message(f"Errore durante la modifica delle FL: \n{str(e)}")
             return False, None
 
+    def update_FL_positions(self, df: pd.DataFrame, positions: List[int], records: List[Optional[FLUpdateRecord]],
+                            n_sessions: int = 1, session_manager=None,
+                            journal: Optional[SAP_Journal.UpdateJournal] = None, attempt: int = 1) -> None:
+        """
+        Aggiorna le FL nelle posizioni di riga indicate e ne inserisce l'esito in records
+
+        Args:
+            df (pd.DataFrame): Df completo delle FL
+            positions (List[int]): Posizioni di riga da elaborare
+            records (List[FLUpdateRecord]): Esito per posizione di riga (aggiornato sul posto)
+            n_sessions (int): Numero di sessioni SAP da utilizzare in parallelo
+            session_manager (SAPSessionManager): Manager delle sessioni, necessario se n_sessions > 1
+            journal (UpdateJournal): Giornale in cui registrare l'esito di ogni FL (opzionale)
+            attempt (int): Numero del tentativo
+        """
+        df_todo = df.iloc[positions]
+        if n_sessions > 1 and session_manager is not None and len(df_todo) > 1:
+            todo_records = self.update_FL_parallel(df_todo, n_sessions, session_manager, journal, attempt)
+        else:
+            todo_records = self.update_FL_rows(df_todo, journal, attempt)
+        for position, record in zip(positions, todo_records):
+            records[position] = record
+
+    def retry_FL(self, df: pd.DataFrame, records: List[Optional[FLUpdateRecord]],
+                 retry_policy: SAP_Retry.RetryPolicy, n_sessions: int = 1, session_manager=None,
+                 journal: Optional[SAP_Journal.UpdateJournal] = None) -> None:
+        """
+        Coda di rielaborazione: ripete l'aggiornamento delle FL con esito transitorio
+        (secondo SAP_Retry.classify_status) con attesa esponenziale tra un giro e il successivo
+
+        Args:
+            df (pd.DataFrame): Df completo delle FL
+            records (List[FLUpdateRecord]): Esito per posizione di riga (aggiornato sul posto)
+            retry_policy (RetryPolicy): Numero massimo di tentativi e attese
+            n_sessions (int): Numero di sessioni SAP da utilizzare in parallelo
+            session_manager (SAPSessionManager): Manager delle sessioni, necessario se n_sessions > 1
+            journal (UpdateJournal): Giornale in cui registrare l'esito di ogni FL (opzionale)
+        """
+        def retry_queue() -> List[int]:
+            return [position for position, record in enumerate(records) if record is not None
+                    and SAP_Retry.classify_status(record.result, record.result_txt) == SAP_Retry.RESULT_RETRY]
+
+        queue = retry_queue()
+        for attempt in range(2, retry_policy.max_attempts + 1):
+            # Le FL salvate nonostante un errore registrato (es. worker interrotto dopo il salvataggio)
+            # riprendono l'esito dal giornale e non vengono salvate una seconda volta
+            if queue and journal is not None:
+                saved = journal.completed()
+                for position in queue:
+                    fl = str(df["Sede tecnica"].iat[position]).strip()
+                    if fl in saved:
+                        records[position] = FLUpdateRecord.from_dict(saved[fl])
+                queue = retry_queue()
+            if not queue:
+                return
+            delay = retry_policy.delay(attempt)
+            self.log_message(f"Tentativo {attempt}: {len(queue)} FL da rielaborare tra {delay:.0f} s", "info")
+            time.sleep(delay)
+            self.update_FL_positions(df, queue, records, n_sessions, session_manager, journal, attempt)
+            queue = retry_queue()
+        if queue:
+            self.log_message(f"{len(queue)} FL con errori transitori dopo {retry_policy.max_attempts} tentativi", "warning")
+
+    @staticmethod
+    def records_to_dataframe(df: pd.DataFrame, records: List[Optional[FLUpdateRecord]]) -> pd.DataFrame:
+        """
+        Aggiunge al df le colonne di esito costruite dai record (uno per riga, nello stesso ordine)
+
+        Args:
+            df (pd.DataFrame): Df delle FL elaborate
+            records (List[FLUpdateRecord]): Esito per posizione di riga (None = non elaborata)
+
+        Returns:
+            pd.DataFrame: Df con le colonne Result, Result_txt e N_*
+        """
+        empty = FLUpdateRecord()
+        records = [record or empty for record in records]
+        columns = {col: [getattr(record, attr) for record in records] for col, attr in UPDATE_COLUMNS.items()}
+        return pd.concat([df, pd.DataFrame(columns, index=df.index)], axis=1)
+
+    def update_FL_parallel(self, df: pd.DataFrame, n_sessions: int, session_manager,
+                           journal: Optional[SAP_Journal.UpdateJournal] = None,
+                           attempt: int = 1) -> List[FLUpdateRecord]:
+        """
+        Suddivide le FL in blocchi ed esegue l'aggiornamento su più sessioni SAP in parallelo.
+        Ogni worker utilizza in modo esclusivo la propria sessione.
+
+        Args:
+            df (pd.DataFrame): Dataframe contenente le FL da aggiornare
+            n_sessions (int): Numero di sessioni richieste
+            session_manager (SAPSessionManager): Manager delle sessioni
+            journal (UpdateJournal): Giornale in cui registrare l'esito di ogni FL (opzionale)
+            attempt (int): Numero del tentativo
+
+        Returns:
+            List[FLUpdateRecord]: Esito di ogni FL nell'ordine delle righe del df
+        """
+        n_available = session_manager.initialize_sessions(n_sessions)
+        if n_available <= 1:
+            self.log_message("Sessioni parallele non disponibili, aggiornamento su una sola sessione", "warning")
+            return self.update_FL_rows(df, journal, attempt)
+
+        shards = SAP_Sessions.split_in_shards(list(range(len(df))), n_available)
+        self.log_message(f"Aggiornamento di {len(df)} FL su {len(shards)} sessioni parallele", "info")
+
+        def update_shard(session, shard_positions, worker_index):
+            # Ogni worker usa un proprio extractor legato alla sessione assegnata
+            worker = self.spawn(session)
+            return worker.update_FL_rows(df.iloc[shard_positions], journal, attempt)
+
+        # I blocchi sono contigui: concatenandoli nell'ordine si ottiene l'ordine delle righe del df
+        records = []
+        for shard_positions, (success, shard_result) in zip(shards, SAP_Sessions.execute_parallel(session_manager, update_shard, shards)):
+            if success:
+                records.extend(shard_result)
+            else:
+                # Se la sessione del worker non è utilizzabile le FL del blocco restano non elaborate;
+                # le FL già salvate dal worker prima dell'errore riprendono l'esito dal giornale
+                saved = journal.completed() if journal is not None else {}
+                fl_codes = df["Sede tecnica"].iloc[shard_positions].str.strip()
+                n_saved = int(fl_codes.isin(saved.keys()).sum())
+                self.log_message(f"Errore worker parallelo ({len(shard_positions) - n_saved} FL non elaborate): {shard_result}", "error")
+                records.extend(FLUpdateRecord.from_dict(saved[fl]) if fl in saved
+                               else FLUpdateRecord("X", f"Errore sessione: {shard_result}", attempt=attempt)
+                               for fl in fl_codes)
+        return records
+
+    def update_FL_rows(self, df: pd.DataFrame,
+                       journal: Optional[SAP_Journal.UpdateJournal] = None,
+                       attempt: int = 1) -> List[FLUpdateRecord]:
+        """
+        Aggiorna in sequenza sulla sessione corrente le FL contenute nel df
+
+        Args:
+            df (pd.DataFrame): Dataframe con le colonne "Sede tecnica" e "Definizione della sede tecnica"
+            journal (UpdateJournal): Giornale in cui registrare l'esito di ogni FL (opzionale)
+            attempt (int): Numero del tentativo
+
+        Returns:
+            List[FLUpdateRecord]: Esito di ogni FL nell'ordine delle righe del df
+        """
+        records = []
+        for fl, descrizione in zip(df["Sede tecnica"], df["Definizione della sede tecnica"]):
+            # Considero la Fl per ogni riga
+            fl = fl.strip()
+            try:
+                record = self.update_single_FL(fl, descrizione.strip(), attempt)
+            except Exception as e:
+                # Un errore della sessione su una FL non annulla l'esito delle FL già elaborate
+                self.log_message(f"Errore sessione durante l'aggiornamento della FL {fl}: {str(e)}", "error")
+                record = FLUpdateRecord("X", f"Errore sessione: {str(e)}")
+            record.attempt = attempt
+            records.append(record)
+            if journal is not None:
+                journal.append(fl, record.to_dict())
+        return records
+
+    def update_single_FL(self, fl: str, descrizione: str, attempt: int = 1) -> FLUpdateRecord:
+        """
+        Esegue la modifica fittizia della descrizione di una FL con IL02 e la salva
+
+        Args:
+            fl (str): Codice Functional Location
+            descrizione (str): Descrizione da reinserire
+            attempt (int): Numero del tentativo (registrato nei tempi dei passi)
+
+        Returns:
+            FLUpdateRecord: Valori delle colonne Result, Result_txt e N_* per la FL
+        """
+        timing = FLStepTiming(fl, attempt=attempt)
+        start_time = time.perf_counter()
+        timing.navigation = self.open_IL02()
+        timing.t_nav = time.perf_counter() - start_time
+        record = self.edit_FL(fl, descrizione, timing)
+        timing.t_total = time.perf_counter() - start_time
+        self.step_timings.append(timing)
+        return record
+
+    def open_IL02(self) -> str:
+        """
+        Porta la sessione sulla videata iniziale di IL02.
+        In modalità sticky, se la sessione è già sulla videata iniziale (ad esempio dopo il
+        salvataggio della FL precedente) la transazione non viene riavviata.
+
+        Returns:
+            str: Modalità di navigazione utilizzata ("sticky" oppure "/nIL02")
+        """
+        if self.sticky_IL02 and self.is_IL02_initial_screen():
+            return "sticky"
+        ### Modifico i dati per aggiornare i valori di ogni singola FL
+        self.session.findById("wnd[0]/tbar[0]/okcd").text = "/nIL02"
+        self.session.findById("wnd[0]").sendVKey(0)
+        self.waiter.wait_idle(self.session, "IL02_avvio", "wnd[0]/usr/ctxtIFLO-TPLNR")
+        # Memorizzo la videata iniziale per riconoscerla nelle FL successive
+        try:
+            info = self.session.info
+            self.IL02_initial_screen = (info.transaction, info.program, info.screenNumber)
+        except Exception:
+            self.IL02_initial_screen = None
+        return "/nIL02"
+
+    def is_IL02_initial_screen(self) -> bool:
+        """
+        Verifica se la sessione si trova sulla videata iniziale di IL02
+
+        Returns:
+            bool: True se transazione, programma e numero videata corrispondono a quelli memorizzati
+        """
+        if self.IL02_initial_screen is None:
+            return False
+        try:
+            info = self.session.info
+            return (info.transaction, info.program, info.screenNumber) == self.IL02_initial_screen
+        except Exception:
+            return False
+
+    def is_FL_open_or_error(self) -> bool:
+        """
+        Condizione di attesa dopo l'inserimento della FL in IL02: dati anagrafici aperti
+        oppure messaggio di errore nella status bar
+        """
+        if self.session.Busy:
+            return False
+        if self.session.findById("wnd[0]/sbar").MessageType in ("E", "A"):
+            return True
+        self.session.findById("wnd[0]/usr/txtIFLO-PLTXT")  # Solleva un'eccezione se la FL non è aperta
+        return True
+
+    def edit_FL(self, fl: str, descrizione: str, timing: FLStepTiming) -> FLUpdateRecord:
+        """
+        Partendo dalla videata iniziale di IL02 apre la FL, reinserisce la descrizione,
+        legge i valori aggiornati e salva
+
+        Args:
+            fl (str): Codice Functional Location
+            descrizione (str): Descrizione da reinserire
+            timing (FLStepTiming): Record in cui registrare la durata di ogni passo
+
+        Returns:
+            FLUpdateRecord: Valori delle colonne Result, Result_txt e N_* per la FL
+        """
+        record = FLUpdateRecord()
+        step_start = time.perf_counter()
+        # Inserisco la FL da modificare
+        self.session.findById("wnd[0]/usr/ctxtIFLO-TPLNR").text = fl
+        # Avvio transazione
+        self.session.findById("wnd[0]").sendVKey(0)
+        self.waiter.wait_until(self.is_FL_open_or_error, "IL02_apertura_FL")
+        timing.t_enter, step_start = self.lap(step_start)
+        # La FL non si apre (ad esempio perché bloccata da un altro utente): resto sulla videata iniziale
+        iconType = self.session.findById("wnd[0]/sbar").MessageType
+        if iconType in ("E", "A"):
+            record.result = iconType
+            record.result_txt = self.session.findById("wnd[0]/sbar").text
+            self.log_message(f"Errore apertura FL {fl}: {record.result_txt}", "error")
+            return record
+        # In modalità verifica la descrizione non viene modificata
+        if not self.read_only:
+            # inserisco descrizione
+            self.session.findById("wnd[0]/usr/txtIFLO-PLTXT").text = descrizione
+            self.session.findById("wnd[0]").sendVKey(0)
+            self.waiter.wait_idle(self.session, "IL02_descrizione", "wnd[0]/sbar")
+            # Verifico che non venga generato un errore leggendo l'icona
+            try:
+                iconType = self.session.findById("wnd[0]/sbar").MessageType
+                if iconType != "":
+                    self.log_message(f"Errore nella modifica FL {fl}", "error")
+                    record.result = iconType
+                    record.result_txt = self.session.findById("wnd[0]/sbar").text        
+                    timing.t_desc, step_start = self.lap(step_start)
+                    # Esamino la fl successiva            
+                    return record
+            except Exception as e:
+                # Se si verifica un errore nella lettura della icona allora inserisco il caratere X e testo "Errore nella lettura dell'icona"
+                # Inserisco l'esito dell'aggiornamento
+                record.result = "X"
+                record.result_txt = "Errore durante modifica"
+                self.log_message(f"Errore durante la lettura status bar: {str(e)}", "error")               
+            timing.t_desc, step_start = self.lap(step_start)
+        
+        # Leggo i valori dei campi 
+        try:
+            # Inseirsco i valori letti dopo l'aggiornamento
+            record.n_tipo_ogg = self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102A:SAPLITO0:1020/subSUB_1020A:SAPLITO0:1025/ctxtITOB-EQART").text
+            record.n_tipologia = self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102D:SAPLITO0:1080/subXUSR1080:SAPLXTOB:1001/txtIFLOT-CODE_SIST").text                    
+            record.n_componente = self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102D:SAPLITO0:1080/subXUSR1080:SAPLXTOB:1001/txtIFLOT-CODE_PARTE").text
+            record.n_sezione = self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\01/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102D:SAPLITO0:1080/subXUSR1080:SAPLXTOB:1001/txtIFLOT-CODE_SEZ_PM").text                 
+            timing.t_read, step_start = self.lap(step_start)
+            # Cambio scheda per leggere il valore del "Prof.catalogo"
+            self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\03").select()
+            self.waiter.wait_idle(self.session, "IL02_scheda_T03", r"wnd[0]/usr/tabsTABSTRIP/tabpT\03/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102B:SAPLITO0:1062/ctxtITOB-RBNR")
+            record.n_prof_cat = self.session.findById(r"wnd[0]/usr/tabsTABSTRIP/tabpT\03/ssubSUB_DATA:SAPLITO0:0102/subSUB_0102B:SAPLITO0:1062/ctxtITOB-RBNR").text
+            timing.t_tab, step_start = self.lap(step_start)
+        except Exception as e:
+            # Se si verifica un errore nella lettura della icona allora inserisco il caratere X e testo "Errore nella lettura dell'icona"
+            # Inserisco l'esito dell'aggiornamento
+            record.result = "X"
+            record.result_txt = "Errore nella lettura dei valori"
+            self.log_message(f"Errore lettura dei valori per la FL: {fl}", "error")
+            # Esamino la fl successiva
+            return record                             
+        if self.read_only:
+            return self.close_FL_read_only(record, timing, step_start)
+        # Salvo i dati
+        self.session.findById("wnd[0]/tbar[0]/btn[11]").press()
+        self.waiter.wait_idle(self.session, "IL02_salvataggio", "wnd[0]/sbar")
+
+        # Verifico icona della status bar
+            # verifico l'icona che compare nella status bar
+            # Il valore restituito dovrebbe indicare il tipo di icona mostrata:
+            #     - 'S' o 'SUCCESS' per il simbolo di successo (✓)
+            #     - 'W' o 'WARNING' per l'icona di avviso (⚠)
+            #     - 'E' o 'ERROR' per l'icona di errore (❌)
+            #     - 'I' o 'INFO' per l'icona informativa (ℹ)
+        try:
+            iconType = self.session.findById("wnd[0]/sbar").MessageType
+            # Inserisco l'esito dell'aggiornamento
+            record.result = iconType
+            record.result_txt = self.session.findById("wnd[0]/sbar").text                    
+            if iconType != 'S':
+                self.log_message(f"Errore salvataggio dati FL: {fl}", "error")                   
+        except Exception as e:
+            # Se si verifica un errore nella lettura della icona allora inserisco il caratere X e testo "Errore nella lettura dell'icona"
+            # Inserisco l'esito dell'aggiornamento
+            record.result = "X"
+            record.result_txt = "Errore nella lettura dell'icona"
+            self.log_message(f"Errore durante la lettura status bar: {str(e)}", "error")
+        timing.t_save, step_start = self.lap(step_start)
+        return record
+
+    def close_FL_read_only(self, record: FLUpdateRecord, timing: FLStepTiming, step_start: float) -> FLUpdateRecord:
+        """
+        Modalità verifica: esce dalla FL senza salvare (F3, nessuna modifica in sospeso)
+        e torna alla videata iniziale di IL02
+
+        Args:
+            record (FLUpdateRecord): Esito con i valori N_* letti
+            timing (FLStepTiming): Record in cui registrare la durata dell'uscita (passo Salvataggio)
+            step_start (float): Inizio del passo
+
+        Returns:
+            FLUpdateRecord: Esito con Result 'V'
+        """
+        self.session.findById("wnd[0]").sendVKey(3)
+        self.waiter.wait_idle(self.session, "IL02_uscita", "wnd[0]/usr/ctxtIFLO-TPLNR")
+        record.result = "V"
+        record.result_txt = "Verifica: FL letta senza salvataggio"
+        timing.t_save, step_start = self.lap(step_start)
+        return record
+
+    @staticmethod
+    def lap(step_start: float) -> Tuple[float, float]:
+        """
+        Restituisce la durata del passo iniziato in step_start e l'inizio del passo successivo
+        """
+        now = time.perf_counter()
+        return now - step_start, now
+
 #-----------------------------------------------------------------------------
 # Metodi per la gestione della clipboard
 #-----------------------------------------------------------------------------
@@ -547,9 +1519,13 @@ class SAPDataExtractor:
         
         La funzione esegue le seguenti operazioni:
         - Filtra le righe mantendo solo quelle che inizianon con il carrattere "|"
-        - Elimina colonne completamente vuote
+        - Elimina colonne con intestazione vuota o che inizia con _
         - Gestisce intestazioni duplicate aggiungendo suffissi
-        - Normalizza spazi e caratteri speciali
+        
+        Il testo successivo alla riga di intestazione viene suddiviso con un solo split('|')
+        (split_export_cells), senza suddividerlo in righe in Python: le colonne sono sezioni a passo
+        fisso della lista dei valori (valori come testo non modificato). Se le righe non sono regolari
+        (numero di valori diverso o testo dopo l'ultimo '|') il testo viene letto con pandas.read_csv.
         
         Args:
             data (str): Stringa contenente i dati grezzi (tipicamente da SAP o clipboard)
@@ -567,104 +1543,221 @@ class SAPDataExtractor:
             # Controlla se i dati sono presenti
             if not data:
                 raise ValueError(f"Nessun dato trovato")
-            # Controlla se i dati sono sufficienti
-            all_lines = data.strip().split('\n')
-            # if len(all_lines) <= 3:
-            #     raise ValueError(f"Il file deve contenere almeno 4 righe, trovate solo {len(all_lines)}")      
-            
-            # Filtra le righe, mantenendo solo quelle che iniziano con "|"
-            righe_iniziali = len(all_lines)
-            clean_lines = []
-            try:
-                for i, line in enumerate(all_lines):
-                    line = line.strip()
-                    
-                    if line.startswith('|'): 
-                        clean_lines.append(line) 
-                    elif line:  # Se la riga non è vuota ma non inizia con |, log per debug
-                        print(f"🔍 Riga {i} saltata: '{line[:50]}...'")
-                        
-                if not clean_lines:
-                    print("⚠️ Nessuna riga valida trovata (che inizi con '|')")
-                    return False, None
-                else:
-                    # Conta righe dopo il filtraggio
-                    righe_finali = len(clean_lines)
-                    righe_rimosse = righe_iniziali - righe_finali
-                    print(f"📊 Statistiche filtraggio:")
-                    print(f"   🔢 Righe iniziali: {righe_iniziali}")
-                    print(f"   ✅ Righe mantenute: {righe_finali}")  
-                    print(f"   ❌ Righe rimosse: {righe_rimosse}")
-                    
-            except Exception as e:
-                print(f"❌ Errore durante il filtraggio righe: {e}")
-                clean_lines = []
+
+            # Prima riga che (senza spazi iniziali e finali) inizia con "|": intestazioni
+            header_line = re.search(r"^[ \t]*(\|.*?)\s*$", data, re.MULTILINE)
+            if header_line is None:
+                print("⚠️ Nessuna riga valida trovata (che inizi con '|')")
                 return False, None
 
-            # Dividi le righe in colonne usando il tab come separatore
-            data_rows = [line.split('|') for line in clean_lines]
-            
-            # Prendi la prima riga come header
-            original_headers = [header.strip() for header in data_rows[0]]
-            
-            # Gestisci gli header duplicati
+            # Gestione dei duplicati come nell'esportazione SAP
+            original_headers = [header.strip() for header in header_line.group(1).split('|')]
             unique_headers = self.handle_duplicate_headers(original_headers)
-            
-            # Se sono stati trovati duplicati, stampalo
-            duplicates = [header for header, count in Counter(original_headers).items() if count > 1]
+            duplicates = [header for header, count in Counter(original_headers).items() if count > 1 and header]
             if duplicates:
-                print("\nTrovate colonne con nomi duplicati:")
-                for dup in duplicates:
-                    print(f"- '{dup}' (rinominate con postfissi numerici)")
-
-            # Crea il DataFrame con i nuovi header
-            df = pd.DataFrame(data_rows[1:], columns=unique_headers)
+                print(f"Trovate colonne con nomi duplicati (rinominate con postfissi numerici): {duplicates}")
 
             # Rimuove le colonne con intestazione vuota o che inizia con _
-            cols_to_keep = []
-            for col in df.columns:
-                # Converte il nome della colonna in stringa e rimuove spazi
-                col_name = str(col).strip()
-                
-                # Mantiene la colonna se:
-                # - NON è vuota
-                # - NON inizia con underscore
-                if col_name != '' and not col_name.startswith('_'):
-                    cols_to_keep.append(col)
-
+            cols_to_keep = [i for i, col in enumerate(unique_headers) if col != '' and not col.startswith('_')]
             if not cols_to_keep:
                 raise ValueError("Nessuna colonna ha un'intestazione valida")
 
-            # Mantiene solo le colonne valide
-            df = df[cols_to_keep]
-
-            # Stampa il numero di colonne mantenute
+            cells = None
+            if original_headers[0] == '' and original_headers[-1] == '':
+                cells = self.split_export_cells(data, header_line.end(), len(unique_headers))
+            if cells is not None:
+                # Una riga della matrice per riga dati: valori delle colonne 1..n e, in fondo, il testo
+                # tra le righe (l'ultima riga non ne ha: completata con '')
+                n_fields = len(unique_headers) - 1
+                values = np.append(np.fromiter(cells, dtype=object, count=len(cells)), '').reshape(-1, n_fields)
+                df = pd.DataFrame(values[:, [i - 1 for i in cols_to_keep]],
+                                  columns=[unique_headers[i] for i in cols_to_keep])
+                print(f"📊 Righe mantenute: {len(df) + 1}")
+            else:
+                # Righe irregolari: colonne per posizione, la colonna 0 (testo prima del primo '|') serve
+                # solo per il filtro. Le righe vuote sono ignorate da read_csv, le righe corte completate con ''
+                try:
+                    df = pd.read_csv(io.StringIO(data[header_line.end():]), sep='|', header=None,
+                                     names=range(len(unique_headers)), usecols=[0] + cols_to_keep, dtype=str,
+                                     na_filter=False, quoting=csv.QUOTE_NONE, engine='c')
+                except pd.errors.EmptyDataError:
+                    # Solo la riga di intestazione
+                    return False, None
+                lead = df[0]
+                valid = (lead == '').to_numpy()
+                if not valid.all():
+                    # Spazi prima del primo '|' ammessi come nelle righe ripulite con strip
+                    valid[~valid] = (lead[~valid].str.strip() == '').to_numpy()
+                n_lines = data.count('\n') + 1
+                print(f"📊 Righe mantenute: {int(valid.sum()) + 1} su {n_lines}")
+                df = df.loc[valid, cols_to_keep]
+                df.columns = [unique_headers[i] for i in cols_to_keep]
             print(f"✅ DataFrame filtrato: {len(cols_to_keep)} colonne mantenute")
 
-            # # Rimuove le colonne completamente vuote o con soli valori nulli
-            # cols_to_keep = []
-            # for col in df.columns:
-            #     col_clean = df[col].astype(str).str.strip()
-            #     if not col_clean.isin(['', 'nan', 'None', 'NaN']).all():
-            #         cols_to_keep.append(col)
-            # if not cols_to_keep:
-            #     raise ValueError("Nessuna colonna contiene dati validi")
-                
-            # df = df[cols_to_keep]
-            # print(f"✅ DataFrame filtrato: {len(cols_to_keep)} colonne mantenute")
-
             # Verifico se il df contiene dei dati
             if df.empty:
                 return False, None
-            # Reset dell'indice
-            df = df.reset_index(drop=True)
-         
-            return True, df
+            return True, df.reset_index(drop=True)
         
         except Exception as e:
             print(f"Errore durante la pulizia dei dati: {str(e)}")
             return False, None
-           
+
+    @staticmethod
+    def split_export_cells(data: str, start: int, n_columns: int) -> Optional[List[str]]:
+        """
+        Suddivide con un solo split('|') le righe dati di una lista esportata
+
+        Ogni riga dati "|v1|...|vn|" fornisce n valori seguiti dal testo compreso tra il suo ultimo '|'
+        e il primo '|' della riga successiva: a capo, righe vuote e righe senza '|' (separatori '----').
+        Il testo tra due righe viene verificato, così una riga con un numero diverso di valori o con
+        testo dopo l'ultimo '|' non sposta in silenzio i valori nella colonna successiva.
+
+        Args:
+            data: Testo esportato
+            start: Posizione di fine della riga di intestazione
+            n_columns: Numero di elementi della riga di intestazione divisa con '|' (n + 2)
+
+        Returns:
+            List[str]: Valori e separatori di riga in sequenza ([] se non ci sono righe dati);
+                None se le righe non sono regolari
+        """
+        first = data.find('|', start)
+        if first == -1:
+            return []
+        last = data.rfind('|')
+        n_fields = n_columns - 1
+        if first == last or n_fields < 2:
+            return None
+        cells = data[first + 1:last].split('|')
+        if (len(cells) + 1) % n_fields:
+            return None
+        # Di solito il testo tra le righe è sempre lo stesso ('\r\n'): verificati solo i testi distinti
+        between = set(cells[n_fields - 1::n_fields])
+        between.add(data[start:first])
+        if not all(EXPORT_LINE_BREAK.fullmatch(text) for text in between):
+            return None
+        if not EXPORT_TRAILER.fullmatch(data[last + 1:]):
+            return None
+        return cells
+
+    def export_list_to_file(self, menu_id: str, label: str) -> pd.DataFrame:
+        """
+        Esporta la lista visualizzata in un file locale (formato non convertito, UTF-8) e lo legge
+        con clean_export_file. Il file temporaneo viene eliminato dopo la lettura.
+
+        Args:
+            menu_id: Voce di menu "Lista > Esporta > File locale" della transazione
+            label: Prefisso delle etichette di attesa e del nome del file (es. 'IH06')
+
+        Returns:
+            pd.DataFrame: Df della lista esportata
+
+        Raises:
+            ValueError: Se il file non viene creato o non contiene dati
+        """
+        file_name = f"FL_{label}_{uuid.uuid4().hex}.txt"
+        path = os.path.join(self.export_dir, file_name)
+        self.session.findById(menu_id).select()
+        self.waiter.wait_idle(self.session, f"{label}_menu_esporta", self.EXPORT_OPTION_FILE)
+        self.session.findById(self.EXPORT_OPTION_FILE).select()
+        self.session.findById(self.EXPORT_OPTION_FILE).setFocus()
+        self.session.findById("wnd[1]/tbar[0]/btn[0]").press()
+        self.waiter.wait_idle(self.session, f"{label}_file_esporta", "wnd[1]/usr/ctxtDY_FILENAME")
+        self.session.findById("wnd[1]/usr/ctxtDY_PATH").text = self.export_dir
+        self.session.findById("wnd[1]/usr/ctxtDY_FILENAME").text = file_name
+        # Codepage 4110 = UTF-8
+        self.session.findById("wnd[1]/usr/ctxtDY_FILE_ENCODING").text = "4110"
+        # Sostituisci (il file viene creato anche se non esiste)
+        self.session.findById("wnd[1]/tbar[0]/btn[11]").press()
+        self.waiter.wait_idle(self.session, f"{label}_esportazione", timeout=self.LIST_TIMEOUT)
+        try:
+            if not self.wait_for_export_file(path, f"{label}_file"):
+                raise ValueError(f"File di esportazione non creato: {path}")
+            result, df = self.clean_export_file(path)
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if not result:
+            raise ValueError(f"Errore durante la lettura del file esportato da {label}")
+        return df
+
+    def wait_for_export_file(self, path: str, label: str, timeout: Optional[float] = None) -> bool:
+        """
+        Attende che SAP GUI abbia terminato la scrittura del file (dimensione invariata tra due verifiche)
+
+        Args:
+            path: Percorso del file
+            label: Etichetta dell'attesa
+            timeout: Tempo massimo di attesa in secondi (default: LIST_TIMEOUT)
+
+        Returns:
+            bool: True se il file è completo, False se è scaduto il timeout
+        """
+        last_size = [-1]
+
+        def file_complete() -> bool:
+            size = os.path.getsize(path)
+            complete = size > 0 and size == last_size[0]
+            last_size[0] = size
+            return complete
+
+        return self.waiter.wait_until(file_complete, label, timeout=timeout or self.LIST_TIMEOUT)
+
+    def clean_export_file(self, path: str, encoding: str = "utf-8-sig") -> Tuple[bool, Optional[pd.DataFrame]]:
+        """
+        Legge un file esportato da SAP (formato non convertito) e crea lo stesso df di clean_data.
+
+        Il file viene letto riga per riga e le righe valide vengono convertite in df a blocchi di
+        EXPORT_CHUNK_ROWS: oltre al df risultante resta in memoria un solo blocco di righe,
+        invece dell'intero testo come con la clipboard.
+
+        Args:
+            path: Percorso del file esportato
+            encoding: Codifica del file
+
+        Returns:
+            Tuple[bool, Optional[pd.DataFrame]]: Esito e df (False, None se il file non contiene dati)
+        """
+        try:
+            headers = None
+            keep = []
+            rows: List[List[str]] = []
+            frames: List[pd.DataFrame] = []
+            with open(path, "r", encoding=encoding, errors="replace", newline=None) as file:
+                for line in file:
+                    line = line.strip()
+                    if not line.startswith('|'):
+                        continue
+                    values = line.split('|')
+                    if headers is None:
+                        # La prima riga valida contiene le intestazioni
+                        headers = self.handle_duplicate_headers([header.strip() for header in values])
+                        keep = [col for col in headers if col != '' and not col.startswith('_')]
+                        if not keep:
+                            raise ValueError("Nessuna colonna ha un'intestazione valida")
+                        continue
+                    rows.append(values)
+                    if len(rows) >= self.EXPORT_CHUNK_ROWS:
+                        frames.append(pd.DataFrame(rows, columns=headers)[keep])
+                        rows = []
+            if headers is None:
+                print("⚠️ Nessuna riga valida trovata (che inizi con '|')")
+                return False, None
+            if rows:
+                frames.append(pd.DataFrame(rows, columns=headers)[keep])
+            if not frames:
+                return False, None
+            df = pd.concat(frames, ignore_index=True)
+            print(f"✅ File esportato letto: {len(df)} righe, {len(keep)} colonne")
+            return True, df
+
+        except Exception as e:
+            print(f"Errore durante la lettura del file esportato: {str(e)}")
+            return False, None
+
     def handle_duplicate_headers(self, headers: List[str]) -> List[str]:
         """
         Gestisce le intestazioni duplicate aggiungendo un postfisso numerico
@@ -703,80 +1796,45 @@ class SAPDataExtractor:
             bool: True se successo, False altrimenti
         """
         try:
-            win32clipboard.OpenClipboard()
-            win32clipboard.EmptyClipboard()
-            win32clipboard.SetClipboardText(testo)
-            win32clipboard.CloseClipboard()
+            self.clipboard_broker.clipboard.write(testo)
             return True
         except Exception as e:
             print(f"Errore durante la copia nella clipboard: {e}")
             return False    
 
-    def wait_for_clipboard_data(self, timeout: int = 30) -> bool:
+    def wait_for_clipboard_data(self, sequence: int, timeout: int = 30) -> Optional[str]:
         """
-        Attende che la clipboard contenga dei dati
+        Attende i dati esportati da SAP nella clipboard
         
         Args:
+            sequence: Numero di sequenza della clipboard letto prima dell'esportazione
             timeout: Tempo massimo di attesa in secondi
             
         Returns:
-            bool: True se sono stati trovati dati, False se è scaduto il timeout
+            str: Testo scritto nella clipboard dopo `sequence`; None se la clipboard non è stata
+                modificata entro il timeout o non contiene testo
         """
-        start_time = time.time()
-        last_print_time = 0  # Per limitare i messaggi di log
-        print_interval = 2   # Intervallo in secondi tra i messaggi di log
-        
-        while True:
-            current_time = time.time()
-            
-            # Verifica timeout
-            if current_time - start_time > timeout:
-                print(f"Timeout: nessun dato trovato nella clipboard dopo {timeout} secondi")
-                return False
-            
-            try:
-                # Controlla il contenuto della clipboard
-                win32clipboard.OpenClipboard()
-                try:
-                    # Verifica se c'è del testo nella clipboard
-                    if win32clipboard.IsClipboardFormatAvailable(win32clipboard.CF_UNICODETEXT):
-                        data = win32clipboard.GetClipboardData(win32clipboard.CF_UNICODETEXT)
-                        if data and data.strip():
-                            print("Dati trovati nella clipboard")
-                            return True
-                finally:
-                    win32clipboard.CloseClipboard()
-                
-                # Stampa il messaggio di attesa solo ogni print_interval secondi
-                if current_time - last_print_time >= print_interval:
-                    print("In attesa dei dati nella clipboard...")
-                    last_print_time = current_time
-                
-                # Aspetta prima del prossimo controllo
-                time.sleep(0.1)  # Ridotto il tempo di attesa per una risposta più veloce
-                
-            except win32clipboard.error as we:
-                print(f"Errore Windows Clipboard: {str(we)}")
-                time.sleep(0.5)  # Attesa più lunga in caso di errore
-                continue
-            except Exception as e:
-                print(f"Errore durante il controllo della clipboard: {str(e)}")
-                return False  
+        start_time = time.perf_counter()
+        try:
+            data = self.clipboard_broker.clipboard.read_new_text(sequence, timeout)
+        except Exception as e:
+            print(f"Errore durante lettura dei dati dalla clipboard: {str(e)}")
+            data = None
+        self.waiter.record("clipboard_dati", time.perf_counter() - start_time, data is not None)
+        if data is None:
+            print(f"Nessun nuovo dato nella clipboard dopo {timeout} secondi")
+        return data
 
     def clipboard_data(self) -> Optional[str]:
         """
         Legge i dati dalla clipboard.
         
         Returns:
-            DataFrame Pandas pulito o None in caso di errore
+            str: Testo presente nella clipboard o None in caso di errore
         """
         try:
             # Legge il contenuto della clipboard
-            win32clipboard.OpenClipboard()
-            try:
-                data = win32clipboard.GetClipboardData(win32clipboard.CF_UNICODETEXT)
-            finally:
-                win32clipboard.CloseClipboard()
+            data = self.clipboard_broker.clipboard.read()
 
             if not data:
                 print("Nessun dato trovato nella clipboard")
@@ -795,28 +1853,57 @@ class SAPDataExtractor:
         Args:
             values: DataFrame o Serie pandas
         """
+        text = self.format_selection_values(values)
+        return text is not None and self.put_selection_in_clipboard(text)
+
+    def format_selection_values(self, values: pd.DataFrame) -> Optional[str]:
+        """
+        Prepara il testo per un campo di selezione multipla SAP (un valore per riga)
+
+        Args:
+            values: DataFrame o Serie pandas
+
+        Returns:
+            str: Valori non vuoti separati da '\r\n' oppure None se non ci sono valori
+        """
         try:
             # Gestione DataFrame pandas
             if isinstance(values, pd.DataFrame):
                 if values.empty:
                     self.log_message("Nessun valore da copiare", "warning")
-                    return False
+                    return None
                 # Estrai valori dal DataFrame
                 values_list = values.values.flatten().tolist()
+            else:
+                values_list = list(values)
             # Filtra i valori escludendo i vuoti e quelli composti da soli spazi          
             filtered_values = [str(value) for value in values_list if pd.notna(value) and str(value).strip()]
             # Rimuove gli spazi dal valori ottenuti nel punto precedente
             valid_values = [value.strip() for value in filtered_values]
             
             # Converte la lista in una stringa per la clipboard
-            text = '\r\n'.join(valid_values)
-            
+            return '\r\n'.join(valid_values)
+
+        except Exception as e:
+            self.log_message(f"Errore durante la preparazione dei valori per SAP: {str(e)}", "error")
+            return None
+
+    def put_selection_in_clipboard(self, text: str) -> bool:
+        """
+        Copia nella clipboard il testo preparato da format_selection_values
+
+        Args:
+            text: Valori separati da '\r\n'
+
+        Returns:
+            bool: True se successo, False altrimenti
+        """
+        try:
             # Conta le righe nella stringa
             num_righe = len(text.split('\r\n')) if text else 0
             
-            # Copia nella clipboard
-            pyperclip.copy(text)
-            time.sleep(0.1)
+            # Copia nella clipboard (la scrittura è completa al ritorno: non serve rileggere il testo)
+            self.clipboard_broker.clipboard.write(text)
             
             # Log con informazioni sui valori copiati
             self.log_message(f"Copiati {num_righe} valori nella clipboard per SAP", "success")
@@ -824,4 +1911,4 @@ class SAPDataExtractor:
             
         except Exception as e:
             self.log_message(f"Errore durante la copia nella clipboard: {str(e)}", "error")
-            return False
\ No newline at end of file
+            return False
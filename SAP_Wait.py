@@ -0,0 +1,131 @@
+import time
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+
+class SAPWaiter:
+    """
+    Attesa adattiva dello stato della sessione SAP al posto delle pause fisse (time.sleep).
+
+    La condizione attesa viene verificata subito e poi ripetuta con un intervallo crescente
+    (da min_delay fino a max_delay) finché non è soddisfatta o scade il timeout.
+    La durata reale di ogni attesa viene registrata per etichetta.
+    """
+
+    def __init__(self, timeout: float = 10.0, min_delay: float = 0.01,
+                 max_delay: float = 0.25, backoff: float = 2.0):
+        """
+        Args:
+            timeout: Tempo massimo di attesa predefinito in secondi
+            min_delay: Primo intervallo tra due verifiche in secondi
+            max_delay: Intervallo massimo tra due verifiche in secondi
+            backoff: Fattore di crescita dell'intervallo
+        """
+        self.timeout = timeout
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.timeouts: Dict[str, int] = defaultdict(int)
+
+    def wait_until(self, condition: Callable[[], bool], label: str,
+                   timeout: Optional[float] = None) -> bool:
+        """
+        Attende che una condizione sia verificata
+
+        Args:
+            condition: Funzione senza argomenti che restituisce True quando l'attesa è terminata.
+                       Un'eccezione sollevata dalla condizione equivale a False.
+            label: Etichetta con cui registrare la durata dell'attesa
+            timeout: Tempo massimo di attesa in secondi (default: self.timeout)
+
+        Returns:
+            bool: True se la condizione si è verificata, False se è scaduto il timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start_time = time.perf_counter()
+        delay = self.min_delay
+        while True:
+            try:
+                ready = bool(condition())
+            except Exception:
+                ready = False
+            elapsed = time.perf_counter() - start_time
+            if ready or elapsed >= timeout:
+                break
+            time.sleep(min(delay, timeout - elapsed))
+            delay = min(delay * self.backoff, self.max_delay)
+        return self.record(label, elapsed, ready)
+
+    def record(self, label: str, elapsed: float, ready: bool) -> bool:
+        """
+        Registra la durata di un'attesa eseguita altrove (es. attesa della clipboard)
+
+        Args:
+            label: Etichetta dell'attesa
+            elapsed: Durata in secondi
+            ready: False se l'attesa è terminata per timeout
+
+        Returns:
+            bool: ready
+        """
+        with self.lock:
+            self.timings[label].append(elapsed)
+            if not ready:
+                self.timeouts[label] += 1
+        if not ready:
+            print(f"⏱️ Timeout attesa '{label}' dopo {elapsed:.2f} s")
+        return ready
+
+    def wait_idle(self, session, label: str, element_id: Optional[str] = None,
+                  timeout: Optional[float] = None) -> bool:
+        """
+        Attende che la sessione non sia occupata e, se indicato, che l'elemento atteso sia presente
+
+        Args:
+            session: Sessione SAP
+            label: Etichetta con cui registrare la durata dell'attesa
+            element_id: Id dell'elemento (campo, finestra, griglia) che deve essere disponibile
+            timeout: Tempo massimo di attesa in secondi (default: self.timeout)
+
+        Returns:
+            bool: True se la sessione è pronta, False se è scaduto il timeout
+        """
+        def session_ready() -> bool:
+            if session.Busy:
+                return False
+            if element_id is not None:
+                session.findById(element_id)  # Solleva un'eccezione se l'elemento non esiste
+            return True
+
+        return self.wait_until(session_ready, label, timeout)
+
+    def get_summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Restituisce le statistiche delle attese registrate
+
+        Returns:
+            Dict[str, Dict[str, float]]: Per etichetta numero di attese, totale, media, massimo
+                e numero di timeout (tempi in secondi)
+        """
+        with self.lock:
+            return {
+                label: {
+                    "count": len(durations),
+                    "total": sum(durations),
+                    "mean": sum(durations) / len(durations),
+                    "max": max(durations),
+                    "timeouts": self.timeouts.get(label, 0),
+                }
+                for label, durations in self.timings.items() if durations
+            }
+
+    def reset(self) -> None:
+        """
+        Azzera le statistiche delle attese
+        """
+        with self.lock:
+            self.timings.clear()
+            self.timeouts.clear()
@@ -6,10 +6,17 @@ import pandas as pd
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout, 
                            QHBoxLayout, QWidget, QTextEdit, QListWidget, QLabel, QMessageBox,
-                           QDialog, QRadioButton, QButtonGroup, QDialogButtonBox, QListWidgetItem, QStyle, QMenu, QAction)
+                           QDialog, QRadioButton, QButtonGroup, QDialogButtonBox, QListWidgetItem, QStyle, QMenu, QAction, QSpinBox, QCheckBox, QFileDialog, QComboBox)
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QCursor
+import FL_Data
+import SAP_Cache
 import SAP_Connection
+import SAP_Journal
+import SAP_Pipeline
+import SAP_Retry
+import SAP_Sessions
+import SAP_Snapshot
 import SAP_Transactions
 from typing import Tuple, Optional, Dict
 
@@ -29,6 +36,17 @@ logging.basicConfig(
 logger = logging.getLogger("main").setLevel(logging.DEBUG)
 
 class MainWindow(QMainWindow):
+    # Modalità di elaborazione delle FL estratte
+    MODE_UPDATE = "Aggiorna FL"
+    MODE_VERIFY_IFLO = "Verifica (IFLO)"
+    MODE_VERIFY_IL02 = "Verifica (IL02)"
+    # Lettura delle liste IH06/SE16
+    LIST_READERS = {
+        "Lettura: clipboard": SAP_Transactions.SAPDataExtractor.READER_CLIPBOARD,
+        "Lettura: file locale": SAP_Transactions.SAPDataExtractor.READER_FILE,
+        "Lettura: griglia ALV (IFLO)": SAP_Transactions.SAPDataExtractor.READER_GRID,
+    }
+
     def __init__(self):
         super().__init__()
         # Inizializza l'interfaccia utente
@@ -116,6 +134,80 @@ class MainWindow(QMainWindow):
         self.clear_button.clicked.connect(self.clear_windows)
         button_layout.addWidget(self.clear_button)
         
+        # Numero di sessioni SAP da utilizzare in parallelo per l'aggiornamento delle FL
+        button_layout.addWidget(QLabel("Sessioni SAP:"))
+        self.sessions_spinbox = QSpinBox()
+        self.sessions_spinbox.setRange(1, 6)
+        self.sessions_spinbox.setValue(1)
+        button_layout.addWidget(self.sessions_spinbox)
+
+        # Numero massimo di FL per ogni selezione multipla IH06/SE16 (le liste più lunghe vengono suddivise in blocchi)
+        button_layout.addWidget(QLabel("FL per selezione:"))
+        self.chunk_spinbox = QSpinBox()
+        self.chunk_spinbox.setRange(100, 50000)
+        self.chunk_spinbox.setSingleStep(500)
+        self.chunk_spinbox.setValue(SAP_Transactions.SAPDataExtractor.SELECTION_CHUNK_SIZE)
+        button_layout.addWidget(self.chunk_spinbox)
+
+        # Lettura delle liste: esportazione in clipboard o in un file locale, oppure lettura diretta della griglia ALV
+        self.reader_combo = QComboBox()
+        self.reader_combo.addItems(list(self.LIST_READERS))
+        button_layout.addWidget(self.reader_combo)
+
+        # Validità in minuti dei risultati IH06/IFLO memorizzati nella cache locale (0 = cache disattivata)
+        button_layout.addWidget(QLabel("Cache (min):"))
+        self.cache_spinbox = QSpinBox()
+        self.cache_spinbox.setRange(0, 1440)
+        self.cache_spinbox.setValue(60)
+        button_layout.addWidget(self.cache_spinbox)
+
+        # Bottone per svuotare la cache delle estrazioni
+        self.clear_cache_button = QPushButton('Svuota Cache')
+        self.clear_cache_button.clicked.connect(self.clear_cache)
+        button_layout.addWidget(self.clear_cache_button)
+
+        # Estrazione incrementale: da SE16 solo le FL modificate dall'ultima estrazione (archivio locale IFLO)
+        self.incremental_checkbox = QCheckBox("IFLO incrementale")
+        self.incremental_checkbox.setChecked(False)
+        button_layout.addWidget(self.incremental_checkbox)
+
+        # Rappresentazione compatta dei dati estratti (meno memoria con molte FL)
+        self.compact_checkbox = QCheckBox("Colonne compatte")
+        self.compact_checkbox.setChecked(False)
+        button_layout.addWidget(self.compact_checkbox)
+
+        # Modalità: aggiornamento delle FL oppure sola verifica dei valori (da IFLO in blocco o da IL02 senza salvare)
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems([self.MODE_UPDATE, self.MODE_VERIFY_IFLO, self.MODE_VERIFY_IL02])
+        button_layout.addWidget(self.mode_combo)
+
+        # Numero massimo di tentativi per le FL con errori transitori (es. FL bloccata da un altro utente)
+        button_layout.addWidget(QLabel("Tentativi:"))
+        self.attempts_spinbox = QSpinBox()
+        self.attempts_spinbox.setRange(1, 5)
+        self.attempts_spinbox.setValue(3)
+        button_layout.addWidget(self.attempts_spinbox)
+
+        # Ripresa di un aggiornamento interrotto dal giornale delle FL già salvate
+        self.resume_checkbox = QCheckBox("Riprendi da giornale")
+        self.resume_checkbox.setChecked(True)
+        button_layout.addWidget(self.resume_checkbox)
+
+        # Tra una FL e la successiva resta in IL02 invece di riavviare la transazione con /nIL02
+        self.sticky_checkbox = QCheckBox("Resta in IL02")
+        self.sticky_checkbox.setChecked(True)
+        button_layout.addWidget(self.sticky_checkbox)
+
+        # Pre-check: aggiorna solo le FL con valori diversi da quelli attesi (file di riferimento)
+        self.precheck_checkbox = QCheckBox("Pre-check valori attesi")
+        self.precheck_checkbox.setChecked(False)
+        button_layout.addWidget(self.precheck_checkbox)
+
+        # Pipeline: le FL estratte da IFLO a blocchi vengono aggiornate in IL02 mentre prosegue l'estrazione
+        self.streaming_checkbox = QCheckBox("Pipeline IFLO → IL02")
+        self.streaming_checkbox.setChecked(False)
+        button_layout.addWidget(self.streaming_checkbox)
+
         # Bottone Estrai
         self.extract_button = QPushButton('Aggiorna Dati')
         self.extract_button.clicked.connect(self.update_data)
@@ -280,6 +372,47 @@ class MainWindow(QMainWindow):
                 self.log_message(f"FL star = {len(fl_dictionary.keys()) -1}", 'info')
             return True, fl_dictionary        
 
+    def cache_dir(self) -> str:
+        """
+        Cartella della cache delle estrazioni IH06/IFLO
+        """
+        return os.path.join(self.current_dir, "cache")
+
+    def clear_cache(self) -> None:
+        """
+        Svuota la cache delle estrazioni IH06/IFLO
+        """
+        removed = SAP_Cache.ExtractionCache(self.cache_dir(), 0, ()).invalidate(all_contexts=True)
+        self.log_message(f"Cache svuotata: {removed} risultati eliminati", 'info')
+
+    def normalize_fl_dictionary(self) -> None:
+        """
+        Elimina da fl_dictionary le chiavi con * e le FL di Mask_gen già coperte da un'altra chiave con *,
+        così le stesse FL non vengono estratte e aggiornate più volte
+        """
+        patterns = [key for key in self.fl_dictionary if key != 'Mask_gen']
+        fl_codes = []
+        if 'Mask_gen' in self.fl_dictionary:
+            fl_codes = self.fl_dictionary['Mask_gen']['Sede tecnica'].astype(str).str.strip().tolist()
+        kept_patterns, kept_fl, removed = FL_Data.normalize_selection(patterns, fl_codes)
+        n_patterns = len(patterns) - len(kept_patterns)
+        n_fl = len(fl_codes) - len(kept_fl)
+        if not n_patterns and not n_fl:
+            return
+
+        normalized = {}
+        for key, value in self.fl_dictionary.items():
+            if key == 'Mask_gen':
+                if kept_fl:
+                    normalized[key] = pd.DataFrame({"Sede tecnica": kept_fl})
+            elif key in kept_patterns:
+                normalized[key] = value
+        self.fl_dictionary = normalized
+        for value, covering in removed.items():
+            print(f"   {value} -> coperto da {covering}")
+        self.log_message(f"Selezione normalizzata: eliminati {n_patterns} pattern e {n_fl} FL già coperti "
+                         f"(restano {len(kept_patterns)} pattern e {len(kept_fl)} FL)", 'info')
+
     # ----------------------------------------------------
     # Routine associata al tasto <Estrai Dati>
     # ----------------------------------------------------
@@ -301,9 +434,21 @@ class MainWindow(QMainWindow):
             if not result:
                 self.log_message("Dati inseriti non validi", 'error')
                 return
+            # Elimino i pattern e le FL già coperti da un altro pattern (es. ESS-ESND-01* e ESS-ESND-01-001 con ESS-ESND*)
+            self.normalize_fl_dictionary()
             # # Creo un dizionario che ha come chiavi i valori della lista data_string e come valori dei DataFrame vuoti
             # self.fl_dictionary = {item: pd.DataFrame() for item in data_string}
 
+        # ----------------------------------------------------
+        # Valori attesi per il pre-check (opzionale)
+        # ----------------------------------------------------
+        df_expected = None
+        if self.precheck_checkbox.isChecked() or self.mode_combo.currentText() != self.MODE_UPDATE:
+            df_expected = self.load_expected_values()
+            if df_expected is None:
+                self.extract_button.setEnabled(True)
+                return
+
 
         # altrimenti estraggo i dati da SAP
         self.log_message("Avvio connessione SAP...")
@@ -328,22 +473,36 @@ class MainWindow(QMainWindow):
                         self.log_message("Connessione SAP attiva", 'success')
                         # Eseguo l'estrazione dei dati                        
                         extractor = SAP_Transactions.SAPDataExtractor(session, self)
+                        # Le attese della clipboard (condivisa dal processo) si riferiscono a questa esecuzione
+                        extractor.clipboard_broker.reset()
+                        extractor.selection_chunk_size = self.chunk_spinbox.value()
+                        extractor.list_reader = self.LIST_READERS[self.reader_combo.currentText()]
+                        if self.incremental_checkbox.isChecked():
+                            extractor.snapshot_store = SAP_Snapshot.SnapshotStore(os.path.join(self.cache_dir(), "IFLO_snapshot.sqlite"))
+                        # La riga del layout CHECK_FL_L viene ricordata tra un'esecuzione e l'altra
+                        extractor.layout_cache = SAP_Cache.LayoutCache(os.path.join(self.cache_dir(), "layout_ALV.json"))
+                        # Con la cache attiva le estrazioni IH06/IFLO ancora valide non vengono ripetute
+                        if self.cache_spinbox.value() > 0:
+                            extractor.cache = SAP_Cache.ExtractionCache(self.cache_dir(), self.cache_spinbox.value() * 60,
+                                                                        (self.infoSystemName, self.infoClient, self.infoLanguage))
                         # Eseguo l'estrazione dei dati per ogni FL iterando per le chiavi del dizionario
                         if not self.fl_dictionary:
                             self.log_message("Nessuna FL da estrarre", 'warning')   
                             return
-                        # Itero attraverso le chiavi del dizionario per ottenere tutte le liste di FL necessarie escludendo quelle che non sono in stato CRT
-                        for key in self.fl_dictionary.keys():
-                            
-                            ### Estraggo tutte le FL che corrispondono all FL con * contenuta come chiave Utilizzo IH06
-                            # Rimuovo le FL che non sono in stato CRT (in base alla lingua della sessione SAP)
-                            if key != 'Mask_gen':
-                                self.log_message("Estrazione dati FL contenenti *", 'loading')
-                                success, df = extractor.extract_FL_list(key)
-                            else:
-                                self.log_message("Estrazione lista FL", 'loading')
-                                stringa = '\r\n'.join(self.fl_dictionary[key]['Sede tecnica'].astype(str).str.strip()) # extract_FL_list deve ricevere come argomento una stringa 
-                                success, df = extractor.extract_FL_list(stringa)
+                        # Ottengo con IH06 tutte le liste di FL necessarie escludendo quelle che non sono in stato CRT (in base alla lingua della sessione SAP)
+                        # - per le chiavi con * si espande la FL con *
+                        # - per Mask_gen si carica la lista delle FL
+                        # Tutti i valori vengono inseriti in una sola selezione multipla (una per sessione con più sessioni SAP)
+                        # e le FL estratte vengono poi ripartite tra le chiavi
+                        keys = list(self.fl_dictionary.keys())
+                        selections = {key: self.fl_dictionary[key]['Sede tecnica'].astype(str).str.strip().tolist() if key == 'Mask_gen' else [key]
+                                      for key in keys}
+                        self.log_message(f"Estrazione liste FL ({len(keys)} selezioni)", 'loading')
+                        n_sessions = self.sessions_spinbox.value()
+                        list_manager = SAP_Sessions.SAPSessionManager(max_sessions=n_sessions) if n_sessions > 1 else None
+                        list_results = extractor.extract_FL_selection(selections, n_sessions, list_manager)
+                        failed_keys = []
+                        for key, (success, df) in list_results.items():
                             if success:                                
                                 # Modifico l'intestazione delle colonne del df mettendola in lingua IT
                                 try:
@@ -352,86 +511,116 @@ class MainWindow(QMainWindow):
                                     print(df_renamed.columns.tolist())
                                 except ValueError as e:
                                     print(f"Errore: {e}")
-                                    return
+                                    failed_keys.append(key)
+                                    continue
                                 # Aggiungo i dati ottenuti al dizionario                               
                                 self.fl_dictionary[key] = df_renamed
                                 self.log_message(f"Estrazione FL {key} riuscita!", 'success')
                             else:
                                 self.log_message(f"Errore durante l'estrazione della FL: {key}", 'error')
-                                return False    
-                        # ottenute le liste di FL, procedo con l'estrazione dei dati con la transazione IFLO
-                        for key in self.fl_dictionary.keys():
-                            self.log_message("Inizio estrazione dati lista FL", 'loading') 
-                            
-                            ### Estraggo i dati delle FL per ciascuna lista relativa ad una chiave
-                            success, df = extractor.extract_FL_IFLO(self.fl_dictionary[key])
-                            
-                            if success:
-                                self.log_message(f"Estratte {len(df)} FL per {key}", 'success')
-                                # Concateno i dati estratti al df totale
-                                if self.fl_df_tot.empty:
-                                    self.fl_df_tot = df.copy()
-                                else:
-                                    self.fl_df_tot = pd.concat([self.fl_df_tot, df], ignore_index=True)
-                            else:
+                                failed_keys.append(key)
+                        # Le selezioni non espanse vengono escluse, l'elaborazione prosegue con le altre
+                        for key in failed_keys:
+                            del self.fl_dictionary[key]
+                        if failed_keys:
+                            self.log_message(f"Selezioni non estratte ({len(failed_keys)}): {', '.join(failed_keys)}", 'warning')
+                        if not self.fl_dictionary:
+                            self.log_message("Nessuna lista di FL estratta", 'error')
+                            return
+                        # Pipeline IFLO -> IL02: l'aggiornamento inizia con il primo blocco estratto
+                        if self.streaming_checkbox.isChecked() and self.mode_combo.currentText() == self.MODE_UPDATE:
+                            self.update_data_streaming(extractor, df_expected)
+                        else:
+                            # ottenute le liste di FL, procedo con l'estrazione dei dati con la transazione IFLO
+                            # Le FL di tutte le chiavi vengono estratte con una sola selezione SE16 (a blocchi se necessario)
+                            # e le righe estratte vengono poi attribuite alle chiavi
+                            key_codes = {key: df_key['Sede tecnica'].astype(str).str.strip().tolist()
+                                         for key, df_key in self.fl_dictionary.items()}
+                            all_codes = pd.Series([fl for codes in key_codes.values() for fl in codes]).drop_duplicates()
+                            self.log_message(f"Inizio estrazione dati di {len(all_codes)} FL ({len(key_codes)} liste)", 'loading')
+
+                            success, df = extractor.extract_FL_IFLO(pd.DataFrame({'Sede tecnica': all_codes.values}))
+                            if not success:
                                 self.log_message(f"Errore durante l'estrazione delle FL", 'error')
                                 return
+                            for key, df_key in FL_Data.split_by_pattern(df, key_codes).items():
+                                self.log_message(f"Estratte {len(df_key)} FL per {key}", 'success')
+                            self.fl_df_tot = df
 
-                        self.log_message("Estrazioni completata con successo", 'success')
-                        self.log_message(f"Totale FL estratte = {len(self.fl_df_tot)}", 'success')
+                            self.log_message("Estrazioni completata con successo", 'success')
+                            extractor.log_cache_summary()
+                            extractor.log_clipboard_summary()
+                            self.log_message(f"Totale FL estratte = {len(self.fl_df_tot)}", 'success')
 
-                        # Modifico l'intestazione delle colonne del df mettendola in lingua IT
-                        try:
-                            intestazione_df_IFLO = ['Sede tecnica', 'Definizione della sede tecnica', 'L', 'L_1', 'Tipologia', 'Componente', 'Sezione', 'Tipo ogg.', 'Prof.cat.']
-                            df_renamed = self.rename_columns_safely(self.fl_df_tot, intestazione_df_IFLO)
-                            print(df_renamed.columns.tolist())
-                        except ValueError as e:
-                            print(f"Errore: {e}")
-                            return
+                            # Modifico l'intestazione delle colonne del df mettendola in lingua IT
+                            try:
+                                intestazione_df_IFLO = ['Sede tecnica', 'Definizione della sede tecnica', 'L', 'L_1', 'Tipologia', 'Componente', 'Sezione', 'Tipo ogg.', 'Prof.cat.']
+                                df_renamed = self.rename_columns_safely(self.fl_df_tot, intestazione_df_IFLO)
+                                print(df_renamed.columns.tolist())
+                            except ValueError as e:
+                                print(f"Errore: {e}")
+                                return
+                            # Colonne compatte: spazi rimossi una sola volta e colonne ripetitive come categorical
+                            if self.compact_checkbox.isChecked():
+                                df_renamed = FL_Data.compact_FL_frame(df_renamed)
+                                self.fl_df_tot = df_renamed
 
-                        # Creo il nome del file per salvare i dati
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        file_Excel = f"FL_estratte_" + timestamp + ".xlsx"
-                        self.log_message(f"Salvo i dati in un file excel:\n     {file_Excel}", 'success')
-                        # Salvo il DataFrame in un file Excel
-                        if self.save_excel_file_advanced(df_renamed, file_Excel,
-                                                        sheet_name='Dati_estratti',
-                                                        index=False,
-                                                        overwrite=True):
-                            self.log_message("File Excel salvato con successo", 'success')
-                        else:
-                            self.log_message("Errore durante il salvataggio del file Excel", 'error')                            
+                            # Creo il nome del file per salvare i dati
+                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                            file_Excel = f"FL_estratte_" + timestamp + ".xlsx"
+                            self.log_message(f"Salvo i dati in un file excel:\n     {file_Excel}", 'success')
+                            # Salvo il DataFrame in un file Excel
+                            if self.save_excel_file_advanced(df_renamed, file_Excel,
+                                                            sheet_name='Dati_estratti',
+                                                            index=False,
+                                                            overwrite=True):
+                                self.log_message("File Excel salvato con successo", 'success')
+                            else:
+                                self.log_message("Errore durante il salvataggio del file Excel", 'error')                            
 
                                 
-                        ### Verifico che il df  contenga fl con lingua attualmente in uso nella sessione di SAP
-                        result, df_filtrato = self.Check_Lang(df_renamed, self.infoLanguage)
-                        if result:
+                            ### Verifico che il df  contenga fl con lingua attualmente in uso nella sessione di SAP
+                            result, df_filtrato = self.Check_Lang(df_renamed, self.infoLanguage)
+                            if result:
+                                # Una FL estratta da più chiavi viene elaborata una sola volta
+                                duplicated = df_filtrato['Sede tecnica'].astype(str).str.strip().duplicated()
+                                if duplicated.any():
+                                    df_filtrato = df_filtrato[~duplicated]
+                                    self.log_message(f"Eliminate {int(duplicated.sum())} FL duplicate: {len(df_filtrato)} FL da elaborare", 'info')
+                            if result and self.mode_combo.currentText() != self.MODE_UPDATE:
+                                # Modalità verifica: le FL non vengono modificate, i valori vengono confrontati con quelli attesi
+                                self.verify_FL(extractor, df_filtrato, df_expected)
+                            elif result:
                                 
-                                ### Aggiorno i valori delle fl contenute nel df
-                                success, df_result = extractor.update_FL(df_filtrato)
-
-                                if success:
-                                    # creo una statistica degli aggiornamenti eseguiti
-                                    result_stat = self.analyze_result(df_result)   
-
-                                    df_result = self.check_modifications_detailed(df_result)     
-
-                                    # Creo il nome del file per salvare i dati
-                                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                                    file_Excel = f"FL_aggiornate_" + timestamp + ".xlsx"
-                                    self.log_message(f"Salvo i dati in un file excel:\n     {file_Excel}", 'success')
-                                    # Salvo il DataFrame in un file Excel
-                                    if self.save_excel_file_advanced(df_result, file_Excel,
-                                                                    sheet_name='Dati_modificati',
-                                                                    index=False,
-                                                                    overwrite=True):
-                                        self.log_message("File Excel salvato con successo", 'success')
+                                    ### Aggiorno i valori delle fl contenute nel df
+                                    # Con più sessioni le FL vengono suddivise tra sessioni SAP parallele
+                                    n_sessions = self.sessions_spinbox.value()
+                                    session_manager = SAP_Sessions.SAPSessionManager(max_sessions=n_sessions) if n_sessions > 1 else None
+                                    # L'esito di ogni FL viene registrato nel giornale per poter riprendere dopo un'interruzione
+                                    journal = self.open_journal()
+                                    # Con il pre-check vengono inviate a IL02 solo le FL con valori non coerenti
+                                    df_coerenti = None
+                                    if df_expected is not None:
+                                        df_filtrato, df_coerenti = FL_Data.split_stale_FL(df_filtrato, df_expected)
+                                        self.log_message(f"Pre-check: {len(df_filtrato)} FL da aggiornare, {len(df_coerenti)} già coerenti", 'info')
+                                    success, df_result = extractor.update_FL(df_filtrato, n_sessions, session_manager,
+                                                                             journal=journal,
+                                                                             resume=self.resume_checkbox.isChecked(),
+                                                                             sticky=self.sticky_checkbox.isChecked(),
+                                                                             retry_policy=SAP_Retry.RetryPolicy(max_attempts=self.attempts_spinbox.value()))
+                                    journal.close()
+                                    # Dopo l'aggiornamento i valori IFLO memorizzati non sono più attuali
+                                    if success and extractor.cache is not None:
+                                        extractor.cache.invalidate("IFLO")
+                                    if success and df_coerenti is not None and not df_coerenti.empty:
+                                        df_result = self.add_skipped_rows(df_result, df_coerenti)
+
+                                    if success:
+                                        self.report_update(extractor, df_result, journal)
                                     else:
-                                        self.log_message("Errore durante il salvataggio del file Excel", 'error')
-                                else:
-                                    self.log_message("Errore durante l'aggiornamento delle fl", 'error')                           
-                        else:
-                            self.log_message("Errore durante l'elaborazione del df", 'error')
+                                        self.log_message("Errore durante l'aggiornamento delle fl", 'error')                           
+                            else:
+                                self.log_message("Errore durante l'elaborazione del df", 'error')
 
                     self.log_message("Elaborazione terminata", 'success')
 
@@ -449,6 +638,268 @@ class MainWindow(QMainWindow):
 
 
 
+    def update_data_streaming(self, extractor: SAP_Transactions.SAPDataExtractor,
+                              df_expected: Optional[pd.DataFrame]) -> None:
+        """
+        Aggiornamento in pipeline: le liste di FL vengono estratte da IFLO a blocchi (selection_chunk_size)
+        e ogni blocco, filtrato per lingua e con il pre-check, viene aggiornato in IL02 mentre si estrae
+        il blocco successivo. Con più sessioni la prima estrae e le altre aggiornano.
+
+        Args:
+            extractor (SAPDataExtractor): Extractor della sessione SAP principale
+            df_expected (pd.DataFrame): Valori attesi per il pre-check (None = pre-check disattivato)
+        """
+        n_sessions = self.sessions_spinbox.value()
+        session_manager = SAP_Sessions.SAPSessionManager(max_sessions=n_sessions) if n_sessions > 1 else None
+        journal = self.open_journal()
+        intestazione_df_IFLO = ['Sede tecnica', 'Definizione della sede tecnica', 'L', 'L_1', 'Tipologia', 'Componente', 'Sezione', 'Tipo ogg.', 'Prof.cat.']
+        lang = self.infoLanguage.upper()
+        # I blocchi IFLO estratti vengono scritti nel file FL_estratte man mano, senza tenerli in memoria
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_Excel = f"FL_estratte_" + timestamp + ".xlsx"
+        try:
+            extracted = SAP_Pipeline.ExcelChunkWriter(os.path.join(self.current_dir, file_Excel), sheet_name='Dati_estratti')
+        except RuntimeError as e:
+            self.log_message(f"{str(e)}: le FL estratte non vengono salvate", 'warning')
+            extracted = None
+        # Colonne delle FL elaborate e coerenti conservate per il report FL_aggiornate
+        result_columns = SAP_Pipeline.KEY_COLUMNS + FL_Data.FL_VALUE_COLUMNS
+        skipped = []        # FL escluse dal pre-check perché già coerenti
+
+        def transform(df: pd.DataFrame) -> Optional[pd.DataFrame]:
+            try:
+                df = self.rename_columns_safely(df, intestazione_df_IFLO)
+            except ValueError as e:
+                print(f"Errore: {e}")
+                return None
+            if self.compact_checkbox.isChecked():
+                df = FL_Data.compact_FL_frame(df)
+            if extracted is not None:
+                extracted.append(df)
+            # Stesso filtro di Check_Lang, senza messaggi per ogni blocco
+            df = FL_Data.filter_language(df, lang)
+            if df_expected is not None and not df.empty:
+                df, df_coerenti = FL_Data.split_stale_FL(df, df_expected)
+                skipped.append(df_coerenti[[col for col in result_columns if col in df_coerenti.columns]])
+            return df
+
+        self.log_message("Aggiornamento in pipeline IFLO → IL02", 'loading')
+        pipeline = SAP_Pipeline.StreamingUpdate(extractor, transform, n_sessions, session_manager,
+                                                journal=journal, resume=self.resume_checkbox.isChecked(),
+                                                result_columns=result_columns)
+        success, df_result = pipeline.run(self.fl_dictionary.values(),
+                                          sticky=self.sticky_checkbox.isChecked(),
+                                          retry_policy=SAP_Retry.RetryPolicy(max_attempts=self.attempts_spinbox.value()))
+        journal.close()
+        extractor.log_cache_summary()
+        extractor.log_clipboard_summary()
+
+        if extracted is not None and extracted.rows:
+            self.log_message(f"Totale FL estratte = {extracted.rows}", 'success')
+            try:
+                extracted.close()
+                self.log_message(f"FL estratte salvate in:\n     {file_Excel}", 'success')
+            except Exception as e:
+                self.log_message(f"Errore durante il salvataggio di {file_Excel}: {str(e)}", 'error')
+
+        if skipped:
+            n_skipped = sum(len(df) for df in skipped)
+            self.log_message(f"Pre-check: {n_skipped} FL già coerenti non inviate a IL02", 'info')
+        if pipeline.failed_FL:
+            self.log_message(f"{len(pipeline.failed_FL)} FL non estratte da IFLO ({pipeline.failed_chunks} blocchi): "
+                             f"riportate con Result 'X' nel file dei risultati", 'error')
+        if not success:
+            if skipped and not pipeline.failed_chunks:
+                # Tutte le FL estratte sono già coerenti: nessun aggiornamento necessario
+                df_result = extractor.records_to_dataframe(pd.DataFrame(columns=result_columns), [])
+            else:
+                self.log_message("Errore durante l'aggiornamento delle fl", 'error')
+                return
+        # Dopo l'aggiornamento i valori IFLO memorizzati non sono più attuali
+        if extractor.cache is not None:
+            extractor.cache.invalidate("IFLO")
+        if skipped:
+            # Le FL coerenti vengono accodate dopo quelle elaborate
+            df_coerenti = pd.concat(skipped, ignore_index=True)
+            df_coerenti.index += len(df_result)
+            df_result = self.add_skipped_rows(df_result, df_coerenti)
+        self.report_update(extractor, df_result, journal)
+
+    def report_update(self, extractor: SAP_Transactions.SAPDataExtractor, df_result: pd.DataFrame,
+                      journal: SAP_Journal.UpdateJournal) -> None:
+        """
+        Statistiche dell'aggiornamento e salvataggio dei file FL_aggiornate e FL_tempi
+
+        Args:
+            extractor (SAPDataExtractor): Extractor che ha eseguito l'aggiornamento
+            df_result (pd.DataFrame): Df restituito da update_FL
+            journal (UpdateJournal): Giornale da archiviare dopo il salvataggio dei risultati
+        """
+        # creo una statistica degli aggiornamenti eseguiti
+        result_stat = self.analyze_result(df_result)   
+        extractor.log_wait_summary()
+        extractor.log_step_summary()
+        extractor.log_handle_summary()
+
+        df_result = self.check_modifications_detailed(df_result)     
+
+        # Creo il nome del file per salvare i dati
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_Excel = f"FL_aggiornate_" + timestamp + ".xlsx"
+        self.log_message(f"Salvo i dati in un file excel:\n     {file_Excel}", 'success')
+        # Salvo il DataFrame in un file Excel
+        if self.save_excel_file_advanced(df_result, file_Excel,
+                                        sheet_name='Dati_modificati',
+                                        index=False,
+                                        overwrite=True):
+            self.log_message("File Excel salvato con successo", 'success')
+            # Elaborazione completa: il giornale non serve più per la ripresa
+            archived = journal.archive()
+            if archived:
+                self.log_message(f"Giornale archiviato: {archived.name}", 'info')
+
+        # Tabella dei tempi per passo IL02 (una riga per FL)
+        file_Excel = f"FL_tempi_" + timestamp + ".xlsx"
+        if self.save_excel_file_advanced(extractor.get_step_timings(), file_Excel,
+                                        sheet_name='Tempi_IL02',
+                                        index=False,
+                                        overwrite=True):
+            self.log_message(f"Tempi IL02 salvati in:\n     {file_Excel}", 'success')
+        else:
+            self.log_message("Errore durante il salvataggio del file Excel", 'error')
+
+    # ----------------------------------------------------
+    # Pre-check dei valori attesi
+    # ----------------------------------------------------
+
+    def load_expected_values(self) -> Optional[pd.DataFrame]:
+        """
+        Chiede il file dei valori attesi e lo carica
+
+        Returns:
+            pd.DataFrame: Valori attesi o None se il file non è stato scelto o non è valido
+        """
+        file_path, _ = QFileDialog.getOpenFileName(self, "File valori attesi", self.current_dir,
+                                                   "Excel/CSV (*.xlsx *.xls *.csv *.txt)")
+        if not file_path:
+            self.log_message("Pre-check annullato: nessun file di valori attesi selezionato", 'warning')
+            return None
+        try:
+            df_expected = FL_Data.load_reference_values(file_path)
+        except Exception as e:
+            self.log_message(f"Errore lettura valori attesi: {str(e)}", 'error')
+            return None
+        self.log_message(f"Valori attesi caricati per {len(df_expected)} FL", 'info')
+        return df_expected
+
+    def verify_FL(self, extractor: SAP_Transactions.SAPDataExtractor, df: pd.DataFrame,
+                  df_expected: pd.DataFrame) -> None:
+        """
+        Verifica senza salvataggio: confronta i valori delle FL con quelli attesi e salva il report delle differenze.
+        Con MODE_VERIFY_IFLO vengono usati i valori già estratti da IFLO (nessuna transazione per FL),
+        con MODE_VERIFY_IL02 ogni FL viene aperta in IL02 e letta senza modificare la descrizione.
+
+        Args:
+            extractor (SAPDataExtractor): Extractor della sessione SAP
+            df (pd.DataFrame): FL estratte da IFLO e filtrate per lingua
+            df_expected (pd.DataFrame): Valori attesi
+        """
+        if self.mode_combo.currentText() == self.MODE_VERIFY_IL02:
+            n_sessions = self.sessions_spinbox.value()
+            session_manager = SAP_Sessions.SAPSessionManager(max_sessions=n_sessions) if n_sessions > 1 else None
+            success, df_read = extractor.update_FL(df, n_sessions, session_manager,
+                                                   sticky=self.sticky_checkbox.isChecked(),
+                                                   retry_policy=SAP_Retry.RetryPolicy(max_attempts=self.attempts_spinbox.value()),
+                                                   read_only=True)
+            if not success:
+                self.log_message("Errore durante la lettura delle FL in IL02", 'error')
+                return
+            extractor.log_step_summary()
+            df_drift = FL_Data.compute_drift(df_read, df_expected, {col: f"N_{col}" for col in FL_Data.FL_VALUE_COLUMNS})
+            df_drift.insert(1, "Result", df_read["Result"])
+        else:
+            df_drift = FL_Data.compute_drift(df, df_expected)
+
+        n_drift = int((df_drift["Drift"] != "").sum())
+        self.log_message(f"Verifica: {n_drift} FL con valori diversi da quelli attesi su {len(df_drift)}",
+                         'warning' if n_drift else 'success')
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_Excel = f"FL_verifica_" + timestamp + ".xlsx"
+        if self.save_excel_file_advanced(df_drift, file_Excel,
+                                        sheet_name='Verifica',
+                                        index=False,
+                                        overwrite=True):
+            self.log_message(f"Report di verifica salvato in:\n     {file_Excel}", 'success')
+        else:
+            self.log_message("Errore durante il salvataggio del file Excel", 'error')
+
+    def add_skipped_rows(self, df_result: pd.DataFrame, df_skipped: pd.DataFrame) -> pd.DataFrame:
+        """
+        Aggiunge al df dei risultati le FL escluse dal pre-check perché già coerenti
+
+        Args:
+            df_result (pd.DataFrame): Df restituito da update_FL
+            df_skipped (pd.DataFrame): FL non inviate a IL02
+
+        Returns:
+            pd.DataFrame: Df dei risultati completo, nell'ordine originale delle righe
+        """
+        df_skipped = df_skipped.copy()
+        df_skipped["Result"] = "-"
+        df_skipped["Result_txt"] = "Pre-check: valori già coerenti, FL non modificata"
+        for col in ["N_Tipologia", "N_Componente", "N_Sezione", "N_Tipo ogg.", "N_Prof.cat."]:
+            df_skipped[col] = ""
+        # Nessun tentativo in IL02: stesse colonne (e tipo) del df di update_FL
+        df_skipped["Tentativo"] = 0
+        return pd.concat([df_result, df_skipped]).sort_index()
+
+    # ----------------------------------------------------
+    # Giornale degli aggiornamenti per la ripresa dopo un'interruzione
+    # ----------------------------------------------------
+
+    def open_journal(self) -> SAP_Journal.UpdateJournal:
+        """
+        Apre il giornale degli aggiornamenti del sistema/mandante corrente.
+        Se la ripresa non è richiesta, un giornale rimasto da un'esecuzione interrotta viene archiviato.
+        Prima della ripresa vengono mostrati data di creazione, utente e selezione del giornale; un giornale
+        più vecchio di SAP_Journal.RESUME_MAX_AGE viene archiviato senza saltare nessuna FL.
+
+        Returns:
+            SAP_Journal.UpdateJournal: Giornale da passare a update_FL
+        """
+        file_journal = f"FL_giornale_{self.infoSystemName}_{self.infoClient}.jsonl"
+        journal = SAP_Journal.UpdateJournal(os.path.join(self.current_dir, file_journal))
+        # Parametri dell'esecuzione registrati nell'intestazione del giornale
+        parameters = {
+            "Sistema": self.infoSystemName,
+            "Mandante": self.infoClient,
+            "Utente": self.infoUser,
+            "Lingua": self.infoLanguage,
+            "Liste FL": str(len(self.fl_dictionary)),
+            "Selezione": SAP_Journal.selection_digest(self.fl_dictionary.keys()),
+        }
+        if journal.path.exists():
+            info = journal.info() or {}
+            age = journal.age()
+            if not self.resume_checkbox.isChecked():
+                archived = journal.archive()
+                self.log_message(f"Giornale precedente archiviato: {archived.name}", 'info')
+            elif age is not None and age > SAP_Journal.RESUME_MAX_AGE:
+                archived = journal.archive()
+                self.log_message(f"Giornale del {info.get('Creato', '?')} più vecchio di "
+                                 f"{SAP_Journal.RESUME_MAX_AGE.total_seconds() / 3600:.0f} ore: non ripreso, "
+                                 f"archiviato come {archived.name}", 'warning')
+            else:
+                self.log_message(f"Trovato giornale di un aggiornamento interrotto:\n     {file_journal}\n"
+                                 f"     creato il {info.get('Creato', '?')} da {info.get('Utente', '?')}, "
+                                 f"{info.get('Liste FL', '?')} liste di FL: "
+                                 f"{len(journal.completed())} FL già salvate non verranno rielaborate", 'warning')
+                if info.get("Selezione") not in (None, parameters["Selezione"]):
+                    self.log_message("Il giornale è stato creato con una selezione di FL diversa da quella attuale", 'warning')
+        journal.start(parameters)
+        return journal
+
     # ----------------------------------------------------
     # Modifica l' intestazione di un df
     # ---------------------------------------------------- 
@@ -540,23 +991,10 @@ class MainWindow(QMainWindow):
         
         print(f"📊 Analisi: {len(df)} righe totali, {mask_result_s.sum()} con Result='S'")
         
-        # Processa solo le righe con Result='S'
-        for index in df[mask_result_s].index:
-            row = df.loc[index]
-            modified_fields = []
-            
-            for new_col, old_col in column_mapping.items():
-                new_val = str(row[new_col]).strip() if pd.notna(row[new_col]) else ''
-                old_val = str(row[old_col]).strip() if pd.notna(row[old_col]) else ''
-                
-                if new_val != old_val:
-                    modified_fields.append(f"{old_col}: '{old_val}' → '{new_val}'")
-            
-            if modified_fields:
-                df.at[index, 'Check'] = 1
-                df.at[index, 'Modified_Fields'] = '; '.join(modified_fields)
-            else:
-                df.at[index, 'Modified_Fields'] = 'Nessuna modifica'
+        # Confronto vettoriale delle coppie di colonne sulle sole righe con Result='S'
+        modified = FL_Data.describe_modifications(df, column_mapping, mask_result_s)
+        df['Check'] = (modified != '').astype(int)
+        df['Modified_Fields'] = modified.where(modified != '', 'Nessuna modifica')
         
         # Per le righe che NON hanno Result='S', imposta messaggio specifico
         df.loc[~mask_result_s, 'Modified_Fields'] = 'Non elaborata (Result≠S)'
@@ -627,7 +1065,7 @@ class MainWindow(QMainWindow):
             print(f"🔍 Valori unici in L_1: {df['L_1'].unique()}")
             
             # Filtra usando il parametro lang (non hardcoded)
-            df_filtrato = df[df['L_1'].str.upper() == lang.upper()]
+            df_filtrato = FL_Data.filter_language(df, lang)
             
             # Risultati
             if len(df_filtrato) == 0: